@@ -0,0 +1,282 @@
+import argparse
+import gc
+import importlib.util
+import logging
+import os
+import random
+import select
+import signal
+import socket
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import uvicorn
+import config
+
+logger = logging.getLogger("dog_api.launcher")
+
+RESPAWN_BACKOFF = 0.5
+RESPAWN_BACKOFF_MAX = 30.0
+
+def select_loop(name: str) -> str:
+    if name in ("auto", "uvloop"):
+        if importlib.util.find_spec("uvloop") is not None:
+            return "uvloop"
+        if name == "uvloop":
+            logger.warning("uvloop is not installed, falling back to asyncio")
+        return "asyncio"
+    return name
+
+def select_http(name: str) -> str:
+    if name in ("auto", "httptools"):
+        if importlib.util.find_spec("httptools") is not None:
+            return "httptools"
+        if name == "httptools":
+            logger.warning("httptools is not installed, falling back to h11")
+        return "h11"
+    return name
+
+def bind_socket(host: str, port: int, backlog: int, reuse_port: bool) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port and hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+def preload():
+    from app.main import app
+    from app.openapi import get_openapi_body
+    from app.services.breed_service import load_catalog
+
+    started = time.perf_counter()
+    catalog = load_catalog()
+    get_openapi_body(app)
+    gc.collect()
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+    logger.info(
+        "Preloaded %d images in %d breeds and the OpenAPI schema in %.2fs",
+        len(catalog), len(catalog.breeds), time.perf_counter() - started,
+    )
+    return app
+
+def describe_exit(status: int) -> str:
+    if os.WIFSIGNALED(status):
+        return f"signal {os.WTERMSIG(status)}"
+    return f"status {os.WEXITSTATUS(status)}"
+
+def prepare_metrics_dir(workers: int):
+    if not config.METRICS_DIR and workers > 1:
+        config.METRICS_DIR = tempfile.mkdtemp(prefix="dog-api-metrics-")
+    if config.METRICS_DIR:
+        directory = Path(config.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        for path in [*directory.glob("metrics-*.json"), *directory.glob("hits-*.json"), directory / "retired.json"]:
+            path.unlink(missing_ok=True)
+
+class ReadyServer(uvicorn.Server):
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None):
+        await super().startup(sockets=sockets)
+        if self.started:
+            os.write(self.ready_fd, b"1")
+            os.close(self.ready_fd)
+
+class Launcher:
+    def __init__(self, app, workers: int, host: str, port: int):
+        self.app = app
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.loop = select_loop(config.SERVER_LOOP)
+        self.http = select_http(config.SERVER_HTTP)
+        self.socket: Optional[socket.socket] = None
+        self.children: Dict[int, int] = {}
+        self.started: Dict[int, float] = {}
+        self.primary: Optional[int] = None
+        self.respawns: List[bool] = []
+        self.failures = 0
+        self.respawn_at = 0.0
+        self.shutting_down = False
+        self.restart_requested = False
+
+    def server_config(self) -> uvicorn.Config:
+        max_requests = None
+        if config.MAX_REQUESTS:
+            max_requests = config.MAX_REQUESTS + random.randint(0, config.MAX_REQUESTS_JITTER)
+        return uvicorn.Config(
+            self.app,
+            loop=self.loop,
+            http=self.http,
+            lifespan="on",
+            root_path=config.ROOT_PATH,
+            backlog=config.BACKLOG,
+            timeout_keep_alive=config.KEEPALIVE_TIMEOUT,
+            timeout_graceful_shutdown=config.GRACEFUL_TIMEOUT,
+            limit_max_requests=max_requests,
+            proxy_headers=True,
+        )
+
+    def spawn(self, generation: int, primary: bool = False) -> int:
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            config.PRIMARY_WORKER = primary
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            sock = self.socket
+            if config.SOCKET_REUSE_PORT:
+                sock = bind_socket(self.host, self.port, config.BACKLOG, reuse_port=True)
+            random.seed()
+            server = ReadyServer(self.server_config(), ready_write)
+            server.run(sockets=[sock])
+            os._exit(0 if server.started else 1)
+
+        os.close(ready_write)
+        self.children[pid] = generation
+        self.started[pid] = time.monotonic()
+        if primary:
+            self.primary = pid
+        self.wait_ready(ready_read, pid)
+        return pid
+
+    def wait_ready(self, ready_read: int, pid: int):
+        try:
+            readable, _, _ = select.select([ready_read], [], [], config.WORKER_STARTUP_TIMEOUT)
+            if not readable or not os.read(ready_read, 1):
+                logger.warning("Worker %d did not report ready", pid)
+        finally:
+            os.close(ready_read)
+
+    def reap(self, pids: Optional[List[int]] = None) -> List[Tuple[int, int]]:
+        exited = []
+        for pid in list(self.children) if pids is None else pids:
+            try:
+                finished, status = os.waitpid(pid, os.WNOHANG)
+            except ChildProcessError:
+                finished, status = pid, 0
+            if finished == 0:
+                continue
+            self.children.pop(pid, None)
+            exited.append((pid, status))
+            logger.info("Worker %d exited with %s", pid, describe_exit(status))
+        return exited
+
+    def schedule_respawn(self, pid: int, status: int):
+        uptime = time.monotonic() - self.started.pop(pid, 0.0)
+        if status != 0 and uptime < config.WORKER_STARTUP_TIMEOUT:
+            self.failures += 1
+            delay = min(RESPAWN_BACKOFF * 2 ** (self.failures - 1), RESPAWN_BACKOFF_MAX)
+            self.respawn_at = time.monotonic() + delay
+            logger.warning("Worker %d exited after %.1fs, respawning in %.1fs", pid, uptime, delay)
+        else:
+            self.failures = 0
+        self.respawns.append(pid == self.primary)
+        if pid == self.primary:
+            self.primary = None
+
+    def stop_workers(self, pids: List[int]):
+        for pid in pids:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        deadline = time.monotonic() + config.GRACEFUL_TIMEOUT + 5
+        while any(pid in self.children for pid in pids) and time.monotonic() < deadline:
+            self.reap([pid for pid in pids if pid in self.children])
+            time.sleep(0.1)
+        for pid in pids:
+            if pid in self.children:
+                logger.warning("Worker %d did not stop in time, killing it", pid)
+                os.kill(pid, signal.SIGKILL)
+                os.waitpid(pid, 0)
+                self.children.pop(pid, None)
+        for pid in pids:
+            self.started.pop(pid, None)
+            if pid == self.primary:
+                self.primary = None
+
+    def rolling_restart(self, generation: int):
+        from app.services.breed_service import load_catalog
+
+        load_catalog()
+        for pid in list(self.children):
+            if self.shutting_down:
+                return
+            if pid == self.primary:
+                self.stop_workers([pid])
+                self.spawn(generation, primary=True)
+            else:
+                self.spawn(generation)
+                self.stop_workers([pid])
+        logger.info("Rolling restart to generation %d finished with %d workers", generation, len(self.children))
+
+    def run(self):
+        if not config.SOCKET_REUSE_PORT:
+            self.socket = bind_socket(self.host, self.port, config.BACKLOG, reuse_port=False)
+
+        def request_shutdown(signum, frame):
+            self.shutting_down = True
+
+        def request_restart(signum, frame):
+            self.restart_requested = True
+
+        signal.signal(signal.SIGTERM, request_shutdown)
+        signal.signal(signal.SIGINT, request_shutdown)
+        signal.signal(signal.SIGHUP, request_restart)
+
+        logger.info(
+            "Starting %d workers on %s:%d (loop=%s, http=%s)",
+            self.workers, self.host, self.port, self.loop, self.http,
+        )
+        generation = 0
+        for worker in range(self.workers):
+            self.spawn(generation, primary=worker == 0)
+
+        while not self.shutting_down:
+            if self.restart_requested:
+                self.restart_requested = False
+                generation += 1
+                self.rolling_restart(generation)
+            for pid, status in self.reap():
+                self.schedule_respawn(pid, status)
+            if self.respawns and not self.shutting_down and time.monotonic() >= self.respawn_at:
+                self.spawn(generation, primary=self.respawns.pop(0))
+            time.sleep(0.2)
+
+        logger.info("Shutting down %d workers", len(self.children))
+        self.stop_workers(list(self.children))
+        if self.socket is not None:
+            self.socket.close()
+
+def serve(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run dog-api with pre-forked workers")
+    parser.add_argument("--startup-report", action="store_true", help="Print per-module import and startup phase times, then exit")
+    parser.add_argument("--startup-budget-ms", type=float, default=0, help="Exit non-zero when cold start exceeds this budget")
+    args = parser.parse_args(argv)
+    if args.startup_report:
+        from app.startup_report import startup_report
+        return startup_report(args.startup_budget_ms)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    workers = config.WORKERS or os.cpu_count() or 1
+    if not hasattr(os, "fork"):
+        from app.main import app
+        uvicorn.run(app, host=config.HOST, port=config.PORT, root_path=config.ROOT_PATH)
+        return 0
+    prepare_metrics_dir(workers)
+    Launcher(preload(), workers, config.HOST, config.PORT).run()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(serve())
@@ -1,15 +1,66 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+import config
 from config import ROOT_PATH
 from app.app_config import get_fastapi_config
 from app.openapi import setup_custom_openapi
+from app.metrics import start_metrics_writer, stop_metrics_writer
+from app.middleware.admission import AdmissionMiddleware
 from app.middleware.cors import CustomCORSMiddleware
-from app.routes import breeds, images
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.tracing import SpanMiddleware, TracingMiddleware
+from app.profiling import install_profile_signal
+from app.routes import breeds, images, metrics
+from app.services.breed_service import get_catalog
+from app.services.catalog_watcher import start_watcher, stop_watcher
+from app.services.image_metadata import MetadataUnavailable, start_metadata_indexer, stop_metadata_indexer
+from app.services.io_executor import io_executor, loop_monitor
+from app.services.promoter import start_promoter, stop_promoter
+from app.tracing import TracedJSONResponse, start_tracer, stop_tracer, tracing_enabled
 
-app = FastAPI(**get_fastapi_config(ROOT_PATH))
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    get_catalog()
+    start_watcher()
+    start_metadata_indexer()
+    start_promoter()
+    start_metrics_writer()
+    start_tracer()
+    install_profile_signal()
+    loop_monitor.start()
+    yield
+    loop_monitor.stop()
+    stop_tracer()
+    stop_metrics_writer()
+    stop_promoter()
+    stop_metadata_indexer()
+    stop_watcher()
+    io_executor.shutdown()
+
+app = FastAPI(**get_fastapi_config(ROOT_PATH), default_response_class=TracedJSONResponse, lifespan=lifespan)
 setup_custom_openapi(app)
 
+@app.exception_handler(MetadataUnavailable)
+async def metadata_unavailable(request: Request, exc: MetadataUnavailable):
+    if not config.IMAGE_METADATA:
+        return JSONResponse({"detail": str(exc)}, status_code=400)
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "5"})
+
+if tracing_enabled():
+    app.add_middleware(SpanMiddleware, name="routing")
+if config.ADMISSION_ENABLED:
+    app.add_middleware(AdmissionMiddleware)
 app.add_middleware(CustomCORSMiddleware)
+if tracing_enabled():
+    app.add_middleware(SpanMiddleware, name="cors")
+app.add_middleware(MetricsMiddleware)
+if tracing_enabled():
+    app.add_middleware(TracingMiddleware)
+if config.PROFILE_DIR:
+    app.add_middleware(ProfilingMiddleware)
 
 app.include_router(breeds.router)
 app.include_router(images.router)
-
+app.include_router(metrics.router)
@@ -0,0 +1,369 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+import config
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+fs_counts: "ContextVar[Optional[Dict[str, int]]]" = ContextVar("fs_counts", default=None)
+
+class RouteStats:
+    __slots__ = ("buckets", "statuses", "total", "count")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.statuses: Dict[int, int] = {}
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, status: int, seconds: float):
+        self.buckets[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.total += seconds
+        self.count += 1
+
+class Metrics:
+    def __init__(self):
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.image_bytes_served = 0
+        self.fs_calls: Dict[str, int] = {"stat": 0, "scandir": 0}
+        self.lookup_misses: Dict[str, int] = {"breed": 0, "subbreed": 0, "image": 0, "rejected": 0}
+        self.routes: Dict[Tuple[str, str], RouteStats] = {}
+
+    def count_fs(self, kind: str, count: int = 1):
+        self.fs_calls[kind] += count
+        counts = fs_counts.get()
+        if counts is not None:
+            counts[kind] += count
+
+    def route(self, method: str, path: str) -> RouteStats:
+        stats = self.routes.get((method, path))
+        if stats is None:
+            stats = self.routes[(method, path)] = RouteStats()
+        return stats
+
+    def snapshot(self) -> Dict:
+        from app.middleware.admission import admission_stats
+        from app.response_cache import response_cache
+        from app.services import breed_service
+        from app.services.catalog_watcher import get_watcher
+        from app.services.image_cache import image_cache
+        from app.services.image_files import negative_cache, stat_cache
+        from app.services.image_metadata import get_indexer
+        from app.services.io_executor import io_executor, loop_monitor
+        from app.services.promoter import get_promoter
+        from app.tracing import get_exporter
+
+        gauges = {
+            "process_start_time_seconds": self.started_at,
+            "io_pending": io_executor.pending,
+            "io_submitted_total": io_executor.submitted,
+            "io_rejected_total": io_executor.rejected,
+            "io_timeouts_total": io_executor.timeouts,
+            "io_coalesced_total": io_executor.coalesced,
+            "event_loop_lag_seconds": loop_monitor.lag,
+            "event_loop_lag_max_seconds": loop_monitor.max_lag,
+            "admission_rate_limited_total": admission_stats.rate_limited,
+            "admission_queued_total": admission_stats.queued,
+            "admission_queue_timeouts_total": admission_stats.queue_timeouts,
+            "admission_shed_total": admission_stats.shed,
+        }
+        catalog = breed_service._catalog
+        if catalog is not None:
+            gauges["catalog_images"] = len(catalog)
+            gauges["catalog_breeds"] = len(catalog.breeds)
+            gauges["catalog_version"] = catalog.version
+        indexer = get_indexer()
+        if indexer is not None:
+            gauges["image_metadata_builds_total"] = indexer.builds
+            gauges["image_metadata_last_build_seconds"] = indexer.last_build_seconds or 0
+            gauges["image_metadata_images"] = len(indexer.index) if indexer.index is not None else 0
+        exporter = get_exporter()
+        if exporter is not None:
+            gauges["traces_exported_total"] = exporter.exported
+            gauges["traces_dropped_total"] = exporter.dropped
+            gauges["traces_failed_total"] = exporter.failed
+        watcher = get_watcher()
+        if watcher is not None:
+            gauges["catalog_refreshes_total"] = watcher.refreshes
+            gauges["catalog_last_refresh_timestamp_seconds"] = watcher.last_refresh_at or 0
+            gauges["catalog_last_refresh_lag_seconds"] = watcher.last_refresh_lag or 0
+        promoter = get_promoter()
+        if promoter is not None:
+            gauges["promoted_images"] = len(promoter.promoted)
+            gauges["promoted_bytes"] = promoter.promoted_bytes
+            gauges["promotions_total"] = promoter.promotions
+            gauges["promotion_evictions_total"] = promoter.evictions
+
+        return {
+            "pid": os.getpid(),
+            "in_flight": self.in_flight,
+            "image_bytes_served": self.image_bytes_served,
+            "fs_calls": dict(self.fs_calls),
+            "lookup_misses": dict(self.lookup_misses),
+            "routes": [
+                {
+                    "method": method,
+                    "path": path,
+                    "buckets": list(stats.buckets),
+                    "statuses": {str(status): count for status, count in stats.statuses.items()},
+                    "sum": stats.total,
+                    "count": stats.count,
+                }
+                for (method, path), stats in list(self.routes.items())
+            ],
+            "caches": {
+                "response": {"hits": response_cache.hits, "misses": response_cache.misses},
+                "image_stat": {"hits": stat_cache.hits, "misses": stat_cache.misses},
+                "image_negative": {"hits": negative_cache.hits, "misses": negative_cache.misses},
+                "image_bytes": {"hits": image_cache.hits, "misses": image_cache.misses},
+            },
+            "gauges": gauges,
+        }
+
+metrics = Metrics()
+
+def is_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+def merge_snapshots(snapshots: List[Dict]) -> Dict:
+    merged = {
+        "in_flight": 0, "image_bytes_served": 0, "fs_calls": {}, "lookup_misses": {}, "routes": {}, "caches": {}, "gauges": {}
+    }
+    for snapshot in snapshots:
+        merged["in_flight"] += snapshot["in_flight"]
+        merged["image_bytes_served"] += snapshot["image_bytes_served"]
+        for name, count in snapshot["fs_calls"].items():
+            merged["fs_calls"][name] = merged["fs_calls"].get(name, 0) + count
+        for kind, count in snapshot.get("lookup_misses", {}).items():
+            merged["lookup_misses"][kind] = merged["lookup_misses"].get(kind, 0) + count
+        for route in snapshot["routes"]:
+            key = (route["method"], route["path"])
+            target = merged["routes"].get(key)
+            if target is None:
+                target = merged["routes"][key] = {
+                    "method": route["method"],
+                    "path": route["path"],
+                    "buckets": [0] * len(route["buckets"]),
+                    "statuses": {},
+                    "sum": 0.0,
+                    "count": 0,
+                }
+            target["buckets"] = [a + b for a, b in zip(target["buckets"], route["buckets"])]
+            for status, count in route["statuses"].items():
+                target["statuses"][status] = target["statuses"].get(status, 0) + count
+            target["sum"] += route["sum"]
+            target["count"] += route["count"]
+        for name, counters in snapshot["caches"].items():
+            target = merged["caches"].setdefault(name, {"hits": 0, "misses": 0})
+            target["hits"] += counters["hits"]
+            target["misses"] += counters["misses"]
+        for name, value in snapshot["gauges"].items():
+            if name == "process_start_time_seconds":
+                value = min(value, merged["gauges"].get(name, value))
+            elif name.endswith("_total") or name == "io_pending":
+                value += merged["gauges"].get(name, 0)
+            else:
+                value = max(value, merged["gauges"].get(name, value))
+            merged["gauges"][name] = value
+    merged["routes"] = list(merged["routes"].values())
+    merged["workers"] = sum(1 for snapshot in snapshots if is_alive(snapshot.get("pid")))
+    return merged
+
+def escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def render(snapshot: Dict) -> str:
+    lines = [
+        "# HELP dog_api_http_requests_total Requests handled, by route and status.",
+        "# TYPE dog_api_http_requests_total counter",
+    ]
+    for route in snapshot["routes"]:
+        labels = f'method="{route["method"]}",route="{escape_label(route["path"])}"'
+        for status, count in sorted(route["statuses"].items()):
+            lines.append(f'dog_api_http_requests_total{{{labels},status="{status}"}} {count}')
+
+    lines += [
+        "# HELP dog_api_http_request_duration_seconds Request latency, by route.",
+        "# TYPE dog_api_http_request_duration_seconds histogram",
+    ]
+    for route in snapshot["routes"]:
+        labels = f'method="{route["method"]}",route="{escape_label(route["path"])}"'
+        cumulative = 0
+        for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), route["buckets"]):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f'dog_api_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+        lines.append(f"dog_api_http_request_duration_seconds_sum{{{labels}}} {route['sum']}")
+        lines.append(f"dog_api_http_request_duration_seconds_count{{{labels}}} {route['count']}")
+
+    lines += [
+        "# HELP dog_api_http_requests_in_flight Requests currently being handled.",
+        "# TYPE dog_api_http_requests_in_flight gauge",
+        f"dog_api_http_requests_in_flight {snapshot['in_flight']}",
+        "# HELP dog_api_image_bytes_served_total Image bytes sent by serve_image.",
+        "# TYPE dog_api_image_bytes_served_total counter",
+        f"dog_api_image_bytes_served_total {snapshot['image_bytes_served']}",
+        "# HELP dog_api_filesystem_calls_total Filesystem calls made while scanning and resolving images.",
+        "# TYPE dog_api_filesystem_calls_total counter",
+    ]
+    for name, count in sorted(snapshot["fs_calls"].items()):
+        lines.append(f'dog_api_filesystem_calls_total{{call="{name}"}} {count}')
+
+    lines += [
+        "# HELP dog_api_lookup_misses_total Lookups of unknown breeds, sub-breeds and images, and rejected image paths.",
+        "# TYPE dog_api_lookup_misses_total counter",
+    ]
+    for kind, count in sorted(snapshot.get("lookup_misses", {}).items()):
+        lines.append(f'dog_api_lookup_misses_total{{kind="{kind}"}} {count}')
+
+    lines += [
+        "# HELP dog_api_cache_requests_total Cache lookups, by cache and result.",
+        "# TYPE dog_api_cache_requests_total counter",
+    ]
+    for name, counters in sorted(snapshot["caches"].items()):
+        lines.append(f'dog_api_cache_requests_total{{cache="{name}",result="hit"}} {counters["hits"]}')
+        lines.append(f'dog_api_cache_requests_total{{cache="{name}",result="miss"}} {counters["misses"]}')
+    lines += [
+        "# HELP dog_api_cache_hit_ratio Fraction of cache lookups that were hits.",
+        "# TYPE dog_api_cache_hit_ratio gauge",
+    ]
+    for name, counters in sorted(snapshot["caches"].items()):
+        lookups = counters["hits"] + counters["misses"]
+        ratio = counters["hits"] / lookups if lookups else 0.0
+        lines.append(f'dog_api_cache_hit_ratio{{cache="{name}"}} {ratio}')
+
+    for name, value in sorted(snapshot["gauges"].items()):
+        kind = "counter" if name.endswith("_total") else "gauge"
+        lines.append(f"# TYPE dog_api_{name} {kind}")
+        lines.append(f"dog_api_{name} {value}")
+    if "workers" in snapshot:
+        lines.append("# TYPE dog_api_workers gauge")
+        lines.append(f"dog_api_workers {snapshot['workers']}")
+    return "\n".join(lines) + "\n"
+
+RETIRED_FILE = "retired.json"
+
+def worker_file(directory: Path, pid: int) -> Path:
+    return directory / f"metrics-{pid}.json"
+
+def file_pid(path: Path) -> Optional[int]:
+    pid = path.stem.partition("-")[2]
+    return int(pid) if pid.isdigit() else None
+
+def counters_only(snapshot: Dict) -> Dict:
+    counters = dict(snapshot, in_flight=0)
+    counters["gauges"] = {name: value for name, value in snapshot["gauges"].items() if name.endswith("_total")}
+    counters.pop("pid", None)
+    counters.pop("workers", None)
+    return counters
+
+def retire_snapshots(directory: Path):
+    dead = [path for path in directory.glob("metrics-*.json") if not is_alive(file_pid(path))]
+    if not dead or fcntl is None:
+        return
+    with open(directory / "retired.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = directory / RETIRED_FILE
+        snapshots = []
+        folded = 0
+        for path in [retired] + dead:
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except FileNotFoundError:
+                continue
+            except ValueError:
+                pass
+            if path != retired:
+                path.unlink(missing_ok=True)
+                folded += 1
+        if folded:
+            tmp = retired.with_suffix(".tmp")
+            tmp.write_text(json.dumps(counters_only(merge_snapshots(snapshots))))
+            os.replace(tmp, retired)
+
+def write_snapshot(directory: Path):
+    directory.mkdir(parents=True, exist_ok=True)
+    path = worker_file(directory, os.getpid())
+    tmp = path.with_suffix(".tmp")
+    tmp.write_text(json.dumps(metrics.snapshot()))
+    os.replace(tmp, path)
+
+def read_snapshots(directory: Path) -> List[Dict]:
+    snapshots = []
+    paths = [path for path in sorted(directory.glob("metrics-*.json")) if is_alive(file_pid(path))]
+    for path in paths + [directory / RETIRED_FILE]:
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            continue
+    return snapshots
+
+def collect() -> str:
+    if not config.METRICS_DIR:
+        return render(metrics.snapshot())
+    directory = Path(config.METRICS_DIR)
+    write_snapshot(directory)
+    retire_snapshots(directory)
+    return render(merge_snapshots(read_snapshots(directory)))
+
+class MetricsWriter:
+    def __init__(self, directory: Path, interval: float):
+        self.directory = directory
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metrics-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        metrics.in_flight = 0
+        write_snapshot(self.directory)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                write_snapshot(self.directory)
+            except OSError:
+                pass
+
+_writer: Optional[MetricsWriter] = None
+
+def start_metrics_writer() -> Optional[MetricsWriter]:
+    global _writer
+    if not config.METRICS_DIR or _writer is not None:
+        return _writer
+    _writer = MetricsWriter(Path(config.METRICS_DIR), config.METRICS_FLUSH_INTERVAL)
+    _writer.start()
+    return _writer
+
+def stop_metrics_writer():
+    global _writer
+    if _writer is not None:
+        _writer.stop()
+        _writer = None
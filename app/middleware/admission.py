@@ -0,0 +1,162 @@
+import asyncio
+import json
+import math
+import re
+import time
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+import config
+from app.services.io_executor import loop_monitor
+
+LISTING_PATH = re.compile(r"^/breed/[^/]+(?:/[^/]+)?/images/?$")
+ARCHIVE_PATH = re.compile(r"^/breed/[^/]+(?:/[^/]+)?/archive/?$")
+
+IMAGE = "image"
+CHEAP = "cheap"
+LISTING = "listing"
+ARCHIVE = "archive"
+SHED_LAG_FACTORS = {ARCHIVE: 1.0, LISTING: 1.0, CHEAP: 2.0, IMAGE: 4.0}
+
+def classify(path: str) -> str:
+    if path.startswith("/images/"):
+        return IMAGE
+    if LISTING_PATH.match(path):
+        return LISTING
+    if ARCHIVE_PATH.match(path):
+        return ARCHIVE
+    return CHEAP
+
+class TokenBuckets:
+    def __init__(self, rate: float, burst: float, max_clients: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[bytes, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, client: bytes) -> float:
+        now = time.monotonic()
+        tokens, updated = self._buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1.0:
+            self._buckets[client] = (tokens - 1.0, now)
+            wait = 0.0
+        else:
+            self._buckets[client] = (tokens, now)
+            wait = (1.0 - tokens) / self.rate
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+class ConcurrencyLimiter:
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    async def acquire(self, timeout: float) -> bool:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    self._waiters.remove(waiter)
+                except ValueError:
+                    pass
+
+    def release(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+class AdmissionStats:
+    def __init__(self):
+        self.rate_limited = 0
+        self.queue_timeouts = 0
+        self.shed = 0
+        self.queued = 0
+
+admission_stats = AdmissionStats()
+
+def client_key(scope) -> bytes:
+    client = scope.get("client")
+    return client[0].encode("latin-1") if client else b"-"
+
+async def reject(send, status: int, detail: str, retry_after: float):
+    body = json.dumps({"detail": detail}).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+class AdmissionMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.buckets: Optional[TokenBuckets] = None
+        if config.ADMISSION_RATE > 0:
+            self.buckets = TokenBuckets(config.ADMISSION_RATE, config.ADMISSION_BURST, config.ADMISSION_MAX_CLIENTS)
+        self.limiters: Dict[str, ConcurrencyLimiter] = {
+            route_class: ConcurrencyLimiter(limit)
+            for route_class, limit in (
+                (IMAGE, config.ADMISSION_IMAGE_CONCURRENCY),
+                (CHEAP, config.ADMISSION_CHEAP_CONCURRENCY),
+                (LISTING, config.ADMISSION_LISTING_CONCURRENCY),
+                (ARCHIVE, config.ADMISSION_ARCHIVE_CONCURRENCY),
+            )
+            if limit > 0
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["path"])
+        max_lag = config.ADMISSION_MAX_LAG
+        if max_lag > 0 and loop_monitor.lag >= max_lag * SHED_LAG_FACTORS[route_class]:
+            admission_stats.shed += 1
+            await reject(send, 503, "Server overloaded", config.ADMISSION_RETRY_AFTER)
+            return
+
+        if self.buckets is not None:
+            wait = self.buckets.take(client_key(scope))
+            if wait > 0:
+                admission_stats.rate_limited += 1
+                await reject(send, 429, "Too many requests", wait)
+                return
+
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        if limiter.active >= limiter.limit:
+            admission_stats.queued += 1
+        if not await limiter.acquire(config.ADMISSION_QUEUE_TIMEOUT):
+            admission_stats.queue_timeouts += 1
+            await reject(send, 503, "Server busy", config.ADMISSION_RETRY_AFTER)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
@@ -1,71 +1,145 @@
+import logging
 import re
-from typing import List, Union, Callable
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+import time
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
 import config
 
-allowed_origins_patterns: List[Union[str, re.Pattern]] = []
+logger = logging.getLogger(__name__)
 
-for origin in config.CORS_ORIGINS.split(","):
-    origin = origin.strip()
-    if not origin:
-        continue
-    if origin.startswith("/") and origin.endswith("/") and len(origin) > 2:
-        regex_pattern = origin[1:-1]
-        try:
-            compiled_pattern = re.compile(regex_pattern)
-            allowed_origins_patterns.append(compiled_pattern)
-            print(f"CORS: Added regex pattern: {regex_pattern}")
-        except re.error as e:
-            print(f"Warning: Invalid regex pattern '{regex_pattern}': {e}")
-    elif "*" in origin:
-        escaped = re.escape(origin)
-        pattern = escaped.replace(r"\*", ".*")
-        compiled_pattern = re.compile(f"^{pattern}$")
-        allowed_origins_patterns.append(compiled_pattern)
-        print(f"CORS: Added wildcard pattern '{origin}' -> regex: ^{pattern}$")
-    else:
-        allowed_origins_patterns.append(origin)
-        print(f"CORS: Added plain origin: {origin}")
+ALLOW_METHODS = b"GET, POST, PUT, DELETE, OPTIONS, PATCH"
+
+class RateLimitedLogger:
+    def __init__(self, logger: logging.Logger, max_messages: int, interval: float):
+        self.logger = logger
+        self.max_messages = max_messages
+        self.interval = interval
+        self._window_start = 0.0
+        self._count = 0
+        self._suppressed = 0
+
+    def debug(self, message: str, *args):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        now = time.monotonic()
+        if now - self._window_start >= self.interval:
+            if self._suppressed:
+                self.logger.debug("CORS: %d messages suppressed", self._suppressed)
+            self._window_start = now
+            self._count = 0
+            self._suppressed = 0
+        if self._count >= self.max_messages:
+            self._suppressed += 1
+            return
+        self._count += 1
+        self.logger.debug(message, *args)
+
+debug_log = RateLimitedLogger(logger, max_messages=10, interval=60.0)
+
+def compile_origins(origins: str) -> Tuple[FrozenSet[str], Tuple[re.Pattern, ...]]:
+    exact = set()
+    patterns: List[str] = []
+    for origin in origins.split(","):
+        origin = origin.strip()
+        if not origin:
+            continue
+        if origin.startswith("/") and origin.endswith("/") and len(origin) > 2:
+            regex_pattern = origin[1:-1]
+            try:
+                re.compile(regex_pattern)
+            except re.error as e:
+                logger.warning("CORS: Invalid regex pattern '%s': %s", regex_pattern, e)
+                continue
+            patterns.append(regex_pattern)
+        elif "*" in origin:
+            escaped = re.escape(origin)
+            patterns.append("^" + escaped.replace(r"\*", ".*") + "$")
+        else:
+            exact.add(origin)
+
+    if not patterns:
+        return frozenset(exact), ()
+    try:
+        compiled = (re.compile("|".join(f"(?:{pattern})" for pattern in patterns)),)
+    except re.error:
+        compiled = tuple(re.compile(pattern) for pattern in patterns)
+    return frozenset(exact), compiled
+
+allowed_origins, allowed_origins_patterns = compile_origins(config.CORS_ORIGINS)
 
+@lru_cache(maxsize=config.CORS_CACHE_SIZE)
 def is_origin_allowed(origin: str) -> bool:
     if not origin:
         return False
+    if origin in allowed_origins:
+        debug_log.debug("CORS: Origin '%s' matched exact string", origin)
+        return True
     for pattern in allowed_origins_patterns:
-        if isinstance(pattern, re.Pattern):
-            if pattern.match(origin):
-                print(f"CORS: Origin '{origin}' matched pattern '{pattern.pattern}'")
-                return True
-        elif pattern == origin:
-            print(f"CORS: Origin '{origin}' matched exact string '{pattern}'")
+        if pattern.match(origin):
+            debug_log.debug("CORS: Origin '%s' matched pattern", origin)
             return True
-    print(f"CORS: Origin '{origin}' not allowed")
+    debug_log.debug("CORS: Origin '%s' not allowed", origin)
     return False
 
-class CustomCORSMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next: Callable):
-        origin = request.headers.get("origin")
-        
-        if request.method == "OPTIONS":
-            if origin and is_origin_allowed(origin):
-                response = Response()
-                response.headers["Access-Control-Allow-Origin"] = origin
-                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-                response.headers["Access-Control-Allow-Headers"] = "*"
-                response.headers["Access-Control-Allow-Credentials"] = "true"
-                response.headers["Access-Control-Max-Age"] = "3600"
-                return response
+PREFLIGHT_HEADERS = [
+    (b"access-control-allow-methods", ALLOW_METHODS),
+    (b"access-control-allow-headers", b"*"),
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-max-age", b"3600"),
+    (b"content-length", b"0"),
+]
+SIMPLE_HEADERS = [
+    (b"access-control-allow-credentials", b"true"),
+    (b"access-control-allow-methods", ALLOW_METHODS),
+    (b"access-control-allow-headers", b"*"),
+]
+FORBIDDEN_HEADERS = [(b"content-length", b"0")]
+
+def vary_origin(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            if value.strip() != b"*" and b"origin" not in value.lower():
+                headers[index] = (name, value + b", Origin")
+            return headers
+    headers.append((b"vary", b"Origin"))
+    return headers
+
+class CustomCORSMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+                break
+        allowed = origin is not None and is_origin_allowed(origin.decode("latin-1"))
+
+        if scope["method"] == "OPTIONS":
+            if allowed:
+                headers = [(b"access-control-allow-origin", origin), (b"vary", b"Origin")] + PREFLIGHT_HEADERS
+                await send({"type": "http.response.start", "status": 200, "headers": headers})
             else:
-                return Response(status_code=403)
-        
-        response = await call_next(request)
-        
-        if origin and is_origin_allowed(origin):
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
-            response.headers["Access-Control-Allow-Headers"] = "*"
-        
-        return response
+                await send({"type": "http.response.start", "status": 403, "headers": FORBIDDEN_HEADERS})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not allowed:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", ()))
+                headers.append((b"access-control-allow-origin", origin))
+                headers.extend(SIMPLE_HEADERS)
+                vary_origin(headers)
+                message = {**message, "headers": headers}
+            await send(message)
 
+        await self.app(scope, receive, send_with_cors)
@@ -0,0 +1,45 @@
+import hmac
+import logging
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+import anyio
+import config
+from app.profiling import StackSampler, take_armed, write_profile
+
+logger = logging.getLogger(__name__)
+
+class ProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.directory = Path(config.PROFILE_DIR)
+        self.token = config.PROFILE_TOKEN.encode("latin-1")
+
+    def should_profile(self, scope) -> bool:
+        if take_armed():
+            return True
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == b"x-profile-token":
+                    return hmac.compare_digest(value, self.token)
+        return config.PROFILE_SAMPLE_RATE > 0 and random.random() < config.PROFILE_SAMPLE_RATE
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.should_profile(scope):
+            await self.app(scope, receive, send)
+            return
+
+        sampler = StackSampler(threading.get_ident(), config.PROFILE_INTERVAL, sys._getframe())
+        sampler.start()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            elapsed = time.perf_counter() - started
+            sampler.stop()
+            path = await anyio.to_thread.run_sync(
+                write_profile, self.directory, scope["method"], scope["path"], elapsed, sampler
+            )
+            logger.info("Profiling: %s %s took %.1fms, wrote %s", scope["method"], scope["path"], elapsed * 1000, path)
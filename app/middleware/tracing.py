@@ -0,0 +1,130 @@
+import random
+import time
+from typing import Optional
+import config
+from app.tracing import (
+    SPAN_KIND_SERVER,
+    Span,
+    Trace,
+    current_span,
+    format_traceparent,
+    get_exporter,
+    new_id,
+    parse_traceparent,
+)
+
+class TracingMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.sample_rate = config.TRACE_SAMPLE_RATE
+        self.slow_ns = int(config.TRACE_SLOW_MS * 1_000_000)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        remote = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                remote = parse_traceparent(value.decode("latin-1"))
+                break
+        if remote is not None:
+            trace_id, parent_id, sampled = remote
+        else:
+            trace_id, parent_id = new_id(128), None
+            sampled = self.sample_rate > 0 and random.random() < self.sample_rate
+        if not sampled:
+            if self.slow_ns:
+                await self.capture_slow(scope, receive, send, trace_id, parent_id)
+            else:
+                await self.app(scope, receive, send)
+            return
+
+        trace = Trace(trace_id, sampled)
+        root = Span(trace, scope["method"], parent_id, {"http.method": scope["method"], "http.target": scope["path"]}, SPAN_KIND_SERVER)
+        traceparent = (b"traceparent", format_traceparent(trace_id, root.span_id, sampled).encode("latin-1"))
+        send_span = None
+        send_wait = 0
+
+        async def send_with_span(message):
+            nonlocal send_span, send_wait
+            if message["type"] == "http.response.start":
+                root.attributes["http.status_code"] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [traceparent]}
+                send_span = root.child("http.send")
+            started = time.perf_counter_ns()
+            await send(message)
+            send_wait += time.perf_counter_ns() - started
+            if send_span is not None and not send_span.end and not message.get("more_body", False) \
+                    and message["type"] != "http.response.start":
+                send_span.attributes["send_wait_ms"] = round(send_wait / 1e6, 3)
+                send_span.finish()
+
+        with root:
+            await self.app(scope, receive, send_with_span)
+            if send_span is not None and not send_span.end:
+                send_span.finish()
+            route = scope.get("route")
+            path = getattr(route, "path", None)
+            if path:
+                root.name = f"{scope['method']} {path}"
+                root.attributes["http.route"] = path
+
+        exporter = get_exporter()
+        if exporter is not None:
+            exporter.submit(trace)
+
+    async def capture_slow(self, scope, receive, send, trace_id: str, parent_id: Optional[str]):
+        span_id = new_id(64)
+        traceparent = (b"traceparent", format_traceparent(trace_id, span_id, False).encode("latin-1"))
+        status = None
+        send_start = send_end = send_wait = 0
+
+        async def send_with_header(message):
+            nonlocal status, send_start, send_end, send_wait
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [traceparent]}
+                send_start = time.time_ns()
+            started = time.perf_counter_ns()
+            await send(message)
+            send_wait += time.perf_counter_ns() - started
+            if send_start and not send_end and not message.get("more_body", False) \
+                    and message["type"] != "http.response.start":
+                send_end = time.time_ns()
+
+        start = time.time_ns()
+        await self.app(scope, receive, send_with_header)
+        end = time.time_ns()
+        exporter = get_exporter()
+        if exporter is None or end - start < self.slow_ns:
+            return
+
+        trace = Trace(trace_id, False)
+        root = Span(trace, scope["method"], parent_id, {"http.method": scope["method"], "http.target": scope["path"]}, SPAN_KIND_SERVER, start)
+        root.span_id = span_id
+        if status is not None:
+            root.attributes["http.status_code"] = status
+        path = getattr(scope.get("route"), "path", None)
+        if path:
+            root.name = f"{scope['method']} {path}"
+            root.attributes["http.route"] = path
+        if send_start:
+            send_span = Span(trace, "http.send", span_id, {"send_wait_ms": round(send_wait / 1e6, 3)}, start=send_start)
+            send_span.finish(send_end or end)
+        root.finish(end)
+        exporter.submit(trace)
+
+class SpanMiddleware:
+    def __init__(self, app, name: str):
+        self.app = app
+        self.name = name
+
+    async def __call__(self, scope, receive, send):
+        parent = current_span()
+        if parent is None:
+            await self.app(scope, receive, send)
+            return
+        with parent.child(self.name):
+            await self.app(scope, receive, send)
@@ -6,6 +6,24 @@ class Status(str, Enum):
     SUCCESS = "success"
     ERROR = "error"
 
+class StreamFormat(str, Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+class SamplingMode(str, Enum):
+    IMAGE = "image"
+    BREED = "breed"
+    SUBBREED = "subbreed"
+
+class Orientation(str, Enum):
+    LANDSCAPE = "landscape"
+    PORTRAIT = "portrait"
+    SQUARE = "square"
+
+class ImageFormat(str, Enum):
+    JPEG = "jpeg"
+    PNG = "png"
+
 class APIResponse(BaseModel):
     status: Status
     message: Union[Dict, List[str], str]
@@ -1,5 +1,13 @@
-from typing import Dict, Any
-from fastapi import FastAPI
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, Optional, Set, Tuple
+from fastapi import FastAPI, Request, Response
+from fastapi.routing import APIRoute
+import config
+
+logger = logging.getLogger(__name__)
 
 def get_openapi_schema() -> Dict[str, Any]:
     return {
@@ -30,31 +38,77 @@ def get_openapi_schema() -> Dict[str, Any]:
         ]
     }
 
+def build_openapi(app: FastAPI) -> Dict[str, Any]:
+    from fastapi.openapi.utils import get_openapi
+    custom_spec = get_openapi_schema()
+    root_path = os.getenv("ROOT_PATH", "")
+    
+    openapi_schema = get_openapi(
+        title=app.title,
+        version=app.version,
+        description=app.description,
+        routes=app.routes,
+    )
+    if "tags" in custom_spec:
+        openapi_schema["tags"] = custom_spec["tags"]
+    if "servers" in custom_spec:
+        if root_path:
+            custom_spec["servers"][0]["url"] = root_path
+        openapi_schema["servers"] = custom_spec["servers"]
+    if "info" in custom_spec:
+        openapi_schema["info"].update(custom_spec["info"])
+    return openapi_schema
+
+def encode_openapi(schema: Dict[str, Any]) -> bytes:
+    return json.dumps(schema, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def schema_operations(app: FastAPI) -> Set[Tuple[str, str]]:
+    return {
+        (route.path_format, method.lower())
+        for route in app.routes
+        if isinstance(route, APIRoute) and route.include_in_schema
+        for method in route.methods
+    }
+
+def load_prebuilt_openapi(app: FastAPI, path: Path) -> Optional[Tuple[Dict[str, Any], bytes]]:
+    try:
+        body = path.read_bytes()
+        schema = json.loads(body)
+    except (OSError, ValueError) as e:
+        logger.warning("Prebuilt OpenAPI document %s ignored: %s", path, e)
+        return None
+    expected_server = os.getenv("ROOT_PATH", "") or get_openapi_schema()["servers"][0]["url"]
+    operations = {(path, method) for path, item in schema.get("paths", {}).items() for method in item}
+    if (
+        schema.get("info", {}).get("version") != app.version
+        or schema.get("servers", [{}])[0].get("url") != expected_server
+        or operations != schema_operations(app)
+    ):
+        logger.warning("Prebuilt OpenAPI document %s is stale, generating it from the routes", path)
+        return None
+    return schema, body
+
+def get_openapi_body(app: FastAPI) -> bytes:
+    body = getattr(app.state, "openapi_body", None)
+    if body is None:
+        body = app.state.openapi_body = encode_openapi(app.openapi())
+    return body
+
 def setup_custom_openapi(app: FastAPI):
     def custom_openapi():
         if app.openapi_schema:
             return app.openapi_schema
-        from fastapi.openapi.utils import get_openapi
-        import os
-        custom_spec = get_openapi_schema()
-        root_path = os.getenv("ROOT_PATH", "")
-        
-        openapi_schema = get_openapi(
-            title=app.title,
-            version=app.version,
-            description=app.description,
-            routes=app.routes,
-        )
-        if "tags" in custom_spec:
-            openapi_schema["tags"] = custom_spec["tags"]
-        if "servers" in custom_spec:
-            if root_path:
-                custom_spec["servers"][0]["url"] = root_path
-            openapi_schema["servers"] = custom_spec["servers"]
-        if "info" in custom_spec:
-            openapi_schema["info"].update(custom_spec["info"])
-        
-        app.openapi_schema = openapi_schema
+        prebuilt = load_prebuilt_openapi(app, Path(config.OPENAPI_PATH)) if config.OPENAPI_PATH else None
+        if prebuilt is not None:
+            app.openapi_schema, app.state.openapi_body = prebuilt
+        else:
+            app.openapi_schema = build_openapi(app)
         return app.openapi_schema
-    
+
+    async def openapi_json(request: Request) -> Response:
+        return Response(get_openapi_body(app), media_type="application/json")
+
     app.openapi = custom_openapi
+    if app.openapi_url:
+        app.router.routes = [route for route in app.router.routes if getattr(route, "path", None) != app.openapi_url]
+        app.add_route(app.openapi_url, openapi_json, include_in_schema=False)
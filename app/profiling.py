@@ -0,0 +1,130 @@
+import logging
+import os
+import random
+import re
+import signal
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional, Tuple
+import config
+
+logger = logging.getLogger(__name__)
+
+TOP_FRAMES = 15
+BACKGROUND_THREADS = frozenset({"stack-sampler", "catalog-watcher", "metrics-writer", "trace-exporter", "hot-promoter"})
+IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    filename = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+def collapse(frame, thread_name: str) -> str:
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    labels.append(thread_name)
+    labels.reverse()
+    return ";".join(labels)
+
+def runs_frame(frame, target) -> bool:
+    while frame is not None:
+        if frame is target:
+            return True
+        frame = frame.f_back
+    return False
+
+class StackSampler:
+    def __init__(self, thread_id: int, interval: float, task_frame=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.task_frame = task_frame
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elsewhere = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self):
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                name = names.get(thread_id, "unknown")
+                if thread_id != self.thread_id:
+                    if name in BACKGROUND_THREADS or frame.f_code.co_filename.endswith(IDLE_MODULES):
+                        continue
+                elif self.task_frame is not None and not runs_frame(frame, self.task_frame):
+                    self.elsewhere += 1
+                    continue
+                self.stacks[collapse(frame, name)] += 1
+            self.samples += 1
+
+def top_frames(stacks: Counter, limit: int = TOP_FRAMES) -> Tuple[List[Tuple[str, int]], List[Tuple[str, int]]]:
+    own: Counter = Counter()
+    total: Counter = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(";")
+        own[frames[-1]] += count
+        for label in set(frames):
+            total[label] += count
+    return own.most_common(limit), total.most_common(limit)
+
+def format_summary(method: str, path: str, elapsed: float, sampler: StackSampler) -> str:
+    own, total = top_frames(sampler.stacks)
+    samples = sum(sampler.stacks.values()) or 1
+    lines = [f"{method} {path} {elapsed * 1000:.1f}ms wall, {sampler.samples} samples every {sampler.interval * 1000:g}ms"]
+    if sampler.task_frame is not None:
+        lines.append(f"Event loop idle or running other requests in {sampler.elsewhere} samples (not shown)")
+    lines.append("")
+    lines.append("Self time:")
+    lines += [f"  {count / samples:6.1%}  {label}" for label, count in own]
+    lines.append("")
+    lines.append("Total time:")
+    lines += [f"  {count / samples:6.1%}  {label}" for label, count in total]
+    return "\n".join(lines) + "\n"
+
+def write_profile(directory: Path, method: str, path: str, elapsed: float, sampler: StackSampler) -> Path:
+    sampler.join()
+    directory.mkdir(parents=True, exist_ok=True)
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    name = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{method}-{slug[:60]}-{random.getrandbits(16):04x}"
+    folded = directory / f"{name}.folded"
+    folded.write_text("".join(f"{stack} {count}\n" for stack, count in sampler.stacks.items()))
+    (directory / f"{name}.txt").write_text(format_summary(method, path, elapsed, sampler))
+    return folded
+
+_armed = 0
+
+def arm(requests: int):
+    global _armed
+    _armed += requests
+
+def take_armed() -> bool:
+    global _armed
+    if _armed <= 0:
+        return False
+    _armed -= 1
+    return True
+
+def install_profile_signal():
+    if not config.PROFILE_DIR or not hasattr(signal, "SIGUSR2"):
+        return
+    try:
+        signal.signal(signal.SIGUSR2, lambda signum, frame: arm(config.PROFILE_SIGNAL_REQUESTS))
+    except ValueError:
+        logger.warning("Profiling: SIGUSR2 handler can only be installed from the main thread")
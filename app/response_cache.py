@@ -0,0 +1,93 @@
+import hashlib
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+import config
+from app.models import APIResponse
+from app.serialization import render_envelope
+from app.services.breed_service import get_catalog
+from app.tracing import span
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    etag: str
+
+class ResponseCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        if version != self.version:
+            self.clear()
+            self.version = version
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key: Hashable, body: bytes) -> CachedResponse:
+        entry = CachedResponse(body, make_etag(body))
+        if len(body) > self.max_bytes:
+            return entry
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous.body)
+        self._entries[key] = entry
+        self.size += len(body)
+        while self.size > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= len(evicted.body)
+        return entry
+
+def make_etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+response_cache = ResponseCache(config.RESPONSE_CACHE_BYTES)
+
+def render_json(content: Any) -> bytes:
+    if config.FAST_RESPONSES and isinstance(content, APIResponse):
+        return render_envelope(content.message, content.status)
+    with span("json.encode"):
+        return JSONResponse(jsonable_encoder(content)).body
+
+def cached_response(request: Request, key: Hashable, build: Callable[[], Any]) -> Response:
+    entry = response_cache.get(key, get_catalog().version)
+    if entry is None:
+        entry = response_cache.put(key, render_json(build()))
+
+    headers = {"ETag": entry.etag, "Vary": "Origin"}
+    if etag_matches(request.headers.get("if-none-match"), entry.etag):
+        response_cache.not_modified += 1
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,320 @@
+import json
+import logging
+import os
+import secrets
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+from app.metrics import metrics
+from app.response_cache import etag_matches
+from app.services.archive import ArchiveManifest, FileSlice, iter_segments, read_slice
+from app.services.image_cache import image_cache
+from app.services.image_files import ImageFile
+from app.services.io_executor import IOQueueFull, IOTimeout, io_executor
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+STREAM_BATCH_SIZE = 1000
+MAX_RANGES = 16
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def encode_batches(items: Iterable[str]) -> Iterable[List[str]]:
+    batch = []
+    for item in items:
+        batch.append(json.dumps(item, ensure_ascii=False))
+        if len(batch) >= STREAM_BATCH_SIZE:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def stream_ndjson(items: Iterable[str]) -> AsyncIterator[bytes]:
+    for batch in encode_batches(items):
+        yield ("\n".join(batch) + "\n").encode("utf-8")
+
+async def stream_json_envelope(items: Iterable[str]) -> AsyncIterator[bytes]:
+    yield b'{"status":"success","message":['
+    separator = ""
+    for batch in encode_batches(items):
+        yield (separator + ",".join(batch)).encode("utf-8")
+        separator = ","
+    yield b"]}"
+
+def parse_ranges(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    units, _, spec = header.partition("=")
+    if units.strip().lower() != "bytes":
+        return None
+
+    ranges = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        first, separator, last = part.partition("-")
+        if not separator:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                suffix = int(last)
+                if suffix > 0:
+                    ranges.append((max(0, size - suffix), size))
+                continue
+            start = int(first)
+            end = int(last) + 1 if last else max(size, start + 1)
+        except ValueError:
+            return None
+        if end <= start:
+            return None
+        if start < size:
+            ranges.append((start, min(end, size)))
+
+    if len(ranges) > MAX_RANGES:
+        return None
+    ranges.sort()
+    merged: List[Tuple[int, int]] = []
+    for start, end in ranges:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+def is_not_modified(headers: Headers, image: ImageFile) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag_matches(if_none_match, image.etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return image.mtime <= int(parsedate_to_datetime(if_modified_since).timestamp())
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def range_applies(headers: Headers, image: ImageFile) -> bool:
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if if_range.startswith('"'):
+        return if_range == image.etag
+    return if_range == image.last_modified
+
+def read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+class ArchiveResponse(Response):
+    media_type = "application/x-tar"
+
+    def __init__(self, manifest: ArchiveManifest, filename: str):
+        self.manifest = manifest
+        self.status_code = 200
+        self.background = None
+        self.raw_headers = [
+            (b"etag", manifest.etag.encode("latin-1")),
+            (b"accept-ranges", b"bytes"),
+            (b"content-disposition", f'attachment; filename="{filename}"'.encode("latin-1", "replace")),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        request_headers = Headers(scope=scope)
+        manifest = self.manifest
+        if etag_matches(request_headers.get("if-none-match"), manifest.etag):
+            await send({"type": "http.response.start", "status": 304, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        start, end, status = 0, manifest.size, 200
+        headers = self.raw_headers + [(b"content-type", self.media_type.encode("latin-1"))]
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if range_header and (if_range is None or if_range == manifest.etag):
+            ranges = parse_ranges(range_header, manifest.size)
+            if ranges is not None and not ranges:
+                headers = self.raw_headers + [
+                    (b"content-range", f"bytes */{manifest.size}".encode()),
+                    (b"content-length", b"0"),
+                ]
+                await send({"type": "http.response.start", "status": 416, "headers": headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+            if ranges is not None and len(ranges) == 1:
+                start, end = ranges[0]
+                status = 206
+                headers.append((b"content-range", f"bytes {start}-{end - 1}/{manifest.size}".encode()))
+
+        headers.append((b"content-length", str(end - start).encode()))
+        await send({"type": "http.response.start", "status": status, "headers": headers})
+        if scope["method"] == "HEAD":
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        buffer = bytearray()
+        for segment in iter_segments(manifest, start, end):
+            if isinstance(segment, FileSlice):
+                position = segment.start
+                while position < segment.end:
+                    length = min(CHUNK_SIZE - len(buffer), segment.end - position)
+                    try:
+                        buffer += await io_executor.run_committed(read_slice, segment.path, position, length)
+                    except OSError as e:
+                        logger.warning("Aborting archive stream: %s", e)
+                        return
+                    metrics.image_bytes_served += length
+                    position += length
+                    if len(buffer) >= CHUNK_SIZE:
+                        await send({"type": "http.response.body", "body": bytes(buffer), "more_body": True})
+                        buffer.clear()
+            else:
+                buffer += segment
+                if len(buffer) >= CHUNK_SIZE:
+                    await send({"type": "http.response.body", "body": bytes(buffer), "more_body": True})
+                    buffer.clear()
+        await send({"type": "http.response.body", "body": bytes(buffer)})
+
+class ImageFileResponse(Response):
+    def __init__(self, image: ImageFile, cache_control: str):
+        self.image = image
+        self.data: Optional[bytes] = None
+        self.status_code = 200
+        self.background = None
+        self.raw_headers = [
+            (b"etag", image.etag.encode("latin-1")),
+            (b"last-modified", image.last_modified.encode("latin-1")),
+            (b"cache-control", cache_control.encode("latin-1")),
+            (b"accept-ranges", b"bytes"),
+            (b"vary", b"Origin"),
+        ]
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        request_headers = Headers(scope=scope)
+        image = self.image
+        if is_not_modified(request_headers, image):
+            await send({"type": "http.response.start", "status": 304, "headers": self.raw_headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        ranges = None
+        range_header = request_headers.get("range")
+        if range_header and range_applies(request_headers, image):
+            ranges = parse_ranges(range_header, image.size)
+
+        content_type = image.content_type.encode("latin-1")
+        send_body = scope["method"] != "HEAD"
+        if send_body and image_cache.accepts(image.size):
+            self.data = image_cache.get(image.path, image.etag)
+            if self.data is None:
+                try:
+                    self.data = await io_executor.run_once(("read", image.path), read_file, image.path)
+                except (IOQueueFull, IOTimeout):
+                    pass
+                if self.data is not None and len(self.data) == image.size:
+                    image_cache.put(image.path, image.etag, self.data)
+                else:
+                    self.data = None
+        extensions = scope.get("extensions") or {}
+
+        if ranges is None:
+            headers = self.raw_headers + [
+                (b"content-type", content_type),
+                (b"content-length", str(image.size).encode()),
+            ]
+            await send({"type": "http.response.start", "status": 200, "headers": headers})
+            if send_body:
+                await self.send_file(send, extensions, 0, image.size, more_body=False)
+            else:
+                await send({"type": "http.response.body", "body": b""})
+            return
+
+        if not ranges:
+            headers = self.raw_headers + [
+                (b"content-range", f"bytes */{image.size}".encode()),
+                (b"content-length", b"0"),
+            ]
+            await send({"type": "http.response.start", "status": 416, "headers": headers})
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            headers = self.raw_headers + [
+                (b"content-type", content_type),
+                (b"content-range", f"bytes {start}-{end - 1}/{image.size}".encode()),
+                (b"content-length", str(end - start).encode()),
+            ]
+            await send({"type": "http.response.start", "status": 206, "headers": headers})
+            if send_body:
+                await self.send_file(send, extensions, start, end, more_body=False)
+            else:
+                await send({"type": "http.response.body", "body": b""})
+            return
+
+        boundary = secrets.token_hex(16)
+        part_headers = [
+            (
+                f"--{boundary}\r\nContent-Type: {image.content_type}\r\n"
+                f"Content-Range: bytes {start}-{end - 1}/{image.size}\r\n\r\n"
+            ).encode("latin-1")
+            for start, end in ranges
+        ]
+        closing = f"--{boundary}--\r\n".encode("latin-1")
+        length = sum(len(part) + end - start + 2 for part, (start, end) in zip(part_headers, ranges))
+        length += len(closing)
+        headers = self.raw_headers + [
+            (b"content-type", f"multipart/byteranges; boundary={boundary}".encode("latin-1")),
+            (b"content-length", str(length).encode()),
+        ]
+        await send({"type": "http.response.start", "status": 206, "headers": headers})
+        if not send_body:
+            await send({"type": "http.response.body", "body": b""})
+            return
+        for part, (start, end) in zip(part_headers, ranges):
+            await send({"type": "http.response.body", "body": part, "more_body": True})
+            await self.send_file(send, extensions, start, end, more_body=True)
+            await send({"type": "http.response.body", "body": b"\r\n", "more_body": True})
+        await send({"type": "http.response.body", "body": closing})
+
+    async def send_file(self, send: Send, extensions: dict, start: int, end: int, more_body: bool):
+        metrics.image_bytes_served += end - start
+        if self.data is not None:
+            body = self.data if start == 0 and end == len(self.data) else self.data[start:end]
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+            return
+
+        path = self.image.path
+        if "http.response.pathsend" in extensions and start == 0 and end == self.image.size and not more_body:
+            await send({"type": "http.response.pathsend", "path": os.fspath(path)})
+            return
+
+        if "http.response.zerocopysend" in extensions:
+            with open(path, "rb") as file:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": file,
+                    "offset": start,
+                    "count": end - start,
+                    "more_body": more_body,
+                })
+            return
+
+        remaining = end - start
+        async with await anyio.open_file(path, "rb") as file:
+            if start:
+                await file.seek(start)
+            while remaining > 0:
+                chunk = await file.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({
+                    "type": "http.response.body",
+                    "body": chunk,
+                    "more_body": more_body or remaining > 0,
+                })
+        if (remaining > 0 or start == end) and not more_body:
+            await send({"type": "http.response.body", "body": b""})
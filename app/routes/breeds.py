@@ -1,8 +1,13 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Query, Request
+from app.metrics import metrics
 from app.models import APIResponse, success_response
-from app.services.breed_service import scan_breeds
+from app.response_cache import cached_response
+from app.services.breed_search import normalize
+from app.services.breed_service import scan_breeds, search_breeds
+from app.tracing import TracedRoute
+import config
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
 
 @router.get(
     "/breeds/list/all",
@@ -11,9 +16,23 @@ router = APIRouter()
     summary="List all breeds",
     description="Returns a list of all available dog breeds and their sub-breeds"
 )
-async def list_all_breeds():
-    breeds = scan_breeds()
-    return success_response(breeds)
+async def list_all_breeds(request: Request):
+    return cached_response(request, ("breeds",), lambda: success_response(scan_breeds()))
+
+@router.get(
+    "/breeds/search",
+    response_model=APIResponse,
+    tags=["Breeds"],
+    summary="Search breeds",
+    description="Returns breeds and sub-breeds (as breed/sub-breed) matching a prefix, tolerating small typos, best matches first"
+)
+async def search_breed_names(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=64, description="Breed or sub-breed name, or its beginning"),
+    limit: int = Query(10, ge=1, le=config.BREED_SEARCH_MAX_LIMIT, description="Maximum number of matches"),
+):
+    query = normalize(q)
+    return cached_response(request, ("search", query, limit), lambda: success_response(search_breeds(query, limit)))
 
 @router.get(
     "/breed/{breed}/list",
@@ -22,11 +41,15 @@ async def list_all_breeds():
     summary="Get breed sub-breeds",
     description="Returns a list of sub-breeds for a specific breed"
 )
-async def breed_subbreeds(breed: str):
-    breeds = scan_breeds()
-    
-    if breed not in breeds:
-        raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found")
+async def breed_subbreeds(breed: str, request: Request):
+    def build():
+        breeds = scan_breeds()
+        
+        if breed not in breeds:
+            metrics.lookup_misses["breed"] += 1
+            raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found")
+        
+        return success_response(breeds[breed])
     
-    return success_response(breeds[breed])
+    return cached_response(request, ("subbreeds", breed), build)
 
@@ -1,11 +1,97 @@
-import random
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-from app.models import APIResponse, success_response
-from app.services.breed_service import get_breed_images, get_image_url, get_all_images
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import StreamingResponse
+from app.models import APIResponse, ImageFormat, Orientation, SamplingMode, StreamFormat, success_response
+from app.response_cache import cached_response
+from app.responses import IMMUTABLE_CACHE_CONTROL, ArchiveResponse, ImageFileResponse, stream_json_envelope, stream_ndjson
+from app.serialization import envelope_response
+from app.services.breed_service import (
+    InvalidCursor,
+    get_breed_image_urls,
+    get_image_window,
+    get_random_image_url,
+    get_random_image_urls,
+    has_images,
+    iter_image_urls,
+)
+from app.services.archive import archive_name, resolve_archive
+from app.services.image_files import InvalidImagePath, resolve_image
+from app.services.image_metadata import ImageFilter
+from app.services.io_executor import IOQueueFull, IOTimeout
+from app.tracing import TracedRoute
 import config
 
-router = APIRouter()
+router = APIRouter(route_class=TracedRoute)
+
+LIMIT_QUERY = Query(None, ge=1, le=config.IMAGE_PAGE_MAX_LIMIT, description="Maximum number of images to return")
+CURSOR_QUERY = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page")
+COUNT_PATH = Path(..., ge=1, description=f"Number of distinct images to return (capped at {config.RANDOM_BATCH_MAX})")
+MODE_QUERY = Query(
+    SamplingMode.IMAGE,
+    description="Sample uniformly over images, breeds or sub-breeds (weighted by BREED_WEIGHTS)",
+)
+STREAM_QUERY = Query(None, description="Stream the listing as NDJSON lines or a chunked JSON envelope")
+
+async def image_filter(
+    min_width: Optional[int] = Query(None, ge=1, description="Only images at least this many pixels wide"),
+    min_height: Optional[int] = Query(None, ge=1, description="Only images at least this many pixels high"),
+    max_bytes: Optional[int] = Query(None, ge=1, description="Only images no larger than this many bytes"),
+    orientation: Optional[Orientation] = Query(None, description="Only landscape, portrait or square images"),
+    format: Optional[ImageFormat] = Query(None, description="Only images in this format"),
+) -> ImageFilter:
+    return ImageFilter(min_width, min_height, max_bytes, orientation, format)
+
+FILTER_DEPENDS = Depends(image_filter)
+ARCHIVE_RESPONSES = {200: {"content": {"application/x-tar": {}}, "description": "Tar archive of the images"}}
+
+def require_images(breed: str, subbreed: Optional[str] = None):
+    if not has_images(breed, subbreed):
+        if subbreed:
+            raise HTTPException(status_code=404, detail=f"Sub-breed '{breed}/{subbreed}' not found or has no images")
+        raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found or has no images")
+
+def image_listing_response(
+    breed: str,
+    subbreed: Optional[str],
+    limit: Optional[int],
+    cursor: Optional[str],
+    stream: Optional[StreamFormat],
+    filters: ImageFilter,
+    not_found: str,
+):
+    try:
+        window = get_image_window(breed, subbreed, cursor, limit, filters)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid or expired cursor")
+    
+    if window is None or (cursor is None and window.start == window.stop):
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    headers = {}
+    if window.next_cursor:
+        headers["X-Next-Cursor"] = window.next_cursor
+    
+    if stream == StreamFormat.NDJSON:
+        body = stream_ndjson(iter_image_urls(window))
+        return StreamingResponse(body, media_type="application/x-ndjson", headers=headers)
+    if stream == StreamFormat.JSON:
+        body = stream_json_envelope(iter_image_urls(window))
+        return StreamingResponse(body, media_type="application/json", headers=headers)
+    return envelope_response(list(iter_image_urls(window)), headers=headers)
+
+async def archive_response(breed: str, subbreed: Optional[str], not_found: str):
+    require_images(breed, subbreed)
+    try:
+        manifest = await resolve_archive(breed, subbreed)
+    except IOQueueFull:
+        raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+    except IOTimeout:
+        raise HTTPException(status_code=504, detail="Image lookup timed out")
+    
+    if manifest is None:
+        raise HTTPException(status_code=404, detail=not_found)
+    
+    return ArchiveResponse(manifest, archive_name(breed, subbreed))
 
 @router.get(
     "/breeds/image/random",
@@ -14,14 +100,28 @@ router = APIRouter()
     summary="Get random image",
     description="Returns a random dog image URL from all available breeds"
 )
-async def random_image():
-    all_images = get_all_images()
+async def random_image(mode: SamplingMode = MODE_QUERY, filters: ImageFilter = FILTER_DEPENDS):
+    image_url = get_random_image_url(mode=mode.value, image_filter=filters)
+    
+    if image_url is None:
+        raise HTTPException(status_code=404, detail="No images found")
+    
+    return envelope_response(image_url)
+
+@router.get(
+    "/breeds/image/random/{n}",
+    response_model=APIResponse,
+    tags=["Images"],
+    summary="Get multiple random images",
+    description="Returns up to n distinct random dog image URLs from all available breeds"
+)
+async def random_images(n: int = COUNT_PATH, mode: SamplingMode = MODE_QUERY, filters: ImageFilter = FILTER_DEPENDS):
+    image_urls = get_random_image_urls(min(n, config.RANDOM_BATCH_MAX), mode=mode.value, image_filter=filters)
     
-    if not all_images:
+    if not image_urls:
         raise HTTPException(status_code=404, detail="No images found")
     
-    random_image = random.choice(all_images)
-    return success_response(get_image_url(random_image))
+    return envelope_response(image_urls)
 
 @router.get(
     "/breed/{breed}/images",
@@ -30,14 +130,28 @@ async def random_image():
     summary="Get breed images",
     description="Returns all image URLs for a specific breed"
 )
-async def breed_images(breed: str):
-    images = get_breed_images(breed)
+async def breed_images(
+    breed: str,
+    request: Request,
+    limit: Optional[int] = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    stream: Optional[StreamFormat] = STREAM_QUERY,
+    filters: ImageFilter = FILTER_DEPENDS,
+):
+    require_images(breed)
+    if limit is not None or cursor is not None or stream is not None or filters.active:
+        not_found = f"Breed '{breed}' not found or has no images"
+        return image_listing_response(breed, None, limit, cursor, stream, filters, not_found)
     
-    if not images:
-        raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found or has no images")
+    def build():
+        image_urls = get_breed_image_urls(breed)
+        
+        if not image_urls:
+            raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found or has no images")
+        
+        return success_response(image_urls)
     
-    image_urls = [get_image_url(img) for img in images]
-    return success_response(image_urls)
+    return cached_response(request, ("images", breed), build)
 
 @router.get(
     "/breed/{breed}/images/random",
@@ -46,14 +160,30 @@ async def breed_images(breed: str):
     summary="Get random breed image",
     description="Returns a random image URL for a specific breed"
 )
-async def random_breed_image(breed: str):
-    images = get_breed_images(breed)
+async def random_breed_image(breed: str, filters: ImageFilter = FILTER_DEPENDS):
+    require_images(breed)
+    image_url = get_random_image_url(breed, image_filter=filters)
+    
+    if image_url is None:
+        raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found or has no images")
+    
+    return envelope_response(image_url)
+
+@router.get(
+    "/breed/{breed}/images/random/{n}",
+    response_model=APIResponse,
+    tags=["Images"],
+    summary="Get multiple random breed images",
+    description="Returns up to n distinct random image URLs for a specific breed"
+)
+async def random_breed_images(breed: str, n: int = COUNT_PATH, filters: ImageFilter = FILTER_DEPENDS):
+    require_images(breed)
+    image_urls = get_random_image_urls(min(n, config.RANDOM_BATCH_MAX), breed, image_filter=filters)
     
-    if not images:
+    if not image_urls:
         raise HTTPException(status_code=404, detail=f"Breed '{breed}' not found or has no images")
     
-    random_image = random.choice(images)
-    return success_response(get_image_url(random_image))
+    return envelope_response(image_urls)
 
 @router.get(
     "/breed/{breed}/{subbreed}/images",
@@ -62,14 +192,29 @@ async def random_breed_image(breed: str):
     summary="Get sub-breed images",
     description="Returns all image URLs for a specific sub-breed"
 )
-async def subbreed_images(breed: str, subbreed: str):
-    images = get_breed_images(breed, subbreed)
+async def subbreed_images(
+    breed: str,
+    subbreed: str,
+    request: Request,
+    limit: Optional[int] = LIMIT_QUERY,
+    cursor: Optional[str] = CURSOR_QUERY,
+    stream: Optional[StreamFormat] = STREAM_QUERY,
+    filters: ImageFilter = FILTER_DEPENDS,
+):
+    require_images(breed, subbreed)
+    if limit is not None or cursor is not None or stream is not None or filters.active:
+        not_found = f"Sub-breed '{breed}/{subbreed}' not found or has no images"
+        return image_listing_response(breed, subbreed, limit, cursor, stream, filters, not_found)
     
-    if not images:
-        raise HTTPException(status_code=404, detail=f"Sub-breed '{breed}/{subbreed}' not found or has no images")
+    def build():
+        image_urls = get_breed_image_urls(breed, subbreed)
+        
+        if not image_urls:
+            raise HTTPException(status_code=404, detail=f"Sub-breed '{breed}/{subbreed}' not found or has no images")
+        
+        return success_response(image_urls)
     
-    image_urls = [get_image_url(img) for img in images]
-    return success_response(image_urls)
+    return cached_response(request, ("images", breed, subbreed), build)
 
 @router.get(
     "/breed/{breed}/{subbreed}/images/random",
@@ -78,14 +223,57 @@ async def subbreed_images(breed: str, subbreed: str):
     summary="Get random sub-breed image",
     description="Returns a random image URL for a specific sub-breed"
 )
-async def random_subbreed_image(breed: str, subbreed: str):
-    images = get_breed_images(breed, subbreed)
+async def random_subbreed_image(breed: str, subbreed: str, filters: ImageFilter = FILTER_DEPENDS):
+    require_images(breed, subbreed)
+    image_url = get_random_image_url(breed, subbreed, image_filter=filters)
+    
+    if image_url is None:
+        raise HTTPException(status_code=404, detail=f"Sub-breed '{breed}/{subbreed}' not found or has no images")
+    
+    return envelope_response(image_url)
+
+@router.get(
+    "/breed/{breed}/{subbreed}/images/random/{n}",
+    response_model=APIResponse,
+    tags=["Images"],
+    summary="Get multiple random sub-breed images",
+    description="Returns up to n distinct random image URLs for a specific sub-breed"
+)
+async def random_subbreed_images(
+    breed: str, subbreed: str, n: int = COUNT_PATH, filters: ImageFilter = FILTER_DEPENDS
+):
+    require_images(breed, subbreed)
+    image_urls = get_random_image_urls(min(n, config.RANDOM_BATCH_MAX), breed, subbreed, image_filter=filters)
     
-    if not images:
+    if not image_urls:
         raise HTTPException(status_code=404, detail=f"Sub-breed '{breed}/{subbreed}' not found or has no images")
     
-    random_image = random.choice(images)
-    return success_response(get_image_url(random_image))
+    return envelope_response(image_urls)
+
+@router.get(
+    "/breed/{breed}/archive",
+    response_class=ArchiveResponse,
+    status_code=200,
+    responses=ARCHIVE_RESPONSES,
+    tags=["Images"],
+    summary="Download breed archive",
+    description="Streams all images of a breed as a tar archive; supports Range requests to resume a download",
+)
+async def breed_archive(breed: str):
+    return await archive_response(breed, None, f"Breed '{breed}' not found or has no images")
+
+@router.get(
+    "/breed/{breed}/{subbreed}/archive",
+    response_class=ArchiveResponse,
+    status_code=200,
+    responses=ARCHIVE_RESPONSES,
+    tags=["Images"],
+    summary="Download sub-breed archive",
+    description="Streams all images of a sub-breed as a tar archive; supports Range requests to resume a download",
+)
+async def subbreed_archive(breed: str, subbreed: str):
+    not_found = f"Sub-breed '{breed}/{subbreed}' not found or has no images"
+    return await archive_response(breed, subbreed, not_found)
 
 @router.get(
     "/images/{file_path:path}",
@@ -93,11 +281,23 @@ async def random_subbreed_image(breed: str, subbreed: str):
     summary="Serve image file",
     description="Serves the actual image file by path"
 )
-async def serve_image(file_path: str):
-    image_path = config.ASSETS_DIR / file_path
+async def serve_image(
+    file_path: str,
+    v: Optional[str] = Query(None, description="Content version (the image ETag) for immutable caching"),
+):
+    try:
+        image = await resolve_image(file_path)
+    except InvalidImagePath:
+        raise HTTPException(status_code=400, detail="Invalid image path")
+    except IOQueueFull:
+        raise HTTPException(status_code=503, detail="Server busy", headers={"Retry-After": "1"})
+    except IOTimeout:
+        raise HTTPException(status_code=504, detail="Image lookup timed out")
     
-    if not image_path.exists() or not image_path.is_file():
+    if image is None:
         raise HTTPException(status_code=404, detail="Image not found")
     
-    return FileResponse(image_path)
+    if v and v == image.etag.strip('"'):
+        return ImageFileResponse(image, IMMUTABLE_CACHE_CONTROL)
+    return ImageFileResponse(image, config.IMAGE_CACHE_CONTROL)
 
@@ -0,0 +1,9 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+from app.metrics import CONTENT_TYPE, collect
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(collect(), media_type=CONTENT_TYPE)
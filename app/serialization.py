@@ -0,0 +1,34 @@
+import json
+from typing import Any, Dict, List, Mapping, Optional, Union
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, Response
+import config
+from app.models import Status, success_response
+from app.tracing import span
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+def render_envelope(message: Union[Dict, List[str], str], status: Status = Status.SUCCESS) -> bytes:
+    with span("json.encode"):
+        return dumps({"status": status.value, "message": message})
+
+class EnvelopeResponse(Response):
+    media_type = "application/json"
+
+    def __init__(self, message: Union[Dict, List[str], str], headers: Optional[Mapping[str, str]] = None):
+        super().__init__(render_envelope(message), headers=headers)
+
+def envelope_response(message: Union[Dict, List[str], str], headers: Optional[Mapping[str, str]] = None):
+    if config.FAST_RESPONSES:
+        return EnvelopeResponse(message, headers=headers)
+    if headers:
+        return JSONResponse(jsonable_encoder(success_response(message)), headers=headers)
+    return success_response(message)
@@ -0,0 +1,119 @@
+import hashlib
+import os
+import tarfile
+from bisect import bisect_right
+from typing import Iterator, List, NamedTuple, Optional, Sequence, Tuple, Union
+from app.metrics import metrics
+from app.services.breed_service import get_catalog
+from app.services.io_executor import io_executor
+
+BLOCK_SIZE = tarfile.BLOCKSIZE
+TRAILER_SIZE = 2 * BLOCK_SIZE
+ZEROS = bytes(BLOCK_SIZE)
+
+class ArchiveMember(NamedTuple):
+    path: str
+    offset: int
+    header: bytes
+    size: int
+
+    @property
+    def data_start(self) -> int:
+        return self.offset + len(self.header)
+
+    @property
+    def end(self) -> int:
+        return self.data_start + padded(self.size)
+
+class FileSlice(NamedTuple):
+    path: str
+    start: int
+    end: int
+
+class ArchiveManifest(NamedTuple):
+    members: Tuple[ArchiveMember, ...]
+    offsets: Tuple[int, ...]
+    size: int
+    etag: str
+
+def padded(size: int) -> int:
+    return -(-size // BLOCK_SIZE) * BLOCK_SIZE
+
+def member_header(name: str, size: int, mtime: int) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = mtime
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, "utf-8", "surrogateescape")
+
+def build_manifest(entries: Sequence[Tuple[str, str]]) -> ArchiveManifest:
+    members: List[ArchiveMember] = []
+    digest = hashlib.blake2b(digest_size=16)
+    offset = 0
+    for rel, path in entries:
+        metrics.count_fs("stat")
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        member = ArchiveMember(path, offset, member_header(rel, stat.st_size, int(stat.st_mtime)), stat.st_size)
+        members.append(member)
+        digest.update(f"{rel}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8", "surrogateescape"))
+        offset = member.end
+    return ArchiveManifest(
+        tuple(members),
+        tuple(member.offset for member in members),
+        offset + TRAILER_SIZE,
+        f'"{digest.hexdigest()}"',
+    )
+
+def zeros(length: int) -> Iterator[bytes]:
+    while length > 0:
+        chunk = min(length, BLOCK_SIZE)
+        yield ZEROS[:chunk]
+        length -= chunk
+
+def iter_segments(manifest: ArchiveManifest, start: int, end: int) -> Iterator[Union[bytes, FileSlice]]:
+    position = start
+    index = max(0, bisect_right(manifest.offsets, start) - 1)
+    for member in manifest.members[index:]:
+        if position >= end:
+            return
+        data_start = member.data_start
+        data_end = data_start + member.size
+        if position < data_start:
+            stop = min(end, data_start)
+            yield member.header[position - member.offset:stop - member.offset]
+            position = stop
+        if position < data_end and position < end:
+            stop = min(end, data_end)
+            yield FileSlice(member.path, position - data_start, stop - data_start)
+            position = stop
+        if position < member.end and position < end:
+            stop = min(end, member.end)
+            yield from zeros(stop - position)
+            position = stop
+    yield from zeros(end - position)
+
+class ArchiveSourceChanged(OSError):
+    pass
+
+def read_slice(path: str, start: int, length: int) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(start)
+        data = file.read(length)
+    if len(data) < length:
+        raise ArchiveSourceChanged(f"{path} is shorter than when the archive was planned")
+    return data
+
+def archive_name(breed: str, sub_breed: Optional[str]) -> str:
+    return f"{breed}-{sub_breed}.tar" if sub_breed else f"{breed}.tar"
+
+async def resolve_archive(breed: str, sub_breed: Optional[str] = None) -> Optional[ArchiveManifest]:
+    catalog = get_catalog()
+    bounds = catalog.image_range(breed, sub_breed)
+    if bounds is None:
+        return None
+    entries = [(catalog.images[index], catalog.path(index)) for index in range(*bounds)]
+    manifest = await io_executor.run_committed(build_manifest, entries)
+    return manifest if manifest.members else None
@@ -0,0 +1,115 @@
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+from app.services.catalog import Catalog
+
+MATCH_EXACT = 0
+MATCH_PREFIX = 1
+MATCH_FUZZY = 2
+
+def normalize(text: str) -> str:
+    return " ".join(re.sub(r"[-_/]+", " ", text.lower()).split())
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+def max_typos(query: str) -> int:
+    return 1 if len(query) <= 4 else 2
+
+class BKTree:
+    def __init__(self, words: List[str]):
+        self.root: Optional[Tuple[str, Dict[int, tuple]]] = None
+        for word in words:
+            self.add(word)
+
+    def add(self, word: str):
+        if self.root is None:
+            self.root = (word, {})
+            return
+        node = self.root
+        while True:
+            distance = edit_distance(word, node[0], len(word) + len(node[0]))
+            if distance == 0:
+                return
+            child = node[1].get(distance)
+            if child is None:
+                node[1][distance] = (word, {})
+                return
+            node = child
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        found = []
+        pending = [self.root] if self.root is not None else []
+        while pending:
+            term, children = pending.pop()
+            distance = edit_distance(word, term, len(word) + len(term))
+            if distance <= max_distance:
+                found.append((distance, term))
+            for edge, child in children.items():
+                if distance - max_distance <= edge <= distance + max_distance:
+                    pending.append(child)
+        return found
+
+class BreedSearchIndex:
+    def __init__(self, breeds: Dict[str, List[str]]):
+        targets: Dict[str, List[str]] = {}
+        for breed, sub_breeds in breeds.items():
+            self._add(targets, breed, breed)
+            for sub_breed in sub_breeds:
+                target = f"{breed}/{sub_breed}"
+                self._add(targets, sub_breed, target)
+                self._add(targets, f"{sub_breed} {breed}", target)
+                self._add(targets, f"{breed} {sub_breed}", target)
+        self.terms = sorted(targets)
+        self.targets = targets
+        self.tree = BKTree(self.terms)
+
+    @staticmethod
+    def _add(targets: Dict[str, List[str]], term: str, target: str):
+        term = normalize(term)
+        if term and target not in targets.setdefault(term, []):
+            targets[term].append(target)
+
+    def search(self, query: str, limit: int) -> List[str]:
+        query = normalize(query)
+        if not query:
+            return []
+        ranked: Dict[str, Tuple[int, int, int, str]] = {}
+
+        def rank(term: str, kind: int, distance: int = 0):
+            for target in self.targets[term]:
+                key = (kind, distance, len(term), target)
+                if target not in ranked or key < ranked[target]:
+                    ranked[target] = key
+
+        position = bisect_left(self.terms, query)
+        while position < len(self.terms) and self.terms[position].startswith(query):
+            term = self.terms[position]
+            rank(term, MATCH_EXACT if term == query else MATCH_PREFIX)
+            position += 1
+
+        if len(ranked) < limit:
+            for distance, term in self.tree.search(query, max_typos(query)):
+                rank(term, MATCH_FUZZY, distance)
+
+        return sorted(ranked, key=ranked.__getitem__)[:limit]
+
+_index: Optional[BreedSearchIndex] = None
+_index_catalog: Optional[Catalog] = None
+
+def get_search_index(catalog: Catalog) -> BreedSearchIndex:
+    global _index, _index_catalog
+    if _index is None or _index_catalog.version != catalog.version:
+        _index = BreedSearchIndex(catalog.breeds)
+        _index_catalog = catalog
+    return _index
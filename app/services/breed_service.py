@@ -1,63 +1,201 @@
+import base64
+import binascii
+import random
+import threading
+from bisect import bisect_left
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Union
 import config
+from app.metrics import metrics
+from app.services.breed_search import get_search_index
+from app.services.catalog import Catalog
+from app.services.catalog_snapshot import load_snapshot
+from app.services.image_metadata import ImageFilter, match_images
+from app.services.sampling import CatalogSampler
+from app.tracing import traced
 
+_catalog: Optional[Catalog] = None
+_sampler: Optional[CatalogSampler] = None
+catalog_lock = threading.Lock()
+
+class InvalidCursor(ValueError):
+    pass
+
+class ImageWindow(NamedTuple):
+    catalog: Catalog
+    start: int
+    stop: int
+    next_cursor: Optional[str]
+    indices: Optional[Sequence[int]] = None
+
+def asset_roots() -> List[Path]:
+    return list(config.ASSETS_DIRS) or [config.ASSETS_DIR]
+
+@traced
+def load_catalog() -> Catalog:
+    roots = asset_roots()
+    catalog = None
+    if config.CATALOG_SNAPSHOT:
+        catalog = load_snapshot(Path(config.CATALOG_SNAPSHOT), roots)
+    if catalog is None:
+        catalog = Catalog.build_tiered(roots)
+    set_catalog(catalog)
+    return catalog
+
+def set_catalog(catalog: Catalog):
+    global _catalog, _sampler
+    if catalog is None:
+        _sampler = None
+    elif _sampler is None or _sampler.catalog.version != catalog.version:
+        _sampler = CatalogSampler(catalog, config.BREED_WEIGHTS)
+    _catalog = catalog
+
+def replace_catalog(expected: Catalog, catalog: Catalog) -> bool:
+    with catalog_lock:
+        if _catalog is not expected:
+            return False
+        set_catalog(catalog)
+        return True
+
+def get_catalog() -> Catalog:
+    catalog = _catalog
+    if catalog is None:
+        catalog = load_catalog()
+    return catalog
+
+def get_sampler() -> CatalogSampler:
+    global _sampler
+    catalog = get_catalog()
+    sampler = _sampler
+    if sampler is None or sampler.catalog.version != catalog.version:
+        sampler = _sampler = CatalogSampler(catalog, config.BREED_WEIGHTS)
+    return sampler
+
+@traced
 def scan_breeds() -> Dict[str, List[str]]:
-    breeds = {}
-    if not config.ASSETS_DIR.exists():
-        return breeds
-    
-    for breed_dir in config.ASSETS_DIR.iterdir():
-        if not breed_dir.is_dir():
-            continue
-        
-        breed_name = breed_dir.name
-        sub_breeds = []
-        
-        for item in breed_dir.iterdir():
-            if item.is_dir():
-                sub_breeds.append(item.name)
-        
-        breeds[breed_name] = sub_breeds if sub_breeds else []
-    
-    return breeds
+    return get_catalog().breeds
+
+@traced
+def search_breeds(query: str, limit: int) -> List[str]:
+    return get_search_index(get_catalog()).search(query, limit)
+
+def has_images(breed: str, sub_breed: Optional[str] = None) -> bool:
+    if get_catalog().image_range(breed, sub_breed) is not None:
+        return True
+    metrics.lookup_misses["subbreed" if sub_breed else "breed"] += 1
+    return False
 
 def get_breed_images(breed: str, sub_breed: str = None) -> List[Path]:
-    breed_path = config.ASSETS_DIR / breed
-    
-    if not breed_path.exists():
+    catalog = get_catalog()
+    bounds = catalog.image_range(breed, sub_breed)
+    if bounds is None:
         return []
-    
-    images = []
-    
-    if sub_breed:
-        sub_breed_path = breed_path / sub_breed
-        if sub_breed_path.exists() and sub_breed_path.is_dir():
-            images.extend([item for item in sub_breed_path.iterdir() if item.suffix.lower() in ['.jpg', '.jpeg', '.png']])
+    return [Path(catalog.path(index)) for index in range(*bounds)]
+
+def get_image_url(image_path: Union[Path, str]) -> str:
+    if isinstance(image_path, Path):
+        roots = asset_roots()
+        for root in roots:
+            try:
+                image_path = image_path.relative_to(root).as_posix()
+                break
+            except ValueError:
+                if root is roots[-1]:
+                    raise
+    return f"{config.BASE_URL_IMG}/images/{image_path}"
+
+@traced
+def get_breed_image_urls(breed: str, sub_breed: str = None) -> List[str]:
+    prefix = f"{config.BASE_URL_IMG}/images/"
+    return [prefix + rel for rel in get_catalog().images_in(breed, sub_breed)]
+
+def filtered_images(catalog: Catalog, breed: str, sub_breed: str, image_filter: ImageFilter) -> Sequence[int]:
+    if breed is None:
+        start, end = 0, len(catalog)
     else:
-        for item in breed_path.iterdir():
-            if item.is_file() and item.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                images.append(item)
-            elif item.is_dir():
-                for img in item.rglob('*'):
-                    if img.is_file() and img.suffix.lower() in ['.jpg', '.jpeg', '.png']:
-                        images.append(img)
-    
-    return images
-
-def get_image_url(image_path: Path) -> str:
-    relative_path = image_path.relative_to(config.ASSETS_DIR)
-    return f"{config.BASE_URL_IMG}/images/{relative_path.as_posix()}"
+        bounds = catalog.image_range(breed, sub_breed)
+        if bounds is None:
+            return ()
+        start, end = bounds
+    return match_images(catalog, start, end, image_filter)
+
+@traced
+def get_random_image_url(
+    breed: str = None, sub_breed: str = None, mode: str = None, image_filter: ImageFilter = None
+) -> Optional[str]:
+    if image_filter is not None and image_filter.active:
+        urls = get_random_image_urls(1, breed, sub_breed, mode, image_filter)
+        return urls[0] if urls else None
+    if mode is not None:
+        image = get_sampler().draw(mode)
+    else:
+        image = get_catalog().random_image(breed, sub_breed)
+    if image is None:
+        return None
+    return get_image_url(image)
+
+@traced
+def get_random_image_urls(
+    count: int, breed: str = None, sub_breed: str = None, mode: str = None, image_filter: ImageFilter = None
+) -> List[str]:
+    prefix = f"{config.BASE_URL_IMG}/images/"
+    if image_filter is not None and image_filter.active:
+        catalog = get_catalog()
+        matches = filtered_images(catalog, breed, sub_breed, image_filter)
+        return [prefix + catalog.images[index] for index in random.sample(matches, min(count, len(matches)))]
+    if mode is not None:
+        images = get_sampler().sample(count, mode)
+    else:
+        images = get_catalog().sample_images(count, breed, sub_breed)
+    return [prefix + rel for rel in images]
 
 def get_all_images() -> List[Path]:
-    all_images = []
-    
-    for breed_dir in config.ASSETS_DIR.iterdir():
-        if not breed_dir.is_dir():
-            continue
-        
-        images = get_breed_images(breed_dir.name)
-        all_images.extend(images)
-    
-    return all_images
+    catalog = get_catalog()
+    return [Path(catalog.path(index)) for index in range(len(catalog))]
+
+def encode_cursor(image: str) -> str:
+    return base64.urlsafe_b64encode(image.encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> str:
+    try:
+        return base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+    except (binascii.Error, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+@traced
+def get_image_window(
+    breed: str, sub_breed: str = None, cursor: str = None, limit: int = None, image_filter: ImageFilter = None
+) -> Optional[ImageWindow]:
+    catalog = get_catalog()
+    bounds = catalog.image_range(breed, sub_breed)
+    if bounds is None:
+        return None
+    start, end = bounds
+    position = start
+    if cursor is not None:
+        rel = decode_cursor(cursor)
+        prefix = f"{breed}/{sub_breed}/" if sub_breed else f"{breed}/"
+        if not rel.startswith(prefix) or "" in rel[len(prefix):].split("/"):
+            raise InvalidCursor(cursor)
+        position = catalog.position_after(rel, start, end)
+    if image_filter is not None and image_filter.active:
+        return filtered_window(catalog, start, end, position, limit, image_filter)
+    stop = end if limit is None else min(end, position + limit)
+    next_cursor = encode_cursor(catalog.images[stop - 1]) if position < stop < end else None
+    return ImageWindow(catalog, position, stop, next_cursor)
+
+def filtered_window(
+    catalog: Catalog, start: int, end: int, position: int, limit: Optional[int], image_filter: ImageFilter
+) -> ImageWindow:
+    matches = match_images(catalog, start, end, image_filter)
+    first = bisect_left(matches, position)
+    last = len(matches) if limit is None else min(len(matches), first + limit)
+    next_cursor = encode_cursor(catalog.images[matches[last - 1]]) if first < last < len(matches) else None
+    return ImageWindow(catalog, start, end, next_cursor, matches[first:last])
 
+def iter_image_urls(window: ImageWindow) -> Iterator[str]:
+    prefix = f"{config.BASE_URL_IMG}/images/"
+    images = window.catalog.images
+    indices = range(window.start, window.stop) if window.indices is None else window.indices
+    for index in indices:
+        yield prefix + images[index]
@@ -0,0 +1,288 @@
+import itertools
+import os
+import random
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+from app.metrics import metrics
+
+IMAGE_SUFFIXES = frozenset({".jpg", ".jpeg", ".png"})
+
+_versions = itertools.count(1)
+
+class DirListing(NamedTuple):
+    mtime_ns: int
+    files: Tuple[str, ...]
+    subdirs: Tuple[str, ...]
+
+class DirRecord(NamedTuple):
+    path: str
+    mtime_ns: int
+    start: int
+    end: int
+
+def is_image_name(name: str) -> bool:
+    return os.path.splitext(name)[1].lower() in IMAGE_SUFFIXES
+
+def list_dir(path: Path) -> Optional[DirListing]:
+    files = []
+    subdirs = []
+    try:
+        metrics.count_fs("stat")
+        mtime_ns = os.stat(path).st_mtime_ns
+        metrics.count_fs("scandir")
+        with os.scandir(path) as entries:
+            for entry in entries:
+                if entry.is_dir():
+                    subdirs.append(entry.name)
+                elif entry.is_file() and is_image_name(entry.name):
+                    files.append(entry.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return None
+    files.sort()
+    subdirs.sort()
+    return DirListing(mtime_ns, tuple(files), tuple(subdirs))
+
+def join_rel(parent: str, name: str) -> str:
+    return f"{parent}/{name}" if parent else name
+
+def scan_listings(root: Path, start: str = "") -> Dict[str, DirListing]:
+    listings = {}
+    pending = [start]
+    while pending:
+        rel = pending.pop()
+        listing = list_dir(root / rel if rel else root)
+        if listing is None:
+            continue
+        listings[rel] = listing
+        pending.extend(join_rel(rel, name) for name in listing.subdirs)
+    return listings
+
+def assemble(listings: Dict[str, DirListing]) -> Tuple[List[str], List[DirRecord]]:
+    images: List[str] = []
+    dirs: List[DirRecord] = []
+    if "" not in listings:
+        return images, dirs
+
+    pending = [""]
+    while pending:
+        rel = pending.pop()
+        listing = listings.get(rel)
+        if listing is None:
+            continue
+        start = len(images)
+        if rel:
+            images.extend(f"{rel}/{name}" for name in listing.files)
+        dirs.append(DirRecord(rel, listing.mtime_ns, start, len(images)))
+        pending.extend(join_rel(rel, name) for name in reversed(listing.subdirs))
+    return images, dirs
+
+def traversal_key(rel: str) -> Tuple[Tuple[int, str], ...]:
+    *dirs, name = rel.split("/")
+    return tuple((1, part) for part in dirs) + ((0, name),)
+
+def merge_listings(sources: Sequence[Dict[str, DirListing]]) -> Tuple[Dict[str, DirListing], Dict[str, int]]:
+    merged: Dict[str, DirListing] = {}
+    owners: Dict[str, int] = {}
+    for rel in sorted(set().union(*sources)):
+        present = [(index, source[rel]) for index, source in enumerate(sources) if rel in source]
+        if len(present) == 1 and present[0][0] == 0:
+            merged[rel] = present[0][1]
+            continue
+        names: Dict[str, int] = {}
+        for index, listing in present:
+            for name in listing.files:
+                names.setdefault(name, index)
+        merged[rel] = DirListing(
+            max(listing.mtime_ns for _, listing in present),
+            tuple(sorted(names)),
+            tuple(sorted(set().union(*(listing.subdirs for _, listing in present)))),
+        )
+        for name, index in names.items():
+            if index:
+                owners[join_rel(rel, name)] = index
+    return merged, owners
+
+class Catalog:
+    def __init__(
+        self,
+        root: Path,
+        images: Sequence[str],
+        dirs: Sequence[DirRecord],
+        roots: Sequence[Path] = (),
+        image_roots: Optional[Sequence[int]] = None,
+        root_mtimes: Optional[Sequence[Sequence[int]]] = None,
+    ):
+        self.root = root
+        self.roots: Tuple[Path, ...] = tuple(roots) or (root,)
+        self.version = next(_versions)
+        self.images = images
+        self.dirs = dirs
+        self.image_roots = image_roots
+        self.root_mtimes = root_mtimes
+        self.sources: Optional[List[Dict[str, DirListing]]] = None
+        self.breeds: Dict[str, List[str]] = {}
+        self._dir_index: Dict[str, int] = {}
+        self._breed_ranges: Dict[str, Tuple[int, int]] = {}
+        self._subbreed_ranges: Dict[Tuple[str, str], Tuple[int, int]] = {}
+        self._index()
+
+    @classmethod
+    def build(cls, root: Path) -> "Catalog":
+        return cls.from_listings(root, scan_listings(root))
+
+    @classmethod
+    def from_listings(cls, root: Path, listings: Dict[str, DirListing]) -> "Catalog":
+        images, dirs = assemble(listings)
+        return cls(root, tuple(images), tuple(dirs))
+
+    @classmethod
+    def build_tiered(cls, roots: Sequence[Path]) -> "Catalog":
+        if len(roots) == 1:
+            return cls.build(roots[0])
+        return cls.from_sources(roots, [scan_listings(root) for root in roots])
+
+    @classmethod
+    def from_sources(cls, roots: Sequence[Path], sources: List[Dict[str, DirListing]]) -> "Catalog":
+        if len(roots) == 1:
+            catalog = cls.from_listings(roots[0], sources[0])
+        else:
+            listings, owners = merge_listings(sources)
+            images, dirs = assemble(listings)
+            image_roots = array("B", (owners.get(rel, 0) for rel in images))
+            root_mtimes = tuple(
+                array("q", (source[record.path].mtime_ns if record.path in source else -1 for record in dirs))
+                for source in sources
+            )
+            catalog = cls(roots[0], tuple(images), tuple(dirs), roots, image_roots, root_mtimes)
+        catalog.sources = sources
+        return catalog
+
+    def with_image_roots(self, changes: Dict[int, int]) -> "Catalog":
+        image_roots = array("B", self.image_roots if self.image_roots is not None else bytes(len(self.images)))
+        for index, root_index in changes.items():
+            image_roots[index] = root_index
+        catalog = Catalog(self.root, self.images, self.dirs, self.roots, image_roots, self.root_mtimes)
+        catalog.version = self.version
+        catalog.sources = self.sources
+        return catalog
+
+    @property
+    def location(self) -> str:
+        return os.pathsep.join(str(root) for root in self.roots)
+
+    def root_index(self, index: int) -> int:
+        return self.image_roots[index] if self.image_roots is not None else 0
+
+    def path(self, index: int) -> str:
+        return os.path.join(self.roots[self.root_index(index)], self.images[index])
+
+    def fallback_paths(self, index: int) -> List[str]:
+        owner = self.root_index(index)
+        return [os.path.join(root, self.images[index]) for i, root in enumerate(self.roots) if i != owner]
+
+    def _index(self):
+        breed_order = []
+        for position, record in enumerate(self.dirs):
+            self._dir_index[record.path] = position
+            if not record.path:
+                continue
+            parts = record.path.split("/")
+            if len(parts) == 1:
+                self.breeds[record.path] = []
+                breed_order.append(record)
+            elif len(parts) == 2:
+                self.breeds[parts[0]].append(parts[1])
+                self._subbreed_ranges[(parts[0], parts[1])] = (record.start, record.end)
+
+        for position, record in enumerate(breed_order):
+            if position + 1 < len(breed_order):
+                end = breed_order[position + 1].start
+            else:
+                end = len(self.images)
+            self._breed_ranges[record.path] = (record.start, end)
+
+    def __len__(self) -> int:
+        return len(self.images)
+
+    def listings(self) -> Dict[str, DirListing]:
+        children: Dict[str, List[str]] = {record.path: [] for record in self.dirs}
+        for record in self.dirs:
+            if record.path:
+                parent, _, name = record.path.rpartition("/")
+                children[parent].append(name)
+
+        listings = {}
+        for record in self.dirs:
+            prefix = len(record.path) + 1
+            files = tuple(self.images[i][prefix:] for i in range(record.start, record.end))
+            listings[record.path] = DirListing(record.mtime_ns, files, tuple(children[record.path]))
+        return listings
+
+    def directory(self, rel: str) -> Optional[DirRecord]:
+        position = self._dir_index.get(rel)
+        return None if position is None else self.dirs[position]
+
+    def dir_records(self, start: int, end: int) -> Sequence[DirRecord]:
+        if start >= end:
+            return ()
+        first = self._dir_index[self.images[start].rpartition("/")[0]]
+        last = first
+        while last < len(self.dirs) and self.dirs[last].start < end:
+            last += 1
+        return self.dirs[first:last]
+
+    def position_after(self, rel: str, start: int, end: int) -> int:
+        key = traversal_key(rel)
+        while start < end:
+            middle = (start + end) // 2
+            if key < traversal_key(self.images[middle]):
+                end = middle
+            else:
+                start = middle + 1
+        return start
+
+    def find_image(self, rel: str) -> Optional[int]:
+        directory = rel.rpartition("/")[0]
+        record = self.directory(directory) if directory else None
+        if record is None:
+            return None
+        index = bisect_left(self.images, rel, record.start, record.end)
+        if index < record.end and self.images[index] == rel:
+            return index
+        return None
+
+    def image_range(self, breed: str, sub_breed: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        if sub_breed:
+            return self._subbreed_ranges.get((breed, sub_breed))
+        return self._breed_ranges.get(breed)
+
+    def images_in(self, breed: str, sub_breed: Optional[str] = None) -> Sequence[str]:
+        bounds = self.image_range(breed, sub_breed)
+        if bounds is None:
+            return ()
+        return self.images[bounds[0]:bounds[1]]
+
+    def random_image(self, breed: Optional[str] = None, sub_breed: Optional[str] = None) -> Optional[str]:
+        if breed is None:
+            start, end = 0, len(self.images)
+        else:
+            bounds = self.image_range(breed, sub_breed)
+            if bounds is None:
+                return None
+            start, end = bounds
+        if start >= end:
+            return None
+        return self.images[random.randrange(start, end)]
+
+    def sample_images(self, count: int, breed: Optional[str] = None, sub_breed: Optional[str] = None) -> List[str]:
+        if breed is None:
+            start, end = 0, len(self.images)
+        else:
+            bounds = self.image_range(breed, sub_breed)
+            if bounds is None:
+                return []
+            start, end = bounds
+        indices = random.sample(range(start, end), min(count, end - start))
+        return [self.images[index] for index in indices]
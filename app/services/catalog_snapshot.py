@@ -0,0 +1,156 @@
+import logging
+import mmap
+import os
+import struct
+import sys
+import zlib
+from array import array
+from collections.abc import Sequence
+from pathlib import Path
+from typing import List, Optional
+from app.metrics import metrics
+from app.services.catalog import Catalog, DirRecord
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"DOGCATLG"
+FORMAT_VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+HEADER = struct.Struct("<8sIIQQQ")
+DIR_RECORD = struct.Struct("<QQqQQ")
+
+class SnapshotError(Exception):
+    pass
+
+class MappedImages(Sequence):
+    def __init__(self, buffer, offsets, base: int, start: int = 0, stop: Optional[int] = None):
+        self._buffer = buffer
+        self._offsets = offsets
+        self._base = base
+        self._start = start
+        self._stop = len(offsets) - 1 if stop is None else stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                return tuple(self[i] for i in range(start, stop, step))
+            stop = max(start, stop)
+            return MappedImages(self._buffer, self._offsets, self._base, self._start + start, self._start + stop)
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("image index out of range")
+        index += self._start
+        begin = self._base + self._offsets[index]
+        end = self._base + self._offsets[index + 1]
+        return self._buffer[begin:end].decode("utf-8")
+
+def write_snapshot(catalog: Catalog, path: Path):
+    strings = bytearray("\0".join(str(root) for root in catalog.roots).encode("utf-8"))
+    root_length = len(strings)
+
+    offsets = array("Q")
+    base = len(strings)
+    for image in catalog.images:
+        offsets.append(len(strings) - base)
+        strings += image.encode("utf-8")
+    offsets.append(len(strings) - base)
+
+    dir_table = bytearray()
+    for record in catalog.dirs:
+        path_start = len(strings)
+        strings += record.path.encode("utf-8")
+        dir_table += DIR_RECORD.pack(path_start, len(strings), record.mtime_ns, record.start, record.end)
+
+    root_mtimes = array("q")
+    for column in catalog.root_mtimes or ([record.mtime_ns for record in catalog.dirs],):
+        root_mtimes.extend(column)
+    image_roots = bytes(catalog.image_roots) if catalog.image_roots is not None else bytes(len(catalog.images))
+
+    if sys.byteorder != "little":
+        offsets.byteswap()
+        root_mtimes.byteswap()
+    body = offsets.tobytes() + bytes(dir_table) + bytes(strings) + root_mtimes.tobytes() + image_roots
+    header = HEADER.pack(
+        MAGIC, FORMAT_VERSION, zlib.crc32(body), len(catalog.images), len(catalog.dirs), root_length
+    )
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        f.write(body)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def read_snapshot(path: Path) -> Catalog:
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if len(buffer) < HEADER.size:
+        raise SnapshotError("snapshot is truncated")
+
+    magic, version, checksum, n_images, n_dirs, root_length = HEADER.unpack_from(buffer, 0)
+    if magic != MAGIC:
+        raise SnapshotError("not a catalog snapshot")
+    if version not in SUPPORTED_VERSIONS:
+        raise SnapshotError(f"unsupported snapshot version {version}")
+    if zlib.crc32(memoryview(buffer)[HEADER.size:]) != checksum:
+        raise SnapshotError("snapshot checksum mismatch")
+    if sys.byteorder != "little":
+        raise SnapshotError("snapshots are only supported on little-endian hosts")
+
+    offsets_start = HEADER.size
+    dirs_start = offsets_start + 8 * (n_images + 1)
+    strings_start = dirs_start + DIR_RECORD.size * n_dirs
+    offsets = memoryview(buffer)[offsets_start:dirs_start].cast("Q")
+
+    dirs: List[DirRecord] = []
+    for path_start, path_end, mtime_ns, start, end in DIR_RECORD.iter_unpack(buffer[dirs_start:strings_start]):
+        dir_path = buffer[strings_start + path_start:strings_start + path_end].decode("utf-8")
+        dirs.append(DirRecord(dir_path, mtime_ns, start, end))
+
+    roots = [Path(root) for root in buffer[strings_start:strings_start + root_length].decode("utf-8").split("\0")]
+    images = MappedImages(buffer, offsets, strings_start + root_length)
+    if version == 1 or len(roots) == 1:
+        return Catalog(roots[0], images, tuple(dirs))
+
+    image_roots_start = len(buffer) - n_images
+    mtimes_start = image_roots_start - 8 * len(roots) * n_dirs
+    root_mtimes = array("q", buffer[mtimes_start:image_roots_start])
+    columns = tuple(root_mtimes[i * n_dirs:(i + 1) * n_dirs] for i in range(len(roots)))
+    image_roots = memoryview(buffer)[image_roots_start:]
+    return Catalog(roots[0], images, tuple(dirs), roots, image_roots, columns)
+
+def is_stale(catalog: Catalog, roots: Sequence) -> bool:
+    if [root.resolve() for root in catalog.roots] != [root.resolve() for root in roots]:
+        return True
+    columns = catalog.root_mtimes or ([record.mtime_ns for record in catalog.dirs],)
+    metrics.count_fs("stat", len(catalog.dirs) * len(columns))
+    for root, column in zip(catalog.roots, columns):
+        for record, expected in zip(catalog.dirs, column):
+            try:
+                mtime_ns = os.stat(root / record.path if record.path else root).st_mtime_ns
+            except OSError:
+                mtime_ns = -1
+            if mtime_ns != expected:
+                return True
+    return False
+
+def load_snapshot(path: Path, roots: Sequence) -> Optional[Catalog]:
+    locations = ", ".join(str(root) for root in roots)
+    try:
+        catalog = read_snapshot(path)
+    except FileNotFoundError:
+        logger.info("No catalog snapshot at %s, scanning %s", path, locations)
+        return None
+    except (OSError, ValueError, SnapshotError) as e:
+        logger.warning("Ignoring catalog snapshot %s: %s", path, e)
+        return None
+    if is_stale(catalog, roots):
+        logger.warning("Catalog snapshot %s is stale, scanning %s", path, locations)
+        return None
+    return catalog
@@ -0,0 +1,328 @@
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+import config
+from app.metrics import metrics
+from app.services import breed_service
+from app.services.catalog import Catalog, DirListing, join_rel, list_dir, scan_listings
+from app.services.catalog_snapshot import MappedImages
+from app.services.promoter import read_manifest
+
+logger = logging.getLogger(__name__)
+
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+WATCH_MASK = (
+    IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR
+)
+EVENT_HEADER = struct.Struct("iIII")
+
+def apply_changes(root: Path, listings: Dict[str, DirListing], changed: Iterable[str]) -> Dict[str, DirListing]:
+    listings = dict(listings)
+    rescanned: Set[str] = set()
+
+    def drop_subtree(rel: str):
+        prefix = rel + "/"
+        for key in [key for key in listings if key == rel or key.startswith(prefix)]:
+            del listings[key]
+
+    for rel in sorted(set(changed), key=lambda path: path.count("/") if path else -1):
+        if rel in rescanned:
+            continue
+        parent = rel.rpartition("/")[0]
+        if rel and parent not in listings:
+            continue
+
+        listing = list_dir(root / rel if rel else root)
+        if listing is None:
+            drop_subtree(rel)
+            if rel and parent in listings:
+                old_parent = listings[parent]
+                name = rel.rpartition("/")[2]
+                subdirs = tuple(subdir for subdir in old_parent.subdirs if subdir != name)
+                listings[parent] = old_parent._replace(subdirs=subdirs)
+            continue
+
+        old = listings.get(rel)
+        old_subdirs = set(old.subdirs) if old else set()
+        listings[rel] = listing
+        rescanned.add(rel)
+        for name in old_subdirs.difference(listing.subdirs):
+            drop_subtree(join_rel(rel, name))
+        for name in set(listing.subdirs).difference(old_subdirs):
+            subtree = scan_listings(root, join_rel(rel, name))
+            listings.update(subtree)
+            rescanned.update(subtree)
+    return listings
+
+def only_promoted_changes(
+    previous: Dict[str, DirListing],
+    listings: Dict[str, DirListing],
+    promoted: Set[str],
+    others: Sequence[Dict[str, DirListing]],
+) -> bool:
+    def elsewhere(rel: str) -> bool:
+        return any(rel in source for source in others)
+
+    for rel in previous.keys() - listings.keys():
+        if not elsewhere(rel) or any(join_rel(rel, name) not in promoted for name in previous[rel].files):
+            return False
+    for rel, listing in listings.items():
+        old = previous.get(rel)
+        if listing is old:
+            continue
+        if old is None and not elsewhere(rel):
+            return False
+        old_files, old_subdirs = (old.files, old.subdirs) if old else ((), ())
+        if any(not elsewhere(join_rel(rel, name)) for name in set(listing.subdirs).symmetric_difference(old_subdirs)):
+            return False
+        if any(join_rel(rel, name) not in promoted for name in set(listing.files).symmetric_difference(old_files)):
+            return False
+    return True
+
+class PollingBackend:
+    name = "poll"
+
+    def __init__(self, root: Path, interval: float, stop: threading.Event):
+        self.root = root
+        self.interval = interval
+        self._mtimes: Dict[str, int] = {}
+        self._stop = stop
+
+    def sync(self, listings: Dict[str, DirListing]):
+        self._mtimes = {rel: listing.mtime_ns for rel, listing in listings.items()}
+
+    def wait(self, timeout: float) -> Set[str]:
+        if self._stop.wait(min(timeout, self.interval)):
+            return set()
+        return self.check()
+
+    def check(self) -> Set[str]:
+        changed = set()
+        metrics.count_fs("stat", len(self._mtimes))
+        for rel, mtime_ns in self._mtimes.items():
+            try:
+                current = os.stat(self.root / rel if rel else self.root).st_mtime_ns
+            except OSError:
+                current = None
+            if current != mtime_ns:
+                changed.add(rel)
+        if not self._mtimes and self.root.is_dir():
+            changed.add("")
+        return changed
+
+    def close(self):
+        pass
+
+class InotifyBackend:
+    name = "inotify"
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._wd_to_rel: Dict[int, str] = {}
+        self._rel_to_wd: Dict[str, int] = {}
+        self._overflowed = False
+
+    def sync(self, listings: Dict[str, DirListing]):
+        for rel in [rel for rel in self._rel_to_wd if rel not in listings]:
+            wd = self._rel_to_wd.pop(rel)
+            self._wd_to_rel.pop(wd, None)
+            self._libc.inotify_rm_watch(self._fd, wd)
+        for rel in listings:
+            if rel in self._rel_to_wd:
+                continue
+            path = os.fsencode(self.root / rel if rel else self.root)
+            wd = self._libc.inotify_add_watch(self._fd, path, WATCH_MASK)
+            if wd >= 0:
+                self._rel_to_wd[rel] = wd
+                self._wd_to_rel[wd] = rel
+
+    def wait(self, timeout: float) -> Set[str]:
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except (OSError, ValueError):
+            return set()
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size + length
+            if mask & IN_Q_OVERFLOW:
+                self._overflowed = True
+                continue
+            rel = self._wd_to_rel.get(wd)
+            if rel is None:
+                continue
+            if mask & IN_IGNORED:
+                self._wd_to_rel.pop(wd, None)
+                self._rel_to_wd.pop(rel, None)
+            changed.add(rel)
+        if self._overflowed:
+            self._overflowed = False
+            changed.update(self._rel_to_wd)
+            changed.add("")
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+def create_backend(root: Path, mode: str, stop: threading.Event):
+    if mode == "inotify" or (mode == "auto" and root.is_dir()):
+        try:
+            return InotifyBackend(root)
+        except (OSError, AttributeError) as e:
+            if mode == "inotify":
+                raise
+            logger.info("inotify unavailable (%s), falling back to polling", e)
+    return PollingBackend(root, config.CATALOG_POLL_INTERVAL, stop)
+
+class CatalogWatcher:
+    def __init__(self, roots: Sequence[Path], mode: str = "auto", debounce: float = 1.0):
+        self.roots = list(roots)
+        self.debounce = debounce
+        self.max_delay = debounce * 10
+        self._stop = threading.Event()
+        self._lock = breed_service.catalog_lock
+        self.backends = [create_backend(root, mode, self._stop) for root in self.roots]
+        self.refreshes = 0
+        self.dirs_relisted = 0
+        self.last_refresh_at: Optional[float] = None
+        self.last_refresh_lag: Optional[float] = None
+        self._promoted: Set[str] = set()
+        catalog = breed_service.get_catalog()
+        if len(self.roots) == 1:
+            self._sources: List[Dict[str, DirListing]] = [catalog.listings()]
+        elif catalog.sources is not None and len(catalog.sources) == len(self.roots):
+            self._sources = list(catalog.sources)
+        else:
+            self._sources = [scan_listings(root) for root in self.roots]
+        for backend, listings in zip(self.backends, self._sources):
+            backend.sync(listings)
+        self._threads: List[threading.Thread] = []
+
+    def start(self):
+        for index in range(len(self.roots)):
+            thread = threading.Thread(target=self._run, args=(index,), name="catalog-watcher", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        for backend in self.backends:
+            backend.close()
+
+    def _run(self, index: int):
+        backend = self.backends[index]
+        pending: Set[str] = set()
+        first_seen = last_seen = 0.0
+        while not self._stop.is_set():
+            timeout = self.debounce if pending else config.CATALOG_POLL_INTERVAL
+            changed = backend.wait(timeout)
+            now = time.monotonic()
+            if changed:
+                if not pending:
+                    first_seen = now
+                pending.update(changed)
+                last_seen = now
+            if pending and (now - last_seen >= self.debounce or now - first_seen >= self.max_delay):
+                try:
+                    self.refresh(pending, index)
+                except Exception:
+                    logger.exception("Catalog refresh failed")
+                pending = set()
+
+    def promoted_files(self) -> Set[str]:
+        current = set(read_manifest(self.roots[0]))
+        promoted = current | self._promoted
+        self._promoted = current
+        return promoted
+
+    def refresh(self, changed: Set[str], index: int = 0) -> Catalog:
+        with self._lock:
+            previous = self._sources[index]
+            backend = self.backends[index]
+            listings = apply_changes(self.roots[index], previous, changed)
+            added = set(listings).difference(previous)
+            while added:
+                backend.sync(listings)
+                relisted = apply_changes(self.roots[index], listings, added)
+                added = set(relisted).difference(listings)
+                listings = relisted
+            if index == 0 and len(self.roots) > 1 and only_promoted_changes(
+                previous, listings, self.promoted_files(), self._sources[1:]
+            ):
+                self._sources[index] = listings
+                backend.sync(listings)
+                return breed_service.get_catalog()
+            sources = list(self._sources)
+            sources[index] = listings
+            catalog = Catalog.from_sources(self.roots, sources)
+            breed_service.set_catalog(catalog)
+            self._sources = sources
+            backend.sync(listings)
+
+        modified = [
+            listings[rel].mtime_ns for rel in changed
+            if rel in listings and (rel not in previous or previous[rel].mtime_ns != listings[rel].mtime_ns)
+        ]
+        self.refreshes += 1
+        self.dirs_relisted += len(changed)
+        self.last_refresh_at = time.time()
+        if modified:
+            self.last_refresh_lag = max(0.0, self.last_refresh_at - min(modified) / 1e9)
+        logger.info(
+            "Catalog refreshed: %d dirs changed in %s, %d images, lag %.3fs",
+            len(changed), self.roots[index], len(catalog), self.last_refresh_lag or 0.0,
+        )
+        return catalog
+
+_watcher: Optional[CatalogWatcher] = None
+
+def get_watcher() -> Optional[CatalogWatcher]:
+    return _watcher
+
+def start_watcher() -> Optional[CatalogWatcher]:
+    global _watcher
+    if config.CATALOG_WATCH == "off" or _watcher is not None:
+        return _watcher
+    if config.CATALOG_WATCH == "auto" and isinstance(breed_service.get_catalog().images, MappedImages):
+        logger.info("Serving the catalog from a snapshot, not watching for changes")
+        return None
+    _watcher = CatalogWatcher(breed_service.asset_roots(), config.CATALOG_WATCH, config.CATALOG_DEBOUNCE)
+    _watcher.start()
+    return _watcher
+
+def stop_watcher():
+    global _watcher
+    if _watcher is not None:
+        _watcher.stop()
+        _watcher = None
@@ -0,0 +1,94 @@
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+import config
+
+class CachedImage(NamedTuple):
+    data: bytes
+    etag: str
+
+class SegmentedLRUCache:
+    def __init__(self, max_bytes: int, max_item_bytes: int, protected_ratio: float = 0.8):
+        self.max_bytes = max_bytes
+        self.max_item_bytes = max_item_bytes
+        self.protected_max_bytes = int(max_bytes * protected_ratio)
+        self.probation_bytes = 0
+        self.protected_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._probation: "OrderedDict[str, CachedImage]" = OrderedDict()
+        self._protected: "OrderedDict[str, CachedImage]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @property
+    def size(self) -> int:
+        return self.probation_bytes + self.protected_bytes
+
+    def __len__(self) -> int:
+        return len(self._probation) + len(self._protected)
+
+    def accepts(self, size: int) -> bool:
+        return self.enabled and size <= min(self.max_item_bytes, self.max_bytes)
+
+    def get(self, key: str, etag: str) -> Optional[bytes]:
+        entry = self._protected.get(key)
+        if entry is not None:
+            if entry.etag != etag:
+                self._remove(key)
+                self.invalidations += 1
+                self.misses += 1
+                return None
+            self._protected.move_to_end(key)
+            self.hits += 1
+            return entry.data
+
+        entry = self._probation.pop(key, None)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.probation_bytes -= len(entry.data)
+        if entry.etag != etag:
+            self.invalidations += 1
+            self.misses += 1
+            return None
+        self._protected[key] = entry
+        self.protected_bytes += len(entry.data)
+        self._demote_protected()
+        self.hits += 1
+        return entry.data
+
+    def put(self, key: str, etag: str, data: bytes):
+        if not self.accepts(len(data)):
+            return
+        self._remove(key)
+        self._probation[key] = CachedImage(data, etag)
+        self.probation_bytes += len(data)
+        self._evict()
+
+    def _remove(self, key: str):
+        entry = self._protected.pop(key, None)
+        if entry is not None:
+            self.protected_bytes -= len(entry.data)
+        entry = self._probation.pop(key, None)
+        if entry is not None:
+            self.probation_bytes -= len(entry.data)
+
+    def _demote_protected(self):
+        while self.protected_bytes > self.protected_max_bytes and self._protected:
+            key, entry = self._protected.popitem(last=False)
+            self.protected_bytes -= len(entry.data)
+            self._probation[key] = entry
+            self.probation_bytes += len(entry.data)
+        self._evict()
+
+    def _evict(self):
+        while self.size > self.max_bytes and self._probation:
+            _, entry = self._probation.popitem(last=False)
+            self.probation_bytes -= len(entry.data)
+            self.evictions += 1
+
+image_cache = SegmentedLRUCache(config.IMAGE_CACHE_BYTES, config.IMAGE_CACHE_MAX_ITEM_BYTES)
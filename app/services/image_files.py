@@ -0,0 +1,149 @@
+import mimetypes
+import os
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import List, NamedTuple, Optional, Tuple
+import config
+from app.metrics import metrics
+from app.services.breed_service import get_catalog
+from app.services.io_executor import io_executor
+from app.services.promoter import is_promoted, record_access
+
+class ImageFile(NamedTuple):
+    path: str
+    size: int
+    mtime: int
+    etag: str
+    last_modified: str
+    content_type: str
+
+class StatCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[ImageFile, float]]" = OrderedDict()
+
+    def get(self, rel: str) -> Optional[ImageFile]:
+        entry = self._entries.get(rel)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return None
+        self._entries.move_to_end(rel)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, rel: str, image: ImageFile):
+        self._entries[rel] = (image, time.monotonic() + self.ttl)
+        self._entries.move_to_end(rel)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def discard(self, rel: str):
+        self._entries.pop(rel, None)
+
+    def sync(self, version: int):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+class NegativeCache:
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, float]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, rel: str) -> bool:
+        expires = self._entries.get(rel)
+        if expires is None or expires < time.monotonic():
+            self.misses += 1
+            return False
+        self._entries.move_to_end(rel)
+        self.hits += 1
+        return True
+
+    def add(self, rel: str):
+        self._entries[rel] = time.monotonic() + self.ttl
+        self._entries.move_to_end(rel)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def sync(self, version: int):
+        if version != self.version:
+            self._entries.clear()
+            self.version = version
+
+class InvalidImagePath(ValueError):
+    pass
+
+stat_cache = StatCache(config.IMAGE_STAT_CACHE_SIZE, config.IMAGE_STAT_TTL)
+negative_cache = NegativeCache(config.IMAGE_NEGATIVE_CACHE_SIZE, config.IMAGE_NEGATIVE_TTL)
+
+def is_safe_path(rel: str) -> bool:
+    if not rel or len(rel) > config.IMAGE_PATH_MAX_LENGTH or "\\" in rel or "\0" in rel:
+        return False
+    return all(part not in ("", ".", "..") for part in rel.split("/"))
+
+def stat_first(paths: List[str]) -> Optional[ImageFile]:
+    for path in paths:
+        image = stat_image(path)
+        if image is not None:
+            return image
+    return None
+
+def stat_image(path: str) -> Optional[ImageFile]:
+    metrics.count_fs("stat")
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    mtime = int(stat.st_mtime)
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return ImageFile(
+        path,
+        stat.st_size,
+        mtime,
+        f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"',
+        formatdate(mtime, usegmt=True),
+        content_type,
+    )
+
+async def resolve_image(rel: str) -> Optional[ImageFile]:
+    if not is_safe_path(rel):
+        metrics.lookup_misses["rejected"] += 1
+        raise InvalidImagePath(rel)
+    catalog = get_catalog()
+    stat_cache.sync(catalog.version)
+    negative_cache.sync(catalog.version)
+    image = stat_cache.get(rel)
+    if image is not None and is_promoted(rel):
+        image = await io_executor.run_once(("stat-promoted", rel), stat_image, image.path)
+        if image is None:
+            stat_cache.discard(rel)
+    if image is not None:
+        record_access(rel)
+        return image
+    if rel in negative_cache:
+        metrics.lookup_misses["image"] += 1
+        return None
+    index = catalog.find_image(rel)
+    if index is not None:
+        image = await io_executor.run_once(("stat", rel), stat_image, catalog.path(index))
+        if image is None and len(catalog.roots) > 1:
+            image = await io_executor.run_once(("stat-fallback", rel), stat_first, catalog.fallback_paths(index))
+    if image is None:
+        metrics.lookup_misses["image"] += 1
+        negative_cache.add(rel)
+        return None
+    stat_cache.put(rel, image)
+    record_access(rel)
+    return image
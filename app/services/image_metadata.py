@@ -0,0 +1,319 @@
+import itertools
+import logging
+import os
+import struct
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
+import config
+from app.models import ImageFormat, Orientation
+from app.services.catalog import Catalog, DirRecord
+
+logger = logging.getLogger(__name__)
+
+FORMATS = (None, ImageFormat.JPEG, ImageFormat.PNG)
+FORMAT_CODES = {image_format: code for code, image_format in enumerate(FORMATS) if image_format is not None}
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+SOF_MARKERS = frozenset(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+MAGIC = b"DOGMETA1"
+HEADER = struct.Struct("<8sQQQ")
+CHUNK_SIZE = 2000
+PARALLEL_THRESHOLD = 50_000
+MATCH_CACHE_SIZE = 256
+
+class MetadataUnavailable(RuntimeError):
+    pass
+
+class ImageFilter(NamedTuple):
+    min_width: Optional[int] = None
+    min_height: Optional[int] = None
+    max_bytes: Optional[int] = None
+    orientation: Optional[Orientation] = None
+    format: Optional[ImageFormat] = None
+
+    @property
+    def active(self) -> bool:
+        return any(value is not None for value in self)
+
+Row = Tuple[int, int, int, int, int]
+
+def read_jpeg_size(file: BinaryIO) -> Optional[Tuple[int, int]]:
+    file.seek(2)
+    while True:
+        marker = file.read(2)
+        while len(marker) == 2 and marker[0] == 0xFF and marker[1] == 0xFF:
+            marker = marker[1:] + file.read(1)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            return None
+        code = marker[1]
+        if code == 0x01 or 0xD0 <= code <= 0xD7:
+            continue
+        if code in (0xD9, 0xDA):
+            return None
+        length = file.read(2)
+        if len(length) < 2:
+            return None
+        (length,) = struct.unpack(">H", length)
+        if code in SOF_MARKERS:
+            data = file.read(5)
+            if len(data) < 5:
+                return None
+            height, width = struct.unpack(">xHH", data)
+            return width, height
+        file.seek(length - 2, os.SEEK_CUR)
+
+def read_dimensions(path: str) -> Tuple[int, int, int]:
+    try:
+        with open(path, "rb") as file:
+            head = file.read(24)
+            if head[:2] == b"\xff\xd8":
+                size = read_jpeg_size(file)
+                if size is not None:
+                    return FORMAT_CODES[ImageFormat.JPEG], size[0], size[1]
+            elif head[:8] == PNG_SIGNATURE and head[12:16] == b"IHDR":
+                width, height = struct.unpack(">II", head[16:24])
+                return FORMAT_CODES[ImageFormat.PNG], width, height
+    except (OSError, struct.error):
+        pass
+    return 0, 0, 0
+
+def probe_chunk(entries: List[Tuple[str, int, int]]) -> List[Optional[Row]]:
+    rows: List[Optional[Row]] = []
+    for path, size, mtime_ns in entries:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            rows.append((0, 0, 0, 0, 0))
+            continue
+        if stat.st_size == size and stat.st_mtime_ns == mtime_ns:
+            rows.append(None)
+            continue
+        rows.append((stat.st_size, stat.st_mtime_ns) + read_dimensions(path))
+    return rows
+
+class MetadataIndex:
+    def __init__(self, catalog: Catalog, sizes: array, mtimes: array, widths: array, heights: array, formats: array):
+        self.catalog = catalog
+        self.sizes = sizes
+        self.mtimes = mtimes
+        self.widths = widths
+        self.heights = heights
+        self.formats = formats
+        self._matches: "OrderedDict[Tuple[int, int, ImageFilter], array]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self.sizes)
+
+    def row(self, index: int) -> Row:
+        return self.sizes[index], self.mtimes[index], self.formats[index], self.widths[index], self.heights[index]
+
+    def rows(self) -> Dict[str, Row]:
+        return {rel: self.row(index) for index, rel in enumerate(self.catalog.images)}
+
+    def matching(self, start: int, end: int, image_filter: ImageFilter) -> array:
+        key = (start, end, image_filter)
+        matches = self._matches.get(key)
+        if matches is not None:
+            self._matches.move_to_end(key)
+            return matches
+
+        indices: Sequence[int] = range(start, end)
+        widths, heights = self.widths, self.heights
+        if image_filter.min_width is not None:
+            indices = [i for i in indices if widths[i] >= image_filter.min_width]
+        if image_filter.min_height is not None:
+            indices = [i for i in indices if heights[i] >= image_filter.min_height]
+        if image_filter.max_bytes is not None:
+            sizes = self.sizes
+            indices = [i for i in indices if sizes[i] <= image_filter.max_bytes]
+        if image_filter.format is not None:
+            formats, code = self.formats, FORMAT_CODES[image_filter.format]
+            indices = [i for i in indices if formats[i] == code]
+        if image_filter.orientation == Orientation.LANDSCAPE:
+            indices = [i for i in indices if widths[i] > heights[i]]
+        elif image_filter.orientation == Orientation.PORTRAIT:
+            indices = [i for i in indices if heights[i] > widths[i]]
+        elif image_filter.orientation == Orientation.SQUARE:
+            indices = [i for i in indices if widths[i] == heights[i] and widths[i]]
+
+        matches = array("I", indices)
+        self._matches[key] = matches
+        if len(self._matches) > MATCH_CACHE_SIZE:
+            self._matches.popitem(last=False)
+        return matches
+
+    def columns(self) -> Tuple[array, array, array, array, array]:
+        return self.sizes, self.mtimes, self.formats, self.widths, self.heights
+
+def unchanged(old: Optional[DirRecord], record: DirRecord) -> bool:
+    return old is not None and old.mtime_ns == record.mtime_ns and old.end - old.start == record.end - record.start
+
+def carried_matches(index: MetadataIndex, catalog: Catalog, start: int, end: int, image_filter: ImageFilter) -> Optional[array]:
+    offset = None
+    for record in catalog.dir_records(start, end):
+        old = index.catalog.directory(record.path)
+        if not unchanged(old, record) or offset not in (None, old.start - record.start):
+            return None
+        offset = old.start - record.start
+    if offset is None:
+        return None
+    return array("I", (i - offset for i in index.matching(start + offset, end + offset, image_filter)))
+
+def build_index(
+    catalog: Catalog, previous: Dict[str, Row], workers: int = 0, reuse: Optional[MetadataIndex] = None
+) -> MetadataIndex:
+    copies: List[Optional[int]] = []
+    probe: List[int] = []
+    previous = dict(previous)
+    for record in catalog.dirs:
+        old = reuse.catalog.directory(record.path) if reuse is not None else None
+        if unchanged(old, record):
+            copies.append(old.start)
+            continue
+        copies.append(None)
+        probe.extend(range(record.start, record.end))
+        if old is not None:
+            previous.update((reuse.catalog.images[i], reuse.row(i)) for i in range(old.start, old.end))
+
+    entries = [(catalog.path(i),) + previous.get(catalog.images[i], (-1, -1))[:2] for i in probe]
+    chunks = [entries[i:i + CHUNK_SIZE] for i in range(0, len(entries), CHUNK_SIZE)]
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(entries) >= PARALLEL_THRESHOLD:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(min(workers, len(chunks)), mp_context=context) as pool:
+            results = list(pool.map(probe_chunk, chunks))
+    else:
+        results = [probe_chunk(chunk) for chunk in chunks]
+
+    columns = array("Q"), array("q"), array("B"), array("I"), array("I")
+    rows = itertools.chain.from_iterable(results)
+    for record, old_start in zip(catalog.dirs, copies):
+        if old_start is not None:
+            for column, old_column in zip(columns, reuse.columns()):
+                column.extend(old_column[old_start:old_start + record.end - record.start])
+            continue
+        for rel, row in zip(catalog.images[record.start:record.end], rows):
+            for column, value in zip(columns, row or previous[rel]):
+                column.append(value)
+    sizes, mtimes, formats, widths, heights = columns
+    return MetadataIndex(catalog, sizes, mtimes, widths, heights, formats)
+
+def write_index(index: MetadataIndex, path: Path):
+    root = index.catalog.location.encode("utf-8")
+    paths = "\n".join(index.catalog.images).encode("utf-8")
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with open(tmp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(index), len(root), len(paths)))
+        file.write(root)
+        file.write(paths)
+        for column in (index.sizes, index.mtimes, index.formats, index.widths, index.heights):
+            column.tofile(file)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(tmp, path)
+
+def read_index_rows(path: Path, root: Union[Path, str]) -> Dict[str, Row]:
+    try:
+        with open(path, "rb") as file:
+            magic, count, root_length, paths_length = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or file.read(root_length).decode("utf-8") != str(root):
+                return {}
+            paths = file.read(paths_length).decode("utf-8").split("\n") if count else []
+            columns = array("Q"), array("q"), array("B"), array("I"), array("I")
+            for column in columns:
+                column.fromfile(file, count)
+    except (OSError, struct.error, EOFError, UnicodeDecodeError, ValueError) as e:
+        logger.warning("Image metadata index %s ignored: %s", path, e)
+        return {}
+    return {rel: tuple(column[i] for column in columns) for i, rel in enumerate(paths)}
+
+class MetadataIndexer:
+    def __init__(self, path: Optional[Path], workers: int, persist: bool = True):
+        self.path = path
+        self.workers = workers
+        self.persist = persist
+        self.index: Optional[MetadataIndex] = None
+        self.builds = 0
+        self.last_build_seconds: Optional[float] = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="metadata-indexer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def request_build(self):
+        self._wake.set()
+
+    def _run(self):
+        from app.services.breed_service import get_catalog
+
+        while not self._stop.is_set():
+            self._wake.clear()
+            catalog = get_catalog()
+            if self.index is None or self.index.catalog.version != catalog.version:
+                try:
+                    self.build(catalog)
+                except Exception:
+                    logger.exception("Image metadata index build failed")
+            self._wake.wait(config.CATALOG_POLL_INTERVAL)
+
+    def build(self, catalog: Catalog) -> MetadataIndex:
+        started = time.perf_counter()
+        if self.index is None and self.path is not None:
+            previous = read_index_rows(self.path, catalog.location)
+        else:
+            previous = {}
+        index = build_index(catalog, previous, self.workers, self.index)
+        self.index = index
+        self.builds += 1
+        self.last_build_seconds = time.perf_counter() - started
+        if self.path is not None and self.persist:
+            write_index(index, self.path)
+        logger.info("Image metadata indexed %d images in %.2fs", len(index), self.last_build_seconds)
+        return index
+
+_indexer: Optional[MetadataIndexer] = None
+
+def get_indexer() -> Optional[MetadataIndexer]:
+    return _indexer
+
+def match_images(catalog: Catalog, start: int, end: int, image_filter: ImageFilter) -> array:
+    if _indexer is None:
+        raise MetadataUnavailable("Image filters require IMAGE_METADATA to be enabled")
+    index = _indexer.index
+    if index is not None and index.catalog.version == catalog.version:
+        return index.matching(start, end, image_filter)
+    _indexer.request_build()
+    matches = carried_matches(index, catalog, start, end, image_filter) if index is not None else None
+    if matches is None:
+        raise MetadataUnavailable("Image metadata index is still building")
+    return matches
+
+def start_metadata_indexer() -> Optional[MetadataIndexer]:
+    global _indexer
+    if not config.IMAGE_METADATA or _indexer is not None:
+        return _indexer
+    path = Path(config.IMAGE_METADATA_PATH) if config.IMAGE_METADATA_PATH else None
+    _indexer = MetadataIndexer(path, config.IMAGE_METADATA_WORKERS, config.PRIMARY_WORKER)
+    _indexer.start()
+    return _indexer
+
+def stop_metadata_indexer():
+    global _indexer
+    if _indexer is not None:
+        _indexer.stop()
+        _indexer = None
@@ -0,0 +1,284 @@
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import sqlite3
+import unicodedata
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, TextIO
+from app.models import ImageFormat
+from app.services.catalog import Catalog, scan_listings
+from app.services.catalog_watcher import apply_changes
+from app.services.image_metadata import FORMAT_CODES, PNG_SIGNATURE, read_dimensions
+
+CHUNK_SIZE = 256
+READ_SIZE = 1024 * 1024
+TAIL_SIZE = 32
+LOOKUP_BATCH = 500
+COMMIT_EVERY = 1000
+JPEG_CODE = FORMAT_CODES[ImageFormat.JPEG]
+PNG_CODE = FORMAT_CODES[ImageFormat.PNG]
+EXTENSIONS = {JPEG_CODE: ".jpg", PNG_CODE: ".png"}
+PNG_TRAILER = b"\x00\x00\x00\x00IEND\xaeB`\x82"
+NAME_SEPARATORS = re.compile(r"[^a-z0-9]+")
+
+ACCEPTED = "accepted"
+DUPLICATE = "duplicate"
+INVALID = "invalid"
+FAILED = "failed"
+
+class Inspection(NamedTuple):
+    path: str
+    format: int
+    size: int
+    digest: str
+    error: Optional[str]
+
+class Outcome(NamedTuple):
+    source: str
+    status: str
+    detail: str
+
+def inspect_file(path: str) -> Inspection:
+    image_format, width, height = read_dimensions(path)
+    digest = hashlib.blake2b(digest_size=16)
+    size = 0
+    tail = b""
+    try:
+        with open(path, "rb") as file:
+            head = file.read(len(PNG_SIGNATURE))
+            file.seek(0)
+            for block in iter(lambda: file.read(READ_SIZE), b""):
+                digest.update(block)
+                size += len(block)
+                tail = (tail + block)[-TAIL_SIZE:]
+    except OSError as e:
+        return Inspection(path, 0, 0, "", f"unreadable: {e.strerror}")
+
+    if not head.startswith(b"\xff\xd8\xff") and head != PNG_SIGNATURE:
+        error = "not a JPEG or PNG file"
+    elif not image_format or not width or not height:
+        error = "corrupt image header"
+    elif image_format == JPEG_CODE and not tail.rstrip(b"\x00\r\n ").endswith(b"\xff\xd9"):
+        error = "truncated JPEG (missing end of image marker)"
+    elif image_format == PNG_CODE and not tail.endswith(PNG_TRAILER):
+        error = "truncated PNG (missing IEND chunk)"
+    else:
+        error = None
+    return Inspection(path, image_format, size, digest.hexdigest(), error)
+
+def inspect_chunk(paths: List[str]) -> List[Inspection]:
+    return [inspect_file(path) for path in paths]
+
+def iter_chunks(items: Iterable[str], size: int) -> Iterator[List[str]]:
+    chunk: List[str] = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def inspect_stream(paths: Iterable[str], workers: int) -> Iterator[Inspection]:
+    chunks = iter_chunks(paths, CHUNK_SIZE)
+    if workers <= 1:
+        for chunk in chunks:
+            yield from inspect_chunk(chunk)
+        return
+
+    import multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(inspect_chunk, chunk))
+            if len(pending) >= workers * 2:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def iter_drop(drop: Path) -> Iterator[str]:
+    pending = [str(drop)]
+    while pending:
+        directory = pending.pop()
+        with os.scandir(directory) as entries:
+            entries = sorted(entries, key=lambda entry: entry.name)
+        for entry in reversed(entries):
+            if entry.is_dir(follow_symlinks=False):
+                pending.append(entry.path)
+        for entry in entries:
+            if entry.is_file(follow_symlinks=False):
+                yield entry.path
+
+def normalize_component(name: str) -> str:
+    name = unicodedata.normalize("NFKD", name).encode("ascii", "ignore").decode("ascii").lower()
+    return NAME_SEPARATORS.sub("-", name).strip("-")
+
+def normalize_name(name: str, image_format: int) -> str:
+    stem = normalize_component(os.path.splitext(name)[0]) or "image"
+    return stem + EXTENSIONS[image_format]
+
+def normalize_dir(drop: Path, path: str) -> Optional[str]:
+    parts = Path(path).parent.relative_to(drop).parts
+    normalized = [normalize_component(part) for part in parts]
+    if not normalized or not all(normalized):
+        return None
+    return "/".join(normalized)
+
+def atomic_move(source: str, target: Path):
+    try:
+        os.link(source, target)
+    except OSError as e:
+        if e.errno not in (errno.EXDEV, errno.EPERM, errno.EOPNOTSUPP):
+            raise
+        tmp_path = target.with_name(f".{target.name}.ingesting")
+        shutil.copy2(source, tmp_path)
+        with open(tmp_path, "rb") as file:
+            os.fsync(file.fileno())
+        try:
+            os.link(tmp_path, target)
+        finally:
+            os.unlink(tmp_path)
+    os.unlink(source)
+
+class HashIndex:
+    def __init__(self, path: Path):
+        self.connection = sqlite3.connect(str(path))
+        self.connection.executescript(
+            "PRAGMA journal_mode=WAL;"
+            "PRAGMA synchronous=NORMAL;"
+            "CREATE TABLE IF NOT EXISTS files (rel TEXT PRIMARY KEY, digest TEXT NOT NULL, size INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS files_digest ON files (digest);"
+        )
+        self._writes = 0
+
+    def clear(self):
+        self.connection.execute("DELETE FROM files")
+        self.connection.commit()
+
+    def missing(self, rels: List[str]) -> List[str]:
+        placeholders = ",".join("?" * len(rels))
+        rows = self.connection.execute(f"SELECT rel FROM files WHERE rel IN ({placeholders})", rels)
+        known = {rel for (rel,) in rows}
+        return [rel for rel in rels if rel not in known]
+
+    def lookup(self, digest: str) -> List[str]:
+        return [rel for (rel,) in self.connection.execute("SELECT rel FROM files WHERE digest = ?", (digest,))]
+
+    def add(self, rel: str, digest: str, size: int):
+        self.connection.execute("INSERT OR REPLACE INTO files VALUES (?, ?, ?)", (rel, digest, size))
+        self._writes += 1
+        if self._writes >= COMMIT_EVERY:
+            self.commit()
+
+    def remove(self, rel: str):
+        self.connection.execute("DELETE FROM files WHERE rel = ?", (rel,))
+
+    def commit(self):
+        self.connection.commit()
+        self._writes = 0
+
+    def close(self):
+        self.commit()
+        self.connection.close()
+
+class IngestReport:
+    def __init__(self):
+        self.counts: Dict[str, int] = {ACCEPTED: 0, DUPLICATE: 0, INVALID: 0, FAILED: 0}
+        self.indexed = 0
+        self.changed_dirs: Set[str] = set()
+
+    def summary(self) -> str:
+        return ", ".join(f"{count} {status}" for status, count in self.counts.items())
+
+def sync_index(index: HashIndex, catalog: Catalog, workers: int) -> int:
+    def unindexed() -> Iterator[str]:
+        images = catalog.images
+        for start in range(0, len(images), LOOKUP_BATCH):
+            for rel in index.missing(list(images[start:start + LOOKUP_BATCH])):
+                yield os.path.join(catalog.root, rel)
+
+    indexed = 0
+    for inspection in inspect_stream(unindexed(), workers):
+        if inspection.digest:
+            rel = Path(inspection.path).relative_to(catalog.root).as_posix()
+            index.add(rel, inspection.digest, inspection.size)
+            indexed += 1
+    index.commit()
+    return indexed
+
+def find_duplicate(index: HashIndex, assets: Path, digest: str) -> Optional[str]:
+    for rel in index.lookup(digest):
+        if os.path.isfile(os.path.join(assets, rel)):
+            return rel
+        index.remove(rel)
+    return None
+
+def place(assets: Path, directory: str, name: str) -> Path:
+    target = assets / directory / name
+    stem, suffix = os.path.splitext(name)
+    counter = 1
+    while target.exists():
+        counter += 1
+        target = assets / directory / f"{stem}-{counter}{suffix}"
+    return target
+
+def ingest(
+    drop: Path,
+    assets: Path,
+    index: HashIndex,
+    catalog: Catalog,
+    workers: int,
+    log: Optional[TextIO] = None,
+) -> IngestReport:
+    report = IngestReport()
+    report.indexed = sync_index(index, catalog, workers)
+
+    def record(outcome: Outcome):
+        report.counts[outcome.status] += 1
+        if log is not None:
+            log.write(json.dumps(outcome._asdict()) + "\n")
+
+    for inspection in inspect_stream(iter_drop(drop), workers):
+        source = inspection.path
+        if inspection.error is not None:
+            record(Outcome(source, INVALID, inspection.error))
+            continue
+        directory = normalize_dir(drop, source)
+        if directory is None:
+            record(Outcome(source, INVALID, "file is not inside a breed directory"))
+            continue
+        duplicate = find_duplicate(index, assets, inspection.digest)
+        if duplicate is not None:
+            record(Outcome(source, DUPLICATE, duplicate))
+            continue
+
+        try:
+            (assets / directory).mkdir(parents=True, exist_ok=True)
+            target = place(assets, directory, normalize_name(os.path.basename(source), inspection.format))
+            atomic_move(source, target)
+        except OSError as e:
+            record(Outcome(source, FAILED, str(e)))
+            continue
+        rel = target.relative_to(assets).as_posix()
+        index.add(rel, inspection.digest, inspection.size)
+        parts = directory.split("/")
+        report.changed_dirs.update("/".join(parts[:depth]) for depth in range(len(parts) + 1))
+        record(Outcome(source, ACCEPTED, rel))
+    index.commit()
+    return report
+
+def updated_catalog(assets: Path, catalog: Catalog, report: IngestReport, roots: List[Path]) -> Catalog:
+    listings = apply_changes(assets, catalog.listings(), report.changed_dirs)
+    resolved = [root.resolve() for root in roots]
+    if assets.resolve() not in resolved:
+        return Catalog.from_listings(assets, listings)
+    target = resolved.index(assets.resolve())
+    sources = [listings if i == target else scan_listings(root) for i, root in enumerate(roots)]
+    return Catalog.from_sources(roots, sources)
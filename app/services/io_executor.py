@@ -0,0 +1,101 @@
+import asyncio
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable, Optional
+import config
+
+class IOQueueFull(RuntimeError):
+    pass
+
+class IOTimeout(TimeoutError):
+    pass
+
+class IOExecutor:
+    def __init__(self, max_workers: int, max_queue: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.pending = 0
+        self.submitted = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.coalesced = 0
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._flights: Dict[Hashable, asyncio.Future] = {}
+
+    def submit(self, func: Callable, *args, limit: bool = True) -> asyncio.Future:
+        if limit and self.pending >= self.max_queue:
+            self.rejected += 1
+            raise IOQueueFull(f"{self.pending} filesystem operations already pending")
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(self.max_workers, thread_name_prefix="io")
+        future = asyncio.wrap_future(self._pool.submit(contextvars.copy_context().run, func, *args))
+        self.pending += 1
+        self.submitted += 1
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future: asyncio.Future):
+        self.pending -= 1
+        if not future.cancelled():
+            future.exception()
+
+    async def run(self, func: Callable, *args) -> Any:
+        return await self._wait(self.submit(func, *args))
+
+    async def run_committed(self, func: Callable, *args) -> Any:
+        return await self.submit(func, *args, limit=False)
+
+    async def run_once(self, key: Hashable, func: Callable, *args) -> Any:
+        future = self._flights.get(key)
+        if future is None:
+            future = self.submit(func, *args)
+            self._flights[key] = future
+            future.add_done_callback(lambda _: self._flights.pop(key, None))
+        else:
+            self.coalesced += 1
+        return await self._wait(future)
+
+    async def _wait(self, future: asyncio.Future) -> Any:
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise IOTimeout(f"Filesystem operation exceeded {self.timeout}s") from None
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+io_executor = IOExecutor(config.IO_WORKERS, config.IO_MAX_QUEUE, config.IO_TIMEOUT)
+
+class LoopLagMonitor:
+    def __init__(self, interval: float, window: int = 120):
+        self.interval = interval
+        self.lag = 0.0
+        self._recent: deque = deque(maxlen=window)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def max_lag(self) -> float:
+        return max(self._recent, default=0.0)
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - expected)
+            self._recent.append(self.lag)
+
+loop_monitor = LoopLagMonitor(config.LOOP_LAG_INTERVAL)
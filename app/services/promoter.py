@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import config
+from app.metrics import metrics
+from app.services import breed_service
+from app.services.catalog import Catalog
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = ".promoted.json"
+SCORE_DECAY = 0.5
+MIN_SCORE = 0.5
+
+def read_manifest(root: Path) -> Dict[str, int]:
+    path = root / MANIFEST_NAME
+    try:
+        with open(path, encoding="utf-8") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("Ignoring promotion manifest %s: %s", path, e)
+        return {}
+
+class Promoter:
+    def __init__(
+        self,
+        roots: Sequence[Path],
+        max_bytes: int,
+        min_hits: int,
+        interval: float,
+        primary: bool = True,
+        hits_dir: Optional[Path] = None,
+    ):
+        self.roots = list(roots)
+        self.max_bytes = max_bytes
+        self.min_hits = min_hits
+        self.interval = interval
+        self.primary = primary
+        self.hits_dir = hits_dir
+        self.manifest_path = self.roots[0] / MANIFEST_NAME
+        self.manifest_stamp: Optional[Tuple[int, int]] = None
+        self.hits: Counter = Counter()
+        self.scores: Dict[str, float] = {}
+        self.manifest_changed()
+        self.promoted: Dict[str, int] = self.load_manifest()
+        self.published = 0
+        self.promotions = 0
+        self.evictions = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def promoted_bytes(self) -> int:
+        return sum(self.promoted.values())
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="hot-promoter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def record(self, rel: str):
+        self.hits[rel] += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self.primary:
+                    self.cycle()
+                else:
+                    self.publish_hits()
+                    self.follow()
+            except Exception:
+                logger.exception("Hot image promotion failed")
+
+    def manifest_changed(self) -> bool:
+        metrics.count_fs("stat")
+        try:
+            stat = os.stat(self.manifest_path)
+            stamp = (stat.st_ino, stat.st_mtime_ns)
+        except OSError:
+            stamp = None
+        changed = stamp != self.manifest_stamp
+        self.manifest_stamp = stamp
+        return changed
+
+    def load_manifest(self) -> Dict[str, int]:
+        entries = read_manifest(self.roots[0])
+        return {rel: size for rel, size in entries.items() if (self.roots[0] / rel).is_file()}
+
+    def publish_hits(self):
+        hits, self.hits = self.hits, Counter()
+        if not hits or self.hits_dir is None:
+            return
+        self.published += 1
+        path = self.hits_dir / f"hits-{os.getpid()}-{self.published}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(hits))
+        os.replace(tmp_path, path)
+
+    def collect_hits(self) -> Counter:
+        hits: Counter = Counter()
+        if self.hits_dir is None:
+            return hits
+        for path in self.hits_dir.glob("hits-*.json"):
+            try:
+                counts = json.loads(path.read_text())
+            except FileNotFoundError:
+                continue
+            except (OSError, ValueError) as e:
+                logger.warning("Ignoring hit counts in %s: %s", path, e)
+                counts = {}
+            path.unlink(missing_ok=True)
+            hits.update(counts)
+        return hits
+
+    def follow(self) -> Dict[int, int]:
+        from app.services.image_files import stat_cache
+
+        if not self.manifest_changed():
+            return {}
+        previous, self.promoted = self.promoted, self.load_manifest()
+        catalog = breed_service.get_catalog()
+        changes: Dict[int, int] = {}
+        for rel in set(previous).symmetric_difference(self.promoted):
+            stat_cache.discard(rel)
+            index = catalog.find_image(rel)
+            if index is None:
+                continue
+            root_index = 0 if rel in self.promoted else self.fallback_root(rel)
+            if root_index is not None and root_index != catalog.root_index(index):
+                changes[index] = root_index
+        if changes and not breed_service.replace_catalog(catalog, catalog.with_image_roots(changes)):
+            logger.info("Catalog changed while following promotions, leaving image roots to the next scan")
+        return changes
+
+    def write_manifest(self):
+        tmp_path = self.manifest_path.with_name(f"{self.manifest_path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(self.promoted, file, sort_keys=True)
+        os.replace(tmp_path, self.manifest_path)
+
+    def decay(self, shared: Optional[Counter] = None):
+        hits, self.hits = self.hits, Counter()
+        if shared:
+            hits.update(shared)
+        scores = {rel: score * SCORE_DECAY for rel, score in self.scores.items()}
+        for rel, count in hits.items():
+            scores[rel] = scores.get(rel, 0.0) + count
+        self.scores = {rel: score for rel, score in scores.items() if score >= MIN_SCORE or rel in self.promoted}
+
+    def candidates(self, catalog: Catalog) -> List[Tuple[float, str, int]]:
+        found = []
+        for rel, score in self.scores.items():
+            if score < self.min_hits or rel in self.promoted:
+                continue
+            index = catalog.find_image(rel)
+            if index is not None and catalog.root_index(index) > 0:
+                found.append((score, rel, index))
+        found.sort(reverse=True)
+        return found
+
+    def cycle(self) -> Dict[int, int]:
+        self.decay(self.collect_hits())
+        catalog = breed_service.get_catalog()
+        if len(catalog.roots) < 2:
+            return {}
+        changes: Dict[int, int] = {}
+        used = self.promoted_bytes
+        for score, rel, index in self.candidates(catalog):
+            source = catalog.path(index)
+            metrics.count_fs("stat")
+            try:
+                size = os.stat(source).st_size
+            except OSError:
+                continue
+            if size > self.max_bytes:
+                continue
+            victims = []
+            freed = 0
+            for victim in sorted(self.promoted, key=lambda name: self.scores.get(name, 0.0)):
+                if used - freed + size <= self.max_bytes or self.scores.get(victim, 0.0) >= score:
+                    break
+                victims.append(victim)
+                freed += self.promoted[victim]
+            if used - freed + size > self.max_bytes:
+                continue
+            for victim in victims:
+                used -= self.evict(catalog, victim, changes)
+            if self.promote(source, rel, size):
+                used += size
+                changes[index] = 0
+        if changes:
+            self.write_manifest()
+            if not breed_service.replace_catalog(catalog, catalog.with_image_roots(changes)):
+                logger.info("Catalog changed during promotion, leaving image roots to the next scan")
+            logger.info("Promoted images now use %d of %d bytes", used, self.max_bytes)
+        return changes
+
+    def promote(self, source: str, rel: str, size: int) -> bool:
+        target = self.roots[0] / rel
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.promoting")
+        self.promoted[rel] = size
+        self.write_manifest()
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(source, tmp_path)
+            os.replace(tmp_path, target)
+        except OSError as e:
+            logger.warning("Promoting %s failed: %s", rel, e)
+            try:
+                tmp_path.unlink()
+            except OSError:
+                pass
+            del self.promoted[rel]
+            self.write_manifest()
+            return False
+        self.promotions += 1
+        return True
+
+    def evict(self, catalog: Catalog, rel: str, changes: Dict[int, int]) -> int:
+        from app.services.image_files import stat_cache
+
+        size = self.promoted.pop(rel)
+        try:
+            (self.roots[0] / rel).unlink()
+        except FileNotFoundError:
+            pass
+        stat_cache.discard(rel)
+        self.evictions += 1
+        index = catalog.find_image(rel)
+        if index is not None:
+            root_index = self.fallback_root(rel)
+            if root_index is not None:
+                changes[index] = root_index
+        return size
+
+    def fallback_root(self, rel: str) -> Optional[int]:
+        for root_index, root in enumerate(self.roots[1:], 1):
+            metrics.count_fs("stat")
+            if (root / rel).is_file():
+                return root_index
+        return None
+
+_promoter: Optional[Promoter] = None
+
+def record_access(rel: str):
+    if _promoter is not None:
+        _promoter.record(rel)
+
+def is_promoted(rel: str) -> bool:
+    return _promoter is not None and rel in _promoter.promoted
+
+def get_promoter() -> Optional[Promoter]:
+    return _promoter
+
+def start_promoter() -> Optional[Promoter]:
+    global _promoter
+    roots = breed_service.asset_roots()
+    if not config.PROMOTE_ENABLED or len(roots) < 2 or _promoter is not None:
+        return _promoter
+    _promoter = Promoter(
+        roots,
+        config.PROMOTE_MAX_BYTES,
+        config.PROMOTE_MIN_HITS,
+        config.PROMOTE_INTERVAL,
+        primary=config.PRIMARY_WORKER,
+        hits_dir=Path(config.METRICS_DIR) if config.METRICS_DIR else None,
+    )
+    _promoter.start()
+    return _promoter
+
+def stop_promoter():
+    global _promoter
+    if _promoter is not None:
+        _promoter.stop()
+        _promoter = None
@@ -0,0 +1,102 @@
+import itertools
+import random
+from bisect import bisect_right
+from typing import Dict, List, Optional, Sequence, Tuple
+from app.services.catalog import Catalog
+
+class AliasTable:
+    def __init__(self, weights: Sequence[float]):
+        self.size = len(weights)
+        self.prob = [1.0] * self.size
+        self.alias = list(range(self.size))
+        total = sum(weights)
+        if not self.size or total <= 0:
+            self.size = 0
+            return
+
+        scaled = [weight * self.size / total for weight in weights]
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            if scaled[more] < 1.0:
+                small.append(more)
+            else:
+                large.append(more)
+
+    def draw(self) -> int:
+        column = random.randrange(self.size)
+        return column if random.random() < self.prob[column] else self.alias[column]
+
+class CatalogSampler:
+    def __init__(self, catalog: Catalog, weights: Dict[str, float]):
+        self.catalog = catalog
+        self.weighted = bool(weights)
+        self._groups: Dict[str, Tuple[List[Tuple[int, int]], AliasTable]] = {}
+
+        breed_groups = []
+        subbreed_groups = []
+        for breed, sub_breeds in catalog.breeds.items():
+            weight = weights.get(breed, 1.0)
+            if weight <= 0:
+                continue
+            start, end = catalog.image_range(breed)
+            if start < end:
+                breed_groups.append((start, end, weight))
+            own = catalog.directory(breed)
+            if own.start < own.end:
+                subbreed_groups.append((own.start, own.end, weight))
+            for sub_breed in sub_breeds:
+                start, end = catalog.image_range(breed, sub_breed)
+                if start < end:
+                    subbreed_groups.append((start, end, weight))
+
+        self._add("image", [(start, end, weight * (end - start)) for start, end, weight in breed_groups])
+        self._add("breed", breed_groups)
+        self._add("subbreed", subbreed_groups)
+
+    def _add(self, mode: str, groups: List[Tuple[int, int, float]]):
+        ranges = [(start, end) for start, end, _ in groups]
+        self._groups[mode] = (ranges, AliasTable([weight for _, _, weight in groups]))
+
+    def draw(self, mode: str = "image") -> Optional[str]:
+        ranges, table = self._groups[mode]
+        if not table.size:
+            return None
+        start, end = ranges[table.draw()]
+        return self.catalog.images[random.randrange(start, end)]
+
+    def _fill(self, chosen: Dict[int, None], count: int, ranges: List[Tuple[int, int]], available: int):
+        offsets = list(itertools.accumulate(end - start for start, end in ranges))
+        swaps: Dict[int, int] = {}
+        for drawn in range(available):
+            pick = random.randrange(drawn, available)
+            position = swaps.get(pick, pick)
+            swaps[pick] = swaps.get(drawn, drawn)
+            group = bisect_right(offsets, position)
+            first = offsets[group - 1] if group else 0
+            chosen[ranges[group][0] + position - first] = None
+            if len(chosen) == count:
+                return
+
+    def sample(self, count: int, mode: str = "image") -> List[str]:
+        if mode == "image" and not self.weighted:
+            return self.catalog.sample_images(count)
+        ranges, table = self._groups[mode]
+        if not table.size:
+            return []
+        available = sum(end - start for start, end in ranges)
+        count = min(count, available)
+        chosen: Dict[int, None] = {}
+        attempts = count * 8
+        while len(chosen) < count and attempts:
+            start, end = ranges[table.draw()]
+            chosen[random.randrange(start, end)] = None
+            attempts -= 1
+        if len(chosen) < count:
+            self._fill(chosen, count, ranges, available)
+        return [self.catalog.images[index] for index in chosen]
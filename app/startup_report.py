@@ -0,0 +1,92 @@
+import asyncio
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Tuple
+
+IMPORT_TIME = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)\s*$")
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+TOP_MODULES = 25
+
+class ImportTime(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+def parse_import_times(text: str) -> List[ImportTime]:
+    rows = []
+    for line in text.splitlines():
+        match = IMPORT_TIME.match(line)
+        if match is not None:
+            self_us, cumulative_us, indent, module = match.groups()
+            rows.append(ImportTime(module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+def measure_imports(module: str = "app.main") -> List[ImportTime]:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return parse_import_times(result.stderr)
+
+def group_by_package(rows: List[ImportTime]) -> Dict[str, int]:
+    totals: Dict[str, int] = defaultdict(int)
+    for row in rows:
+        package = row.module if row.module.startswith(("app.", "config")) else row.module.partition(".")[0]
+        totals[package] += row.self_us
+    return dict(sorted(totals.items(), key=lambda item: item[1], reverse=True))
+
+async def run_lifespan(app, phases: List[Tuple[str, float]]):
+    started = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        phases.append(("lifespan startup", time.perf_counter() - started))
+        started = time.perf_counter()
+    phases.append(("lifespan shutdown", time.perf_counter() - started))
+
+def measure_startup() -> List[Tuple[str, float]]:
+    phases: List[Tuple[str, float]] = []
+    started = time.perf_counter()
+    from app.main import app
+    phases.append(("import app.main", time.perf_counter() - started))
+
+    from app.openapi import get_openapi_body
+    from app.services.breed_service import load_catalog
+
+    started = time.perf_counter()
+    load_catalog()
+    phases.append(("catalog load", time.perf_counter() - started))
+    started = time.perf_counter()
+    get_openapi_body(app)
+    phases.append(("openapi document", time.perf_counter() - started))
+    asyncio.run(run_lifespan(app, phases))
+    return phases
+
+def startup_report(budget_ms: float = 0) -> int:
+    rows = measure_imports()
+    print(f"Slowest imports (python -X importtime, top {TOP_MODULES} by cumulative time)")
+    print(f"  {'module':<48} {'self ms':>9} {'total ms':>9}")
+    for row in sorted(rows, key=lambda row: row.cumulative_us, reverse=True)[:TOP_MODULES]:
+        print(f"  {row.module:<48} {row.self_us / 1000:>9.1f} {row.cumulative_us / 1000:>9.1f}")
+
+    print("\nImport time by package (self time)")
+    for package, self_us in list(group_by_package(rows).items())[:TOP_MODULES]:
+        print(f"  {package:<48} {self_us / 1000:>9.1f}")
+
+    phases = measure_startup()
+    print("\nStartup phases")
+    for name, seconds in phases:
+        print(f"  {name:<48} {seconds * 1000:>9.1f}")
+    total_ms = sum(seconds for name, seconds in phases if name != "lifespan shutdown") * 1000
+    print(f"  {'cold start total':<48} {total_ms:>9.1f}")
+
+    if budget_ms and total_ms > budget_ms:
+        print(f"\nCold start took {total_ms:.1f}ms, over the {budget_ms:.1f}ms budget")
+        return 1
+    return 0
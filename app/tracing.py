@@ -0,0 +1,344 @@
+import functools
+import json
+import logging
+import random
+import re
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from fastapi.responses import JSONResponse, Response
+from fastapi.routing import APIRoute
+import config
+from app.metrics import fs_counts
+
+logger = logging.getLogger(__name__)
+
+TRACEPARENT = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})(?:-.*)?$")
+INVALID_TRACE_ID = "0" * 32
+INVALID_SPAN_ID = "0" * 16
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_ERROR = 2
+
+_current: "ContextVar[Optional[Span]]" = ContextVar("current_span", default=None)
+
+def new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+def parse_traceparent(value: str) -> Optional[Tuple[str, str, bool]]:
+    value = value.strip().lower()
+    match = TRACEPARENT.match(value)
+    if match is None:
+        return None
+    version, trace_id, parent_id, flags = match.group(1, 2, 3, 4)
+    if version == "ff" or (version == "00" and len(value) != 55):
+        return None
+    if trace_id == INVALID_TRACE_ID or parent_id == INVALID_SPAN_ID:
+        return None
+    return trace_id, parent_id, bool(int(flags, 16) & 1)
+
+def format_traceparent(trace_id: str, span_id: str, sampled: bool) -> str:
+    return f"00-{trace_id}-{span_id}-{'01' if sampled else '00'}"
+
+class Trace:
+    __slots__ = ("trace_id", "sampled", "spans", "handler_end")
+
+    def __init__(self, trace_id: str, sampled: bool):
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.spans: List["Span"] = []
+        self.handler_end: Optional[int] = None
+
+class Span:
+    __slots__ = ("trace", "name", "span_id", "parent_id", "kind", "start", "end", "attributes", "_token")
+
+    def __init__(
+        self,
+        trace: Trace,
+        name: str,
+        parent_id: Optional[str],
+        attributes: Optional[Dict[str, Any]] = None,
+        kind: int = SPAN_KIND_INTERNAL,
+        start: Optional[int] = None,
+    ):
+        self.trace = trace
+        self.name = name
+        self.span_id = new_id(64)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.start = time.time_ns() if start is None else start
+        self.end = 0
+        self.attributes = attributes or {}
+        self._token = None
+
+    def __enter__(self) -> "Span":
+        self._token = _current.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        _current.reset(self._token)
+        self.finish()
+
+    def set(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def finish(self, end: Optional[int] = None):
+        self.end = time.time_ns() if end is None else end
+        self.trace.spans.append(self)
+
+    def child(self, name: str, **attributes) -> "Span":
+        return Span(self.trace, name, self.span_id, attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end - self.start) / 1e6
+
+class NoopSpan:
+    def __enter__(self) -> "NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        pass
+
+    def set(self, key: str, value: Any):
+        pass
+
+NOOP_SPAN = NoopSpan()
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+def span(name: str, **attributes):
+    parent = _current.get()
+    if parent is None:
+        return NOOP_SPAN
+    return Span(parent.trace, name, parent.span_id, attributes)
+
+def traced(func: Callable) -> Callable:
+    name = f"{func.__module__.rpartition('.')[2]}.{func.__name__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        parent = _current.get()
+        if parent is None:
+            return func(*args, **kwargs)
+        counts = {"stat": 0, "scandir": 0}
+        token = fs_counts.set(counts)
+        with Span(parent.trace, name, parent.span_id) as current:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                fs_counts.reset(token)
+                outer = fs_counts.get()
+                if outer is not None:
+                    for kind, count in counts.items():
+                        outer[kind] += count
+                current.attributes["fs.stat"] = counts["stat"]
+                current.attributes["fs.scandir"] = counts["scandir"]
+
+    return wrapper
+
+def traced_endpoint(endpoint: Callable) -> Callable:
+    if getattr(endpoint, "__traced__", False):
+        return endpoint
+
+    @functools.wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        parent = _current.get()
+        if parent is None:
+            return await endpoint(*args, **kwargs)
+        with Span(parent.trace, "handler", parent.span_id):
+            result = await endpoint(*args, **kwargs)
+        if not isinstance(result, Response):
+            parent.trace.handler_end = time.time_ns()
+        return result
+
+    wrapper.__traced__ = True
+    return wrapper
+
+class TracedRoute(APIRoute):
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, traced_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        route = self.path
+
+        async def traced_handler(request):
+            parent = _current.get()
+            if parent is None:
+                return await handler(request)
+            with Span(parent.trace, "route", parent.span_id, {"http.route": route}):
+                return await handler(request)
+
+        return traced_handler
+
+class TracedJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        parent = _current.get()
+        if parent is None:
+            return super().render(content)
+        trace = parent.trace
+        if trace.handler_end is not None:
+            Span(trace, "response.validate", parent.span_id, start=trace.handler_end).finish()
+            trace.handler_end = None
+        with Span(trace, "json.encode", parent.span_id):
+            return super().render(content)
+
+def otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+def otlp_payload(traces: List[Trace], service_name: str) -> Dict[str, Any]:
+    spans = []
+    for trace in traces:
+        for item in trace.spans:
+            record = {
+                "traceId": trace.trace_id,
+                "spanId": item.span_id,
+                "name": item.name,
+                "kind": item.kind,
+                "startTimeUnixNano": str(item.start),
+                "endTimeUnixNano": str(item.end),
+                "attributes": [{"key": key, "value": otlp_value(value)} for key, value in item.attributes.items()],
+            }
+            if item.parent_id:
+                record["parentSpanId"] = item.parent_id
+            if "error" in item.attributes:
+                record["status"] = {"code": STATUS_ERROR}
+            spans.append(record)
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": service_name}}]},
+            "scopeSpans": [{"scope": {"name": "dog-api"}, "spans": spans}],
+        }]
+    }
+
+def trace_record(trace: Trace, service_name: str) -> Dict[str, Any]:
+    root = trace.spans[-1]
+    return {
+        "service": service_name,
+        "trace_id": trace.trace_id,
+        "name": root.name,
+        "start_ns": root.start,
+        "duration_ms": round(root.duration_ms, 3),
+        "spans": [
+            {
+                "span_id": item.span_id,
+                "parent_id": item.parent_id,
+                "name": item.name,
+                "start_ns": item.start,
+                "duration_ms": round(item.duration_ms, 3),
+                "attributes": item.attributes,
+            }
+            for item in sorted(trace.spans, key=lambda item: item.start)
+        ],
+    }
+
+class TraceExporter:
+    def __init__(self, path: Optional[Path], endpoint: str, batch_size: int, max_queue: int, interval: float):
+        self.path = path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.max_queue = max_queue
+        self.interval = interval
+        self.service_name = config.TRACE_SERVICE_NAME
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+        self._queue: Deque[Trace] = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    def submit(self, trace: Trace):
+        if len(self._queue) >= self.max_queue:
+            self.dropped += 1
+            return
+        self._queue.append(trace)
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        while self._queue:
+            batch = []
+            while self._queue and len(batch) < self.batch_size:
+                batch.append(self._queue.popleft())
+            try:
+                if self.endpoint:
+                    self.post(batch)
+                else:
+                    self.write(batch)
+                self.exported += len(batch)
+            except Exception as e:
+                self.failed += len(batch)
+                logger.warning("Exporting %d traces failed: %s", len(batch), e)
+
+    def write(self, batch: List[Trace]):
+        lines = [json.dumps(trace_record(trace, self.service_name), default=str) + "\n" for trace in batch]
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.writelines(lines)
+
+    def post(self, batch: List[Trace]):
+        import urllib.request
+
+        body = json.dumps(otlp_payload(batch, self.service_name), default=str).encode("utf-8")
+        request = urllib.request.Request(
+            self.endpoint, data=body, headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=10) as response:
+            response.read()
+
+_exporter: Optional[TraceExporter] = None
+
+def tracing_enabled() -> bool:
+    return config.TRACE_SAMPLE_RATE > 0 or config.TRACE_SLOW_MS > 0
+
+def get_exporter() -> Optional[TraceExporter]:
+    return _exporter
+
+def start_tracer() -> Optional[TraceExporter]:
+    global _exporter
+    if not tracing_enabled() or _exporter is not None:
+        return _exporter
+    path = Path(config.TRACE_FILE) if config.TRACE_FILE else None
+    if path is None and not config.TRACE_OTLP_ENDPOINT:
+        return None
+    _exporter = TraceExporter(
+        path, config.TRACE_OTLP_ENDPOINT, config.TRACE_BATCH_SIZE, config.TRACE_MAX_QUEUE, config.TRACE_FLUSH_INTERVAL
+    )
+    _exporter.start()
+    return _exporter
+
+def stop_tracer():
+    global _exporter
+    if _exporter is not None:
+        _exporter.stop()
+        _exporter = None
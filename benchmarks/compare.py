@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""Compare a benchmark report with a stored baseline and fail on regressions.
+
+Usage: python -m benchmarks.compare bench_output.json benchmarks/baseline.json --threshold 0.25
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+def regressions(current: Dict, baseline: Dict, threshold: float, min_delta_ms: float) -> List[str]:
+    failures = []
+    for name, base in baseline["routes"].items():
+        stats = current["routes"].get(name)
+        if stats is None:
+            failures.append(f"{name}: missing from the current run")
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            delta = stats[metric] - base[metric]
+            if delta > min_delta_ms and stats[metric] > base[metric] * (1 + threshold):
+                failures.append(f"{name}: {metric} {base[metric]:.2f} -> {stats[metric]:.2f}")
+        cost_delta_ms = 1000 / stats["rps"] - 1000 / base["rps"]
+        if cost_delta_ms > min_delta_ms and stats["rps"] < base["rps"] * (1 - threshold):
+            failures.append(f"{name}: rps {base['rps']:.0f} -> {stats['rps']:.0f}")
+        if stats["errors"] > base["errors"]:
+            failures.append(f"{name}: errors {base['errors']} -> {stats['errors']}")
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("current", type=Path)
+    parser.add_argument("baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore latency changes below this")
+    args = parser.parse_args()
+
+    current = json.loads(args.current.read_text())
+    baseline = json.loads(args.baseline.read_text())
+    failures = regressions(current, baseline, args.threshold, args.min_delta_ms)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    if failures:
+        sys.exit(1)
+    print(f"No regressions above {args.threshold:.0%} across {len(baseline['routes'])} routes")
+
+if __name__ == "__main__":
+    main()
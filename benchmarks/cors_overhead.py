@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""Per-request overhead of the CORS middleware, before and after the pure ASGI rewrite.
+
+Usage: python -m benchmarks.cors_overhead [--requests N]
+"""
+import argparse
+import asyncio
+import time
+from typing import Callable
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from app.middleware.cors import CustomCORSMiddleware, is_origin_allowed
+
+ORIGIN = b"https://woof-app-ff670abc.web.app"
+
+class LegacyCORSMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request: Request, call_next: Callable):
+        origin = request.headers.get("origin")
+        if request.method == "OPTIONS":
+            if origin and is_origin_allowed.__wrapped__(origin):
+                response = Response()
+                response.headers["Access-Control-Allow-Origin"] = origin
+                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+                response.headers["Access-Control-Allow-Headers"] = "*"
+                response.headers["Access-Control-Allow-Credentials"] = "true"
+                response.headers["Access-Control-Max-Age"] = "3600"
+                return response
+            return Response(status_code=403)
+        response = await call_next(request)
+        if origin and is_origin_allowed.__wrapped__(origin):
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, OPTIONS, PATCH"
+            response.headers["Access-Control-Allow-Headers"] = "*"
+        return response
+
+async def endpoint(scope, receive, send):
+    await PlainTextResponse("woof")(scope, receive, send)
+
+def make_scope():
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/breeds/list/all",
+        "raw_path": b"/breeds/list/all",
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"localhost"), (b"origin", ORIGIN)],
+        "client": ("127.0.0.1", 50000),
+        "server": ("127.0.0.1", 8000),
+    }
+
+def make_receive():
+    messages = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()
+
+    return receive
+
+async def run(app, requests: int) -> float:
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(make_scope(), make_receive(), send)
+    return (time.perf_counter() - started) / requests * 1e6
+
+async def main(requests: int):
+    variants = [
+        ("no middleware", endpoint),
+        ("BaseHTTPMiddleware (before)", LegacyCORSMiddleware(endpoint)),
+        ("pure ASGI (after)", CustomCORSMiddleware(endpoint)),
+    ]
+    baseline = None
+    for name, app in variants:
+        await run(app, min(requests, 1000))
+        per_request = await run(app, requests)
+        if baseline is None:
+            baseline = per_request
+        print(f"{name:<30} {per_request:8.2f} us/request  ({per_request - baseline:+.2f} us)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""Generate a synthetic dog-assets tree for benchmarks.
+
+Usage: python -m benchmarks.generate_assets --scale small --output .bench-assets/small
+"""
+import argparse
+import os
+import random
+import shutil
+import struct
+import time
+import zlib
+from pathlib import Path
+from typing import Dict, Tuple
+
+SCALES: Dict[str, Tuple[int, int]] = {
+    "tiny": (10, 1_000),
+    "small": (100, 10_000),
+    "medium": (500, 100_000),
+    "large": (2_000, 1_000_000),
+}
+
+JPEG_IMAGE = bytes.fromhex(
+    "ffd8ffe000104a46494600010100000100010000ffdb004300080606070605080707070909080a0c140d0c0b0b0c1912"
+    "130f141d1a1f1e1d1a1c1c20242e2720222c231c1c2837292c30313434341f27393d38323c2e333432ffc0000b080001"
+    "000101011100ffc4001f0000010501010101010100000000000000000102030405060708090a0bffc400b51000020103"
+    "03020403050504040000017d01020300041105122131410613516107227114328191a1082342b1c11552d1f024336272"
+    "82090a161718191a25262728292a3435363738393a434445464748494a535455565758595a636465666768696a737475"
+    "767778797a838485868788898a92939495969798999aa2a3a4a5a6a7a8a9aab2b3b4b5b6b7b8b9bac2c3c4c5c6c7c8c9"
+    "cad2d3d4d5d6d7d8d9dae1e2e3e4e5e6e7e8e9eaf1f2f3f4f5f6f7f8f9faffda0008010100003f00fbd3ffd9"
+)
+
+def png_image(width: int = 1, height: int = 1) -> bytes:
+    def chunk(kind: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    pixels = zlib.compress(b"".join(b"\x00" + b"\x80\x80\x80" * width for _ in range(height)))
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", pixels) + chunk(b"IEND", b"")
+
+def generate(output: Path, breeds: int, images: int, subbreed_ratio: float, seed: int, hardlink: bool) -> int:
+    rng = random.Random(seed)
+    output.mkdir(parents=True, exist_ok=True)
+    templates = {".jpg": JPEG_IMAGE, ".png": png_image()}
+    template_paths = {}
+    if hardlink:
+        for suffix, data in templates.items():
+            template_paths[suffix] = output.parent / f".template{suffix}"
+            template_paths[suffix].write_bytes(data)
+
+    directories = []
+    for b in range(breeds):
+        breed_dir = output / f"breed{b:04d}"
+        breed_dir.mkdir(exist_ok=True)
+        directories.append(breed_dir)
+        if rng.random() < subbreed_ratio:
+            for s in range(rng.randint(2, 4)):
+                sub_dir = breed_dir / f"sub{s}"
+                sub_dir.mkdir(exist_ok=True)
+                directories.append(sub_dir)
+                if rng.random() < 0.1:
+                    nested = sub_dir / "puppies"
+                    nested.mkdir(exist_ok=True)
+                    directories.append(nested)
+
+    weights = [rng.paretovariate(1.5) for _ in directories]
+    for i in range(images):
+        directory = rng.choices(directories, weights)[0]
+        suffix = ".png" if i % 10 == 0 else ".jpg"
+        path = directory / f"img{i:07d}{suffix}"
+        if hardlink:
+            try:
+                os.link(template_paths[suffix], path)
+                continue
+            except OSError:
+                pass
+        path.write_bytes(templates[suffix])
+    return len(directories)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small")
+    parser.add_argument("--breeds", type=int, help="Override the number of breeds for the scale")
+    parser.add_argument("--images", type=int, help="Override the number of images for the scale")
+    parser.add_argument("--subbreed-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--hardlink", action="store_true", help="Hardlink images to one template file")
+    parser.add_argument("--force", action="store_true", help="Remove an existing tree first")
+    parser.add_argument("--output", type=Path, required=True)
+    args = parser.parse_args()
+
+    breeds, images = SCALES[args.scale]
+    breeds = args.breeds or breeds
+    images = args.images or images
+    if args.output.exists():
+        if not args.force:
+            print(f"{args.output} already exists, use --force to regenerate")
+            return
+        shutil.rmtree(args.output)
+
+    started = time.perf_counter()
+    directories = generate(args.output, breeds, images, args.subbreed_ratio, args.seed, args.hardlink)
+    elapsed = time.perf_counter() - started
+    print(f"Generated {images} images in {directories} directories under {args.output} in {elapsed:.1f}s")
+
+if __name__ == "__main__":
+    main()
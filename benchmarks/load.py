@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""In-process ASGI load driver for every API route.
+
+Usage: python -m benchmarks.load --assets .bench-assets/small --output bench_output.json
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+import httpx
+from fastapi.routing import APIRoute
+import config
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+def route_targets(app, catalog) -> Dict[str, str]:
+    breed = next((name for name, subs in catalog.breeds.items() if subs), None)
+    breed = breed or next(iter(catalog.breeds), "missing")
+    subbreed = (catalog.breeds.get(breed) or ["missing"])[0]
+    image = catalog.images[0] if len(catalog) else "missing.jpg"
+    values = {"breed": breed, "subbreed": subbreed, "n": "20", "file_path": image}
+    queries = {"/breeds/search": f"q={breed[:4]}"}
+
+    targets = {}
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or "GET" not in route.methods:
+            continue
+        path = route.path_format.format(**{name: values.get(name, "x") for name in route.param_convertors})
+        if route.path in queries:
+            path = f"{path}?{queries[route.path]}"
+        targets[f"GET {route.path}"] = path
+    return targets
+
+async def drive(client: httpx.AsyncClient, path: str, requests: int, concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for _ in pending:
+            started = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "rps": requests / elapsed,
+        "errors": errors,
+    }
+
+async def measure_allocations(client: httpx.AsyncClient, path: str, requests: int) -> Dict[str, float]:
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        for _ in range(requests):
+            await client.get(path)
+        after = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, "filename") if stat.size_diff > 0)
+    return {"alloc_kib_per_request": allocated / requests / 1024, "peak_kib": peak / 1024}
+
+def best_of(rounds: List[Dict[str, float]]) -> Dict[str, float]:
+    best = {metric: min(stats[metric] for stats in rounds) for metric in rounds[0]}
+    best["rps"] = max(stats["rps"] for stats in rounds)
+    best["errors"] = max(stats["errors"] for stats in rounds)
+    return best
+
+async def run(assets: Path, requests: int, concurrency: int, rounds: int, alloc_requests: int) -> Dict:
+    config.ASSETS_DIR = assets
+    config.CATALOG_SNAPSHOT = ""
+    from app.main import app
+    from app.services.breed_service import load_catalog
+
+    started = time.perf_counter()
+    catalog = load_catalog()
+    catalog_seconds = time.perf_counter() - started
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, path in route_targets(app, catalog).items():
+            await drive(client, path, min(requests, 50), concurrency)
+            rounds_stats = [await drive(client, path, requests, concurrency) for _ in range(rounds)]
+            stats = best_of(rounds_stats)
+            stats.update(await measure_allocations(client, path, alloc_requests))
+            results[name] = stats
+            print(
+                f"{name:<50} p50 {stats['p50_ms']:7.2f}ms  p95 {stats['p95_ms']:7.2f}ms  "
+                f"p99 {stats['p99_ms']:7.2f}ms  {stats['rps']:8.0f} req/s  "
+                f"{stats['alloc_kib_per_request']:8.1f} KiB/req  errors {stats['errors']}"
+            )
+
+    return {
+        "meta": {
+            "scale": assets.name,
+            "breeds": len(catalog.breeds),
+            "images": len(catalog),
+            "catalog_build_s": catalog_seconds,
+            "requests": requests,
+            "concurrency": concurrency,
+            "rounds": rounds,
+            "python": platform.python_version(),
+        },
+        "routes": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=Path, required=True)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--rounds", type=int, default=3, help="Report the best of this many rounds per route")
+    parser.add_argument("--alloc-requests", type=int, default=20)
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.assets.resolve(), args.requests, args.concurrency, args.rounds, args.alloc_requests))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, sort_keys=True) + "\n")
+
+if __name__ == "__main__":
+    main()
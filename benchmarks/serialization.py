@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""Compare the pydantic response path with the fast envelope encoder by payload size.
+
+Usage: python -m benchmarks.serialization --sizes 10,1000,20000
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Callable, Dict, List
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from app import serialization
+from app.models import APIResponse, success_response
+
+RESPONSE_FIELD = create_response_field(name="response", type_=APIResponse)
+LOOP = asyncio.new_event_loop()
+
+def pydantic_path(urls: List[str]) -> bytes:
+    serialized = serialize_response(field=RESPONSE_FIELD, response_content=success_response(urls))
+    content = LOOP.run_until_complete(serialized)
+    return JSONResponse(content).body
+
+def envelope_stdlib(urls: List[str]) -> bytes:
+    orjson = serialization.orjson
+    serialization.orjson = None
+    try:
+        return serialization.render_envelope(urls)
+    finally:
+        serialization.orjson = orjson
+
+def envelope_fast(urls: List[str]) -> bytes:
+    return serialization.render_envelope(urls)
+
+def measure(func: Callable[[List[str]], bytes], urls: List[str], budget: float) -> float:
+    func(urls)
+    runs = 0
+    started = time.perf_counter()
+    while True:
+        func(urls)
+        runs += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= budget and runs >= 3:
+            return elapsed / runs
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="10,100,1000,20000,100000")
+    parser.add_argument("--budget", type=float, default=0.5, help="Seconds spent per path and size")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    paths: Dict[str, Callable[[List[str]], bytes]] = {"pydantic": pydantic_path, "envelope-json": envelope_stdlib}
+    if serialization.orjson is not None:
+        paths["envelope-orjson"] = envelope_fast
+
+    results = {}
+    print(f"{'urls':>8}  " + "  ".join(f"{name:>16}" for name in paths) + "   speedup")
+    for size in (int(value) for value in args.sizes.split(",")):
+        urls = [f"https://images.example/breed{i % 500:04d}/img{i:07d}.jpg" for i in range(size)]
+        assert len({func(urls) for func in paths.values()}) == 1
+        timings = {name: measure(func, urls, args.budget) for name, func in paths.items()}
+        results[size] = {name: seconds * 1000 for name, seconds in timings.items()}
+        speedup = timings["pydantic"] / min(timings.values())
+        print(f"{size:>8}  " + "  ".join(f"{seconds * 1000:14.3f}ms" for seconds in timings.values()) + f"   {speedup:6.1f}x")
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -17,11 +17,97 @@ ROOT_PATH = os.getenv("ROOT_PATH", "")
 BASE_URL_API = os.getenv("BASE_URL_API", "http://localhost:8000")
 BASE_URL_IMG = os.getenv("BASE_URL_IMG", "https://mgrzmil.dev")
 PORT = int(os.getenv("PORT", 8000))
+HOST = os.getenv("HOST", "localhost")
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "http://localhost:5173,http://localhost:3000,http://localhost:5174,https://mgrzmil.dev,https://woof-app-ff670*.web.app")
+CORS_CACHE_SIZE = int(os.getenv("CORS_CACHE_SIZE", 1024))
+
+WORKERS = int(os.getenv("WORKERS", 0))
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+BACKLOG = int(os.getenv("BACKLOG", 2048))
+KEEPALIVE_TIMEOUT = int(os.getenv("KEEPALIVE_TIMEOUT", 5))
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+MAX_REQUESTS = int(os.getenv("MAX_REQUESTS", 0))
+MAX_REQUESTS_JITTER = int(os.getenv("MAX_REQUESTS_JITTER", 0))
+SOCKET_REUSE_PORT = os.getenv("SOCKET_REUSE_PORT", "false").lower() in ("1", "true", "yes")
+WORKER_STARTUP_TIMEOUT = float(os.getenv("WORKER_STARTUP_TIMEOUT", 60.0))
+PRIMARY_WORKER = os.getenv("PRIMARY_WORKER", "true").lower() in ("1", "true", "yes")
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_RATE = float(os.getenv("ADMISSION_RATE", 0))
+ADMISSION_BURST = float(os.getenv("ADMISSION_BURST", 20))
+ADMISSION_MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", 10000))
+ADMISSION_IMAGE_CONCURRENCY = int(os.getenv("ADMISSION_IMAGE_CONCURRENCY", 256))
+ADMISSION_CHEAP_CONCURRENCY = int(os.getenv("ADMISSION_CHEAP_CONCURRENCY", 128))
+ADMISSION_LISTING_CONCURRENCY = int(os.getenv("ADMISSION_LISTING_CONCURRENCY", 16))
+ADMISSION_ARCHIVE_CONCURRENCY = int(os.getenv("ADMISSION_ARCHIVE_CONCURRENCY", 8))
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 0.5))
+ADMISSION_MAX_LAG = float(os.getenv("ADMISSION_MAX_LAG", 0.25))
+ADMISSION_RETRY_AFTER = float(os.getenv("ADMISSION_RETRY_AFTER", 1))
+
+METRICS_DIR = os.getenv("METRICS_DIR", "")
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5.0))
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", 0.0))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", 0.001))
+PROFILE_SIGNAL_REQUESTS = int(os.getenv("PROFILE_SIGNAL_REQUESTS", 10))
+
+TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", 0.0))
+TRACE_SLOW_MS = float(os.getenv("TRACE_SLOW_MS", 0.0))
+TRACE_FILE = os.getenv("TRACE_FILE", "traces.jsonl")
+TRACE_OTLP_ENDPOINT = os.getenv("TRACE_OTLP_ENDPOINT", "")
+TRACE_SERVICE_NAME = os.getenv("TRACE_SERVICE_NAME", "dog-api")
+TRACE_BATCH_SIZE = int(os.getenv("TRACE_BATCH_SIZE", 256))
+TRACE_MAX_QUEUE = int(os.getenv("TRACE_MAX_QUEUE", 10000))
+TRACE_FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", 1.0))
 
 if ROOT_PATH:
     BASE_URL_API = BASE_URL_API.rstrip("/") + ROOT_PATH
     BASE_URL_IMG = BASE_URL_IMG.rstrip("/") + ROOT_PATH
 
 ASSETS_DIR = Path(__file__).parent.parent / "dog-assets"
+ASSETS_DIRS = [Path(path) for path in os.getenv("ASSETS_DIRS", "").split(os.pathsep) if path]
+PROMOTE_ENABLED = os.getenv("PROMOTE_ENABLED", "false").lower() in ("1", "true", "yes")
+PROMOTE_MAX_BYTES = int(os.getenv("PROMOTE_MAX_BYTES", 1024 * 1024 * 1024))
+PROMOTE_MIN_HITS = int(os.getenv("PROMOTE_MIN_HITS", 10))
+PROMOTE_INTERVAL = float(os.getenv("PROMOTE_INTERVAL", 60.0))
+
+CATALOG_SNAPSHOT = os.getenv("CATALOG_SNAPSHOT", "")
+OPENAPI_PATH = os.getenv("OPENAPI_PATH", "")
+CATALOG_WATCH = os.getenv("CATALOG_WATCH", "auto")
+CATALOG_POLL_INTERVAL = float(os.getenv("CATALOG_POLL_INTERVAL", 2.0))
+CATALOG_DEBOUNCE = float(os.getenv("CATALOG_DEBOUNCE", 1.0))
+
+
+FAST_RESPONSES = os.getenv("FAST_RESPONSES", "false").lower() in ("1", "true", "yes")
+RESPONSE_CACHE_BYTES = int(os.getenv("RESPONSE_CACHE_BYTES", 64 * 1024 * 1024))
+
+IMAGE_STAT_CACHE_SIZE = int(os.getenv("IMAGE_STAT_CACHE_SIZE", 100000))
+IMAGE_STAT_TTL = float(os.getenv("IMAGE_STAT_TTL", 60.0))
+IMAGE_NEGATIVE_CACHE_SIZE = int(os.getenv("IMAGE_NEGATIVE_CACHE_SIZE", 10000))
+IMAGE_NEGATIVE_TTL = float(os.getenv("IMAGE_NEGATIVE_TTL", 60.0))
+IMAGE_PATH_MAX_LENGTH = int(os.getenv("IMAGE_PATH_MAX_LENGTH", 512))
+IMAGE_CACHE_CONTROL = os.getenv("IMAGE_CACHE_CONTROL", "public, max-age=86400")
+IMAGE_CACHE_BYTES = int(os.getenv("IMAGE_CACHE_BYTES", 0))
+IMAGE_CACHE_MAX_ITEM_BYTES = int(os.getenv("IMAGE_CACHE_MAX_ITEM_BYTES", 2 * 1024 * 1024))
+
+IO_WORKERS = int(os.getenv("IO_WORKERS", 16))
+IO_MAX_QUEUE = int(os.getenv("IO_MAX_QUEUE", 256))
+IO_TIMEOUT = float(os.getenv("IO_TIMEOUT", 10.0))
+LOOP_LAG_INTERVAL = float(os.getenv("LOOP_LAG_INTERVAL", 0.5))
+
+IMAGE_METADATA = os.getenv("IMAGE_METADATA", "false").lower() in ("1", "true", "yes")
+IMAGE_METADATA_PATH = os.getenv("IMAGE_METADATA_PATH", "image_metadata.idx")
+IMAGE_METADATA_WORKERS = int(os.getenv("IMAGE_METADATA_WORKERS", 0))
+
+BREED_SEARCH_MAX_LIMIT = int(os.getenv("BREED_SEARCH_MAX_LIMIT", 50))
 
+IMAGE_PAGE_MAX_LIMIT = int(os.getenv("IMAGE_PAGE_MAX_LIMIT", 1000))
+RANDOM_BATCH_MAX = int(os.getenv("RANDOM_BATCH_MAX", 50))
+BREED_WEIGHTS = {
+    name.strip(): float(weight)
+    for name, _, weight in (item.partition(":") for item in os.getenv("BREED_WEIGHTS", "").split(","))
+    if name.strip() and weight.strip()
+}
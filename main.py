@@ -1,8 +1,10 @@
 import uvicorn
 from config import PORT, ROOT_PATH
-from app.main import app
+from app.launcher import serve
 
 def main():
+    from app.main import app
+
     uvicorn.run(app, host="localhost", port=PORT, root_path=ROOT_PATH if ROOT_PATH else None)
 
 if __name__ == "__main__":
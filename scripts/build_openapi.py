@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from app.main import app
+from app.openapi import build_openapi, encode_openapi
+
+def main():
+    parser = argparse.ArgumentParser(description="Write the final OpenAPI document (with ROOT_PATH applied) for serving as static bytes")
+    parser.add_argument("--output", type=Path, default=Path(config.OPENAPI_PATH or "openapi.json"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    body = encode_openapi(build_openapi(app))
+    tmp = args.output.with_name(args.output.name + ".tmp")
+    tmp.write_bytes(body)
+    tmp.replace(args.output)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.output}: {len(body)} bytes for ROOT_PATH={config.ROOT_PATH!r} in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from app.services.breed_service import asset_roots
+from app.services.catalog import Catalog
+from app.services.catalog_snapshot import write_snapshot
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a memory-mappable catalog snapshot of the asset roots")
+    parser.add_argument("--assets", type=Path, nargs="+", default=asset_roots())
+    parser.add_argument("--output", type=Path, default=Path(config.CATALOG_SNAPSHOT or "catalog.snapshot"))
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = Catalog.build_tiered(args.assets)
+    write_snapshot(catalog, args.output)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {args.output}: {len(catalog.breeds)} breeds, {len(catalog)} images in {elapsed:.2f}s")
+
+if __name__ == "__main__":
+    main()
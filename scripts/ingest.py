@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config
+from app.services.breed_service import asset_roots
+from app.services.catalog import Catalog
+from app.services.catalog_snapshot import load_snapshot, write_snapshot
+from app.services.ingest import FAILED, HashIndex, ingest, updated_catalog
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Validate a photo drop and move accepted images into the breed tree")
+    parser.add_argument("drop", type=Path, help="directory laid out as <breed>[/<sub-breed>]/<image>")
+    parser.add_argument("--assets", type=Path, default=asset_roots()[0])
+    parser.add_argument("--index", type=Path, help="content hash index (default: <assets>/.ingest.sqlite)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--log", type=Path, help="write one JSON line per file to this path")
+    parser.add_argument("--snapshot", type=Path, default=Path(config.CATALOG_SNAPSHOT) if config.CATALOG_SNAPSHOT else None)
+    parser.add_argument("--rehash", action="store_true", help="rebuild the content hash index from scratch")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    catalog = load_snapshot(args.snapshot, [args.assets]) if args.snapshot else None
+    if catalog is None:
+        catalog = Catalog.build(args.assets)
+    index = HashIndex(args.index or args.assets / ".ingest.sqlite")
+    if args.rehash:
+        index.clear()
+
+    log = open(args.log, "w", encoding="utf-8") if args.log else None
+    try:
+        report = ingest(args.drop, args.assets, index, catalog, args.workers, log)
+    finally:
+        index.close()
+        if log is not None:
+            log.close()
+    print(f"Ingested {args.drop}: {report.summary()} ({report.indexed} existing images hashed)")
+
+    if args.snapshot and report.changed_dirs:
+        updated = updated_catalog(args.assets, catalog, report, asset_roots())
+        write_snapshot(updated, args.snapshot)
+        print(f"Wrote {args.snapshot}: {len(updated.breeds)} breeds, {len(updated)} images")
+    print(f"Finished in {time.perf_counter() - started:.2f}s")
+    return 1 if report.counts[FAILED] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,27 @@
+import pytest
+import config
+from app.services import breed_service
+
+IMAGES = [
+    "akita/akita1.jpg",
+    "akita/akita2.png",
+    "hound/hound1.jpg",
+    "hound/afghan/afghan1.jpg",
+    "hound/afghan/afghan2.JPEG",
+    "hound/basset/basset1.jpg",
+    "hound/basset/puppies/puppy1.jpg",
+]
+
+@pytest.fixture
+def assets(tmp_path, monkeypatch):
+    for rel in IMAGES:
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"\xff\xd8\xff\xd9")
+    (tmp_path / "akita" / "notes.txt").write_text("not an image")
+    (tmp_path / "pug").mkdir()
+    monkeypatch.setattr(config, "ASSETS_DIR", tmp_path)
+    monkeypatch.setattr(config, "BASE_URL_IMG", "http://img")
+    breed_service.load_catalog()
+    yield tmp_path
+    breed_service.set_catalog(None)
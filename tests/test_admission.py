@@ -0,0 +1,93 @@
+import asyncio
+import httpx
+import config
+from fastapi import FastAPI
+from app.middleware import admission
+from app.middleware.admission import AdmissionMiddleware, TokenBuckets, classify
+from app.services.io_executor import loop_monitor
+
+def make_app(monkeypatch, **settings) -> FastAPI:
+    defaults = {
+        "ADMISSION_RATE": 0,
+        "ADMISSION_LISTING_CONCURRENCY": 0,
+        "ADMISSION_CHEAP_CONCURRENCY": 0,
+        "ADMISSION_IMAGE_CONCURRENCY": 0,
+        "ADMISSION_QUEUE_TIMEOUT": 0.05,
+        "ADMISSION_MAX_LAG": 0.25,
+    }
+    for name, value in {**defaults, **settings}.items():
+        monkeypatch.setattr(config, name, value)
+    app = FastAPI()
+
+    @app.get("/breed/{breed}/images")
+    async def listing(breed: str):
+        await asyncio.sleep(0.1)
+        return {"breed": breed}
+
+    @app.get("/breeds/list/all")
+    async def cheap():
+        return {}
+
+    @app.get("/images/{path:path}")
+    async def image(path: str):
+        return {}
+
+    app.add_middleware(AdmissionMiddleware)
+    return app
+
+async def fetch_all(app: FastAPI, paths, headers=None, address="10.0.0.1"):
+    transport = httpx.ASGITransport(app=app, client=(address, 1234))
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.get(path, headers=headers) for path in paths))
+
+def test_classify():
+    assert classify("/images/akita/a.jpg") == "image"
+    assert classify("/breed/hound/images") == "listing"
+    assert classify("/breed/hound/afghan/images") == "listing"
+    assert classify("/breed/hound/afghan/archive") == "archive"
+    assert classify("/breed/hound/images/random/3") == "cheap"
+    assert classify("/breeds/list/all") == "cheap"
+
+def test_token_bucket_refills():
+    buckets = TokenBuckets(rate=10, burst=2, max_clients=2)
+    assert buckets.take(b"a") == 0
+    assert buckets.take(b"a") == 0
+    assert 0 < buckets.take(b"a") <= 0.1
+    assert buckets.take(b"b") == 0
+    buckets.take(b"c")
+    assert len(buckets._buckets) == 2
+
+def test_rate_limit_per_client(monkeypatch):
+    app = make_app(monkeypatch, ADMISSION_RATE=1, ADMISSION_BURST=2)
+    responses = asyncio.run(fetch_all(app, ["/breeds/list/all"] * 3))
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[2].headers["retry-after"] == "1"
+
+    spoofed = asyncio.run(fetch_all(app, ["/breeds/list/all"], headers={"Origin": "https://other.example"}))
+    assert spoofed[0].status_code == 429
+    other = asyncio.run(fetch_all(app, ["/breeds/list/all"], address="10.0.0.2"))
+    assert other[0].status_code == 200
+
+def test_listing_concurrency_cap_keeps_cheap_routes_fast(monkeypatch):
+    app = make_app(monkeypatch, ADMISSION_LISTING_CONCURRENCY=2)
+    paths = ["/breed/hound/images"] * 4 + ["/breeds/list/all", "/images/a.jpg"]
+    statuses = [r.status_code for r in asyncio.run(fetch_all(app, paths))]
+    assert sorted(statuses[:4]) == [200, 200, 503, 503]
+    assert statuses[4:] == [200, 200]
+    assert admission.admission_stats.queue_timeouts >= 2
+
+def test_queued_requests_admitted_within_timeout(monkeypatch):
+    app = make_app(monkeypatch, ADMISSION_LISTING_CONCURRENCY=1, ADMISSION_QUEUE_TIMEOUT=1.0)
+    statuses = [r.status_code for r in asyncio.run(fetch_all(app, ["/breed/hound/images"] * 3))]
+    assert statuses == [200, 200, 200]
+
+def test_lag_sheds_listings_before_images(monkeypatch):
+    app = make_app(monkeypatch)
+    monkeypatch.setattr(loop_monitor, "lag", 0.3)
+    responses = asyncio.run(fetch_all(app, ["/breed/hound/images", "/breeds/list/all", "/images/a.jpg"]))
+    assert [r.status_code for r in responses] == [503, 200, 200]
+    assert responses[0].headers["retry-after"]
+
+    monkeypatch.setattr(loop_monitor, "lag", 0.6)
+    responses = asyncio.run(fetch_all(app, ["/breeds/list/all", "/images/a.jpg"]))
+    assert [r.status_code for r in responses] == [503, 200]
@@ -0,0 +1,95 @@
+import io
+import tarfile
+import pytest
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import archive
+from app.services.archive import ArchiveSourceChanged, build_manifest, iter_segments, read_slice, FileSlice
+
+client = TestClient(app)
+
+def write_images(assets):
+    contents = {}
+    for size, rel in enumerate(["hound/afghan/afghan1.jpg", "hound/afghan/afghan2.JPEG"], 1):
+        data = bytes(i % 251 for i in range(size * 700))
+        (assets / rel).write_bytes(data)
+        contents[rel] = data
+    return contents
+
+def render(manifest, start, end):
+    chunks = []
+    for segment in iter_segments(manifest, start, end):
+        if isinstance(segment, FileSlice):
+            segment = read_slice(segment.path, segment.start, segment.end - segment.start)
+        chunks.append(segment)
+    return b"".join(chunks)
+
+def test_sub_breed_archive(assets):
+    contents = write_images(assets)
+    response = client.get("/breed/hound/afghan/archive")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-tar"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert 'filename="hound-afghan.tar"' in response.headers["content-disposition"]
+    assert int(response.headers["content-length"]) == len(response.content)
+
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        assert archive.getnames() == list(contents)
+        for rel, data in contents.items():
+            assert archive.extractfile(rel).read() == data
+
+def test_breed_archive_includes_sub_breeds(assets):
+    response = client.get("/breed/hound/archive")
+    with tarfile.open(fileobj=io.BytesIO(response.content)) as archive:
+        assert archive.getnames() == [
+            "hound/hound1.jpg",
+            "hound/afghan/afghan1.jpg",
+            "hound/afghan/afghan2.JPEG",
+            "hound/basset/basset1.jpg",
+            "hound/basset/puppies/puppy1.jpg",
+        ]
+
+def test_unknown_or_empty_breed_is_404(assets):
+    assert client.get("/breed/wolf/archive").status_code == 404
+    assert client.get("/breed/pug/archive").status_code == 404
+    assert client.get("/breed/hound/wolf/archive").status_code == 404
+
+def test_resume_with_range(assets):
+    write_images(assets)
+    full = client.get("/breed/hound/afghan/archive")
+    etag = full.headers["etag"]
+    response = client.get("/breed/hound/afghan/archive", headers={"Range": "bytes=700-", "If-Range": etag})
+    assert response.status_code == 206
+    assert response.content == full.content[700:]
+    assert response.headers["content-range"] == f"bytes 700-{len(full.content) - 1}/{len(full.content)}"
+
+    assert client.get("/breed/hound/afghan/archive", headers={"If-None-Match": etag}).status_code == 304
+    stale = client.get("/breed/hound/afghan/archive", headers={"Range": "bytes=700-", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert client.get("/breed/hound/afghan/archive", headers={"Range": "bytes=999999-"}).status_code == 416
+
+def test_etag_tracks_file_changes(assets):
+    first = client.get("/breed/akita/archive").headers["etag"]
+    assert client.get("/breed/akita/archive").headers["etag"] == first
+    (assets / "akita/akita1.jpg").write_bytes(b"\xff\xd8" * 100)
+    assert client.get("/breed/akita/archive").headers["etag"] != first
+
+def test_segments_cover_every_range(assets):
+    write_images(assets)
+    rels = ["hound/afghan/afghan1.jpg", "hound/afghan/afghan2.JPEG"]
+    manifest = build_manifest([(rel, str(assets / rel)) for rel in rels])
+    full = render(manifest, 0, manifest.size)
+    assert len(full) == manifest.size
+    for start, end in [(0, 1), (500, 520), (511, 1300), (1200, manifest.size), (manifest.size - 10, manifest.size)]:
+        assert render(manifest, start, end) == full[start:end]
+
+def test_truncated_file_aborts_the_transfer(assets, monkeypatch):
+    manifest = build_manifest([("akita/akita1.jpg", str(assets / "akita/akita1.jpg"))])
+    (assets / "akita/akita1.jpg").write_bytes(b"\xff")
+    with pytest.raises(ArchiveSourceChanged):
+        render(manifest, 0, manifest.size)
+
+    monkeypatch.setattr(archive, "build_manifest", lambda entries: manifest)
+    response = client.get("/breed/akita/archive")
+    assert int(response.headers["content-length"]) == manifest.size
+    assert len(response.content) < manifest.size
@@ -0,0 +1,152 @@
+import pytest
+from fastapi.testclient import TestClient
+import config
+from app.main import app
+from app.services import breed_service, promoter
+from app.services.catalog_snapshot import load_snapshot, write_snapshot
+from app.services.catalog_watcher import CatalogWatcher
+from app.services.promoter import Promoter, start_promoter, stop_promoter
+
+client = TestClient(app)
+
+FAST = {"akita/akita1.jpg": b"fast akita"}
+SLOW = {
+    "akita/akita1.jpg": b"slow akita",
+    "akita/akita2.jpg": b"slow akita two",
+    "hound/afghan/afghan1.jpg": b"slow afghan",
+}
+
+@pytest.fixture
+def tiers(tmp_path, monkeypatch):
+    roots = [tmp_path / "fast", tmp_path / "slow"]
+    for root, files in zip(roots, (FAST, SLOW)):
+        for rel, data in files.items():
+            path = root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+    monkeypatch.setattr(config, "ASSETS_DIRS", roots)
+    monkeypatch.setattr(config, "BASE_URL_IMG", "http://img")
+    breed_service.load_catalog()
+    yield roots
+    breed_service.set_catalog(None)
+
+def test_first_root_wins(tiers):
+    fast, slow = tiers
+    catalog = breed_service.get_catalog()
+    assert list(catalog.images) == ["akita/akita1.jpg", "akita/akita2.jpg", "hound/afghan/afghan1.jpg"]
+    assert [catalog.path(i) for i in range(len(catalog))] == [
+        str(fast / "akita/akita1.jpg"), str(slow / "akita/akita2.jpg"), str(slow / "hound/afghan/afghan1.jpg")
+    ]
+    assert client.get("/images/akita/akita1.jpg").content == b"fast akita"
+    assert client.get("/images/hound/afghan/afghan1.jpg").content == b"slow afghan"
+    assert client.get("/breed/hound/afghan/images").json()["message"] == ["http://img/images/hound/afghan/afghan1.jpg"]
+
+def test_tiered_snapshot_roundtrip(tiers, tmp_path_factory):
+    catalog = breed_service.get_catalog()
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    write_snapshot(catalog, path)
+
+    loaded = load_snapshot(path, tiers)
+    assert loaded.roots == catalog.roots
+    assert list(loaded.images) == list(catalog.images)
+    assert [loaded.path(i) for i in range(len(loaded))] == [catalog.path(i) for i in range(len(catalog))]
+    assert load_snapshot(path, tiers[::-1]) is None
+
+    (tiers[0] / "hound").mkdir()
+    assert load_snapshot(path, tiers) is None
+
+def test_promoter_copies_hot_images_within_budget(tiers):
+    fast, slow = tiers
+    promoter = Promoter(tiers, max_bytes=len(SLOW["hound/afghan/afghan1.jpg"]), min_hits=2, interval=60)
+    promoter.hits.update({"hound/afghan/afghan1.jpg": 3, "akita/akita2.jpg": 2})
+
+    changes = promoter.cycle()
+    catalog = breed_service.get_catalog()
+    index = catalog.find_image("hound/afghan/afghan1.jpg")
+    assert changes == {index: 0}
+    assert catalog.path(index) == str(fast / "hound/afghan/afghan1.jpg")
+    assert (fast / "hound/afghan/afghan1.jpg").read_bytes() == b"slow afghan"
+    assert not (fast / "akita/akita2.jpg").exists()
+    assert Promoter(tiers, 1024, 2, 60).promoted == {"hound/afghan/afghan1.jpg": 11}
+
+    promoter.max_bytes = len(SLOW["akita/akita2.jpg"])
+    promoter.hits.update({"akita/akita2.jpg": 10})
+    promoter.cycle()
+    catalog = breed_service.get_catalog()
+    assert not (fast / "hound/afghan/afghan1.jpg").exists()
+    assert catalog.path(catalog.find_image("hound/afghan/afghan1.jpg")) == str(slow / "hound/afghan/afghan1.jpg")
+    assert catalog.path(catalog.find_image("akita/akita2.jpg")) == str(fast / "akita/akita2.jpg")
+    assert promoter.promotions == 2 and promoter.evictions == 1
+
+def test_promotion_keeps_catalog_version(tiers):
+    before = breed_service.get_catalog()
+    sampler = breed_service.get_sampler()
+    promoter = Promoter(tiers, max_bytes=1024, min_hits=1, interval=60)
+    promoter.hits.update({"akita/akita2.jpg": 2})
+    assert promoter.cycle()
+
+    after = breed_service.get_catalog()
+    assert after is not before and after.version == before.version
+    assert breed_service.get_sampler() is sampler
+    breed_service.load_catalog()
+    assert not breed_service.replace_catalog(after, after.with_image_roots({}))
+
+def test_workers_share_hits_and_follow_promotions(tiers, tmp_path, monkeypatch):
+    fast, slow = tiers
+    hits_dir = tmp_path / "metrics"
+    hits_dir.mkdir()
+    before = breed_service.get_catalog()
+    follower = Promoter(tiers, 1024, 2, 60, primary=False, hits_dir=hits_dir)
+    follower.record("akita/akita2.jpg")
+    follower.record("akita/akita2.jpg")
+    follower.publish_hits()
+    primary = Promoter(tiers, 1024, 2, 60, hits_dir=hits_dir)
+    assert primary.cycle()
+    assert list(hits_dir.iterdir()) == []
+
+    breed_service.set_catalog(before)
+    monkeypatch.setattr(promoter, "_promoter", follower)
+    index = before.find_image("akita/akita2.jpg")
+    assert follower.follow() == {index: 0}
+    (fast / "akita" / "akita2.jpg").write_bytes(b"promoted akita two")
+    assert client.get("/images/akita/akita2.jpg").content == b"promoted akita two"
+
+    (fast / "akita" / "akita2.jpg").unlink()
+    assert client.get("/images/akita/akita2.jpg").content == b"slow akita two"
+
+def test_promoter_follows_in_other_workers(tiers, monkeypatch):
+    monkeypatch.setattr(config, "PROMOTE_ENABLED", True)
+    monkeypatch.setattr(config, "PRIMARY_WORKER", False)
+    try:
+        assert not start_promoter().primary
+    finally:
+        stop_promoter()
+
+def test_watcher_ignores_promoted_copies(tiers):
+    fast, slow = tiers
+    watcher = CatalogWatcher(tiers, mode="poll", debounce=0)
+    hot = Promoter(tiers, max_bytes=len(SLOW["akita/akita2.jpg"]), min_hits=1, interval=60)
+    hot.hits.update({"akita/akita2.jpg": 2})
+    hot.cycle()
+    promoted = breed_service.get_catalog()
+    assert watcher.refresh(watcher.backends[0].check()) is promoted
+
+    hot.hits.update({"hound/afghan/afghan1.jpg": 5})
+    hot.cycle()
+    assert not (fast / "akita" / "akita2.jpg").exists()
+    assert watcher.refresh(watcher.backends[0].check()).version == promoted.version
+
+    (fast / "akita" / "akita3.jpg").write_bytes(b"fast akita three")
+    assert watcher.refresh(watcher.backends[0].check()).version > promoted.version
+
+def test_watcher_refreshes_second_root(tiers):
+    fast, slow = tiers
+    watcher = CatalogWatcher(tiers, mode="poll", debounce=0)
+    (slow / "boxer").mkdir()
+    (slow / "boxer" / "boxer1.jpg").write_bytes(b"slow boxer")
+    changed = watcher.backends[1].check()
+
+    catalog = watcher.refresh(changed, 1)
+    assert breed_service.get_catalog() is catalog
+    assert catalog.path(catalog.find_image("boxer/boxer1.jpg")) == str(slow / "boxer/boxer1.jpg")
+    assert catalog.path(catalog.find_image("akita/akita1.jpg")) == str(fast / "akita/akita1.jpg")
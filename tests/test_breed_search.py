@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.breed_search import BKTree, BreedSearchIndex, edit_distance
+
+client = TestClient(app)
+
+BREEDS = {
+    "hound": ["afghan", "basset", "blood"],
+    "labrador": [],
+    "poodle": ["miniature", "toy"],
+    "terrier": ["border", "bull", "toy"],
+}
+
+def test_edit_distance():
+    assert edit_distance("labrador", "labrador", 2) == 0
+    assert edit_distance("labradr", "labrador", 2) == 1
+    assert edit_distance("labardor", "labrador", 2) == 2
+    assert edit_distance("pug", "labrador", 2) == 3
+
+def test_bk_tree_bounded_search():
+    tree = BKTree(["hound", "pound", "round", "poodle", "labrador"])
+    assert sorted(tree.search("hounds", 1)) == [(1, "hound")]
+    assert sorted(term for _, term in tree.search("bound", 1)) == ["hound", "pound", "round"]
+
+def test_prefix_matches_ranked():
+    index = BreedSearchIndex(BREEDS)
+    assert index.search("hound", 10)[0] == "hound"
+    assert index.search("hou", 3) == ["hound", "hound/blood", "hound/afghan"]
+    assert index.search("toy", 10) == ["poodle/toy", "terrier/toy"]
+    assert index.search("Afghan-Hound", 10) == ["hound/afghan"]
+    assert index.search("bull terrier", 10) == ["terrier/bull"]
+
+def test_typos_fall_back_to_fuzzy():
+    index = BreedSearchIndex(BREEDS)
+    assert index.search("labradro", 5) == ["labrador"]
+    assert index.search("pooddle", 5) == ["poodle"]
+    assert index.search("zzz", 5) == []
+
+def test_search_endpoint(assets):
+    response = client.get("/breeds/search?q=ba")
+    assert response.status_code == 200
+    assert response.json()["message"] == ["hound/basset"]
+    assert client.get("/breeds/search?q=akiat").json()["message"] == ["akita"]
+    assert client.get("/breeds/search?q=h&limit=2").json()["message"] == ["hound", "hound/afghan"]
+
+    etag = response.headers["etag"]
+    assert client.get("/breeds/search?q=BA", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/breeds/search?q=").status_code == 422
+    assert client.get("/breeds/search?q=a&limit=1000").status_code == 422
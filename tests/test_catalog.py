@@ -0,0 +1,89 @@
+import json
+import config
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import breed_service
+from app.services.catalog import Catalog
+
+client = TestClient(app)
+
+def test_catalog_breeds(assets):
+    catalog = breed_service.get_catalog()
+    assert catalog.breeds == {"akita": [], "hound": ["afghan", "basset"], "pug": []}
+    assert len(catalog) == 7
+
+def test_catalog_ranges(assets):
+    catalog = breed_service.get_catalog()
+    assert list(catalog.images_in("akita")) == ["akita/akita1.jpg", "akita/akita2.png"]
+    assert list(catalog.images_in("hound", "basset")) == ["hound/basset/basset1.jpg"]
+    assert len(catalog.images_in("hound")) == 5
+    assert catalog.images_in("pug") == ()
+    assert catalog.image_range("missing") is None
+
+def test_catalog_listings_roundtrip(assets):
+    catalog = breed_service.get_catalog()
+    rebuilt = Catalog.from_listings(assets, catalog.listings())
+    assert rebuilt.images == catalog.images
+    assert rebuilt.breeds == catalog.breeds
+
+def test_breed_images_endpoint(assets):
+    response = client.get("/breed/hound/afghan/images")
+    assert response.status_code == 200
+    assert response.json()["message"] == [
+        "http://img/images/hound/afghan/afghan1.jpg",
+        "http://img/images/hound/afghan/afghan2.JPEG",
+    ]
+    assert client.get("/breed/pug/images").status_code == 404
+
+def test_random_image_endpoint(assets):
+    response = client.get("/breed/akita/images/random")
+    assert response.status_code == 200
+    assert response.json()["message"].startswith("http://img/images/akita/")
+
+def test_paginated_breed_images(assets):
+    first = client.get("/breed/hound/images?limit=2")
+    assert first.status_code == 200
+    assert first.json()["message"] == [
+        "http://img/images/hound/hound1.jpg",
+        "http://img/images/hound/afghan/afghan1.jpg",
+    ]
+    seen = list(first.json()["message"])
+    cursor = first.headers["x-next-cursor"]
+    while cursor:
+        page = client.get(f"/breed/hound/images?limit=2&cursor={cursor}")
+        seen.extend(page.json()["message"])
+        cursor = page.headers.get("x-next-cursor")
+    assert seen == client.get("/breed/hound/images").json()["message"]
+    assert client.get("/breed/hound/images?cursor=bogus").status_code == 400
+
+def test_cursor_survives_deleted_image(assets):
+    expected = client.get("/breed/hound/images").json()["message"]
+    first = client.get("/breed/hound/images?limit=2")
+    cursor = first.headers["x-next-cursor"]
+    (assets / "hound" / "afghan" / "afghan1.jpg").unlink()
+    breed_service.load_catalog()
+
+    page = client.get(f"/breed/hound/images?limit=2&cursor={cursor}")
+    assert page.status_code == 200
+    assert page.json()["message"] == expected[2:4]
+    akita = breed_service.encode_cursor("akita/akita1.jpg")
+    assert client.get(f"/breed/hound/images?cursor={akita}").status_code == 400
+
+def test_streamed_breed_images(assets):
+    expected = client.get("/breed/hound/images").json()
+    ndjson = client.get("/breed/hound/images?stream=ndjson")
+    assert ndjson.headers["content-type"] == "application/x-ndjson"
+    assert [json.loads(line) for line in ndjson.text.splitlines()] == expected["message"]
+    assert client.get("/breed/hound/images?stream=json").json() == expected
+    assert client.get("/breed/hound/afghan/images?stream=json&limit=1").json()["message"] == expected["message"][1:2]
+
+def test_batch_random_images(assets, monkeypatch):
+    response = client.get("/breed/hound/images/random/3")
+    assert response.status_code == 200
+    urls = response.json()["message"]
+    assert len(urls) == 3 and len(set(urls)) == 3
+    assert len(client.get("/breed/hound/afghan/images/random/10").json()["message"]) == 2
+    monkeypatch.setattr(config, "RANDOM_BATCH_MAX", 4)
+    assert len(client.get("/breeds/image/random/50").json()["message"]) == 4
+    assert client.get("/breeds/image/random/0").status_code == 422
+    assert client.get("/breed/pug/images/random/2").status_code == 404
@@ -0,0 +1,43 @@
+import os
+import pytest
+import config
+from app.services import breed_service
+from app.services.catalog_snapshot import SnapshotError, load_snapshot, read_snapshot, write_snapshot
+from app.services.catalog_watcher import start_watcher
+
+def test_snapshot_roundtrip(assets, tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    catalog = breed_service.get_catalog()
+    write_snapshot(catalog, path)
+
+    mapped = read_snapshot(path)
+    assert mapped.breeds == catalog.breeds
+    assert list(mapped.images) == list(catalog.images)
+    assert list(mapped.images_in("hound", "afghan")) == list(catalog.images_in("hound", "afghan"))
+    assert mapped.images[-1] == catalog.images[-1]
+    assert mapped.listings() == catalog.listings()
+    assert load_snapshot(path, [assets]) is not None
+
+def test_stale_snapshot_is_ignored(assets, tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    write_snapshot(breed_service.get_catalog(), path)
+    stat = os.stat(assets / "akita")
+    os.utime(assets / "akita", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    assert load_snapshot(path, [assets]) is None
+
+def test_corrupt_snapshot_is_rejected(assets, tmp_path_factory):
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    write_snapshot(breed_service.get_catalog(), path)
+    data = bytearray(path.read_bytes())
+    data[-1] ^= 0xFF
+    path.write_bytes(bytes(data))
+    with pytest.raises(SnapshotError):
+        read_snapshot(path)
+
+def test_snapshot_catalog_is_not_watched_by_default(assets, tmp_path_factory, monkeypatch):
+    path = tmp_path_factory.mktemp("snapshot") / "catalog.snapshot"
+    write_snapshot(breed_service.get_catalog(), path)
+    monkeypatch.setattr(config, "CATALOG_SNAPSHOT", str(path))
+    monkeypatch.setattr(config, "CATALOG_WATCH", "auto")
+    breed_service.load_catalog()
+    assert start_watcher() is None
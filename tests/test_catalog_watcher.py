@@ -0,0 +1,50 @@
+import shutil
+from app.services import breed_service
+from app.services.catalog_watcher import CatalogWatcher, PollingBackend, apply_changes
+
+def test_apply_changes_relists_only_changed_dirs(assets):
+    listings = breed_service.get_catalog().listings()
+    (assets / "akita" / "akita3.jpg").write_bytes(b"")
+    shutil.rmtree(assets / "hound" / "basset")
+    (assets / "pug" / "black").mkdir()
+    (assets / "pug" / "black" / "pug1.png").write_bytes(b"")
+
+    updated = apply_changes(assets, listings, {"akita", "hound", "pug"})
+
+    assert updated["akita"].files == ("akita1.jpg", "akita2.png", "akita3.jpg")
+    assert "hound/basset" not in updated and "hound/basset/puppies" not in updated
+    assert updated["pug/black"].files == ("pug1.png",)
+    assert updated["hound/afghan"] is listings["hound/afghan"]
+
+def test_polling_refresh_swaps_catalog(assets):
+    watcher = CatalogWatcher([assets], mode="poll", debounce=0)
+    assert isinstance(watcher.backends[0], PollingBackend)
+    before = breed_service.get_catalog()
+
+    (assets / "boxer").mkdir()
+    (assets / "boxer" / "boxer1.jpg").write_bytes(b"")
+    changed = watcher.backends[0].check()
+    assert changed == {""}
+
+    catalog = watcher.refresh(changed)
+    assert breed_service.get_catalog() is catalog
+    assert catalog.version > before.version
+    assert list(catalog.images_in("boxer")) == ["boxer/boxer1.jpg"]
+    assert watcher.refreshes == 1 and watcher.last_refresh_lag is not None
+    assert watcher.backends[0].check() == set()
+
+def test_new_directory_is_relisted_after_it_is_watched(assets):
+    watcher = CatalogWatcher([assets], mode="poll", debounce=0)
+    backend = watcher.backends[0]
+    sync = backend.sync
+
+    def racing_sync(listings):
+        if "boxer" in listings and not (assets / "boxer" / "boxer2.jpg").exists():
+            (assets / "boxer" / "boxer2.jpg").write_bytes(b"")
+        sync(listings)
+
+    backend.sync = racing_sync
+    (assets / "boxer").mkdir()
+    (assets / "boxer" / "boxer1.jpg").write_bytes(b"")
+    catalog = watcher.refresh(backend.check())
+    assert list(catalog.images_in("boxer")) == ["boxer/boxer1.jpg", "boxer/boxer2.jpg"]
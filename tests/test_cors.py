@@ -0,0 +1,37 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.middleware.cors import compile_origins, is_origin_allowed, vary_origin
+
+client = TestClient(app)
+
+def test_compile_origins_merges_patterns():
+    exact, patterns = compile_origins("http://a.test, https://app-*.web.app,/^https://.*\\.example\\.org$/")
+    assert exact == {"http://a.test"}
+    assert len(patterns) == 1
+    assert patterns[0].match("https://app-123.web.app")
+    assert patterns[0].match("https://x.example.org")
+    assert not patterns[0].match("https://app-1.web.app.evil")
+
+def test_wildcard_origin_allowed():
+    assert is_origin_allowed("https://woof-app-ff670abc.web.app")
+    assert not is_origin_allowed("https://evil.test")
+
+def test_preflight():
+    response = client.options("/breeds/list/all", headers={"Origin": "http://localhost:3000"})
+    assert response.status_code == 200
+    assert response.headers["access-control-allow-origin"] == "http://localhost:3000"
+    assert response.headers["access-control-max-age"] == "3600"
+    assert client.options("/breeds/list/all", headers={"Origin": "https://evil.test"}).status_code == 403
+
+def test_simple_request_headers():
+    response = client.get("/breeds/list/all", headers={"Origin": "http://localhost:5173"})
+    assert response.headers["access-control-allow-origin"] == "http://localhost:5173"
+    assert response.headers["access-control-allow-credentials"] == "true"
+    assert response.headers["vary"] == "Origin"
+    response = client.get("/breeds/list/all", headers={"Origin": "https://evil.test"})
+    assert "access-control-allow-origin" not in response.headers
+
+def test_vary_origin_merges_existing_header():
+    assert vary_origin([(b"vary", b"Accept-Encoding")]) == [(b"vary", b"Accept-Encoding, Origin")]
+    assert vary_origin([(b"vary", b"origin")]) == [(b"vary", b"origin")]
+    assert vary_origin([]) == [(b"vary", b"Origin")]
@@ -0,0 +1,36 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services.image_cache import SegmentedLRUCache, image_cache
+
+client = TestClient(app)
+
+def test_hot_entries_survive_scan():
+    cache = SegmentedLRUCache(max_bytes=100, max_item_bytes=50)
+    cache.put("hot", "1", b"x" * 30)
+    assert cache.get("hot", "1") is not None
+    for i in range(20):
+        cache.put(f"crawl{i}", "1", b"y" * 30)
+    assert cache.get("hot", "1") == b"x" * 30
+    assert cache.size <= 100
+    assert cache.evictions > 0
+
+def test_invalidated_on_etag_change():
+    cache = SegmentedLRUCache(max_bytes=100, max_item_bytes=50)
+    cache.put("a", "1", b"old")
+    assert cache.get("a", "2") is None
+    assert cache.invalidations == 1
+    assert len(cache) == 0
+
+def test_oversized_items_not_cached():
+    cache = SegmentedLRUCache(max_bytes=100, max_item_bytes=10)
+    cache.put("big", "1", b"z" * 11)
+    assert len(cache) == 0
+
+def test_serve_image_from_cache(assets, monkeypatch):
+    monkeypatch.setattr(image_cache, "max_bytes", 1024)
+    (assets / "akita" / "akita1.jpg").write_bytes(b"0123456789")
+    assert client.get("/images/akita/akita1.jpg").content == b"0123456789"
+    hits = image_cache.hits
+    response = client.get("/images/akita/akita1.jpg", headers={"Range": "bytes=2-4"})
+    assert response.content == b"234"
+    assert image_cache.hits == hits + 1
@@ -0,0 +1,127 @@
+import os
+import struct
+import zlib
+import pytest
+import config
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import breed_service, image_metadata
+from app.services.image_metadata import ImageFilter, MetadataIndexer, build_index, read_dimensions
+
+client = TestClient(app)
+
+def jpeg(width: int, height: int) -> bytes:
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00\x01\x01\x00\x00\x01\x00\x01\x00\x00"
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x01\x11\x00"
+    return b"\xff\xd8" + app0 + b"\xff\xfe\x00\x04hi" + sof + b"\xff\xda\x00\x08\x01\x01\x00\x00\x3f\x00\xff\xd9"
+
+def png(width: int, height: int) -> bytes:
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    ihdr = struct.pack(">I", 13) + b"IHDR" + header + struct.pack(">I", zlib.crc32(b"IHDR" + header))
+    return b"\x89PNG\r\n\x1a\n" + ihdr
+
+@pytest.fixture
+def indexed(assets, monkeypatch):
+    (assets / "akita" / "akita1.jpg").write_bytes(jpeg(800, 600))
+    (assets / "akita" / "akita2.png").write_bytes(png(300, 400))
+    (assets / "hound" / "hound1.jpg").write_bytes(jpeg(1024, 1024))
+    (assets / "hound" / "afghan" / "afghan1.jpg").write_bytes(jpeg(1200, 800) + b"\x00" * 5000)
+    monkeypatch.setattr(config, "IMAGE_METADATA", True)
+    indexer = MetadataIndexer(None, workers=1)
+    indexer.build(breed_service.get_catalog())
+    monkeypatch.setattr(image_metadata, "_indexer", indexer)
+    return indexer
+
+def test_header_parsing(tmp_path):
+    (tmp_path / "a.jpg").write_bytes(jpeg(640, 480))
+    (tmp_path / "b.png").write_bytes(png(10, 20))
+    (tmp_path / "c.jpg").write_bytes(b"\xff\xd8\xff\xd9")
+    assert read_dimensions(str(tmp_path / "a.jpg")) == (1, 640, 480)
+    assert read_dimensions(str(tmp_path / "b.png")) == (2, 10, 20)
+    assert read_dimensions(str(tmp_path / "c.jpg")) == (0, 0, 0)
+    assert read_dimensions(str(tmp_path / "missing.jpg")) == (0, 0, 0)
+
+def test_incremental_rebuild_and_persistence(indexed, assets, tmp_path, monkeypatch):
+    catalog = breed_service.get_catalog()
+    reads = []
+    original = image_metadata.read_dimensions
+    monkeypatch.setattr(image_metadata, "read_dimensions", lambda path: reads.append(path) or original(path))
+
+    (assets / "akita" / "akita2.png").write_bytes(png(500, 400))
+    rebuilt = build_index(catalog, indexed.index.rows(), workers=1)
+    assert reads == [str(assets / "akita" / "akita2.png")]
+    assert rebuilt.row(catalog.find_image("akita/akita2.png"))[2:] == (2, 500, 400)
+
+    path = tmp_path / "metadata.idx"
+    image_metadata.write_index(rebuilt, path)
+    assert image_metadata.read_index_rows(path, catalog.root) == rebuilt.rows()
+    assert image_metadata.read_index_rows(path, tmp_path / "elsewhere") == {}
+
+def test_matching_columns(indexed):
+    index = indexed.index
+    catalog = index.catalog
+    names = lambda flt: [catalog.images[i] for i in index.matching(0, len(catalog), flt)]
+    assert names(ImageFilter(min_width=1000)) == ["hound/hound1.jpg", "hound/afghan/afghan1.jpg"]
+    assert names(ImageFilter(orientation="portrait")) == ["akita/akita2.png"]
+    assert names(ImageFilter(orientation="square")) == ["hound/hound1.jpg"]
+    assert names(ImageFilter(min_width=700, max_bytes=1000)) == ["akita/akita1.jpg", "hound/hound1.jpg"]
+    assert names(ImageFilter(format="png")) == ["akita/akita2.png"]
+
+def test_filtered_listing_and_pagination(indexed):
+    response = client.get("/breed/hound/images?min_width=1000")
+    assert response.json()["message"] == ["http://img/images/hound/hound1.jpg", "http://img/images/hound/afghan/afghan1.jpg"]
+
+    first = client.get("/breed/hound/images?min_width=1000&limit=1")
+    assert first.json()["message"] == ["http://img/images/hound/hound1.jpg"]
+    cursor = first.headers["x-next-cursor"]
+    second = client.get(f"/breed/hound/images?min_width=1000&limit=1&cursor={cursor}")
+    assert second.json()["message"] == ["http://img/images/hound/afghan/afghan1.jpg"]
+    assert "x-next-cursor" not in second.headers
+
+    assert client.get("/breed/akita/images?orientation=square").json()["message"] == []
+    assert client.get("/breed/missing/images?min_width=1").status_code == 404
+
+def test_filtered_random(indexed):
+    urls = client.get("/breeds/image/random/10?orientation=landscape").json()["message"]
+    assert sorted(urls) == ["http://img/images/akita/akita1.jpg", "http://img/images/hound/afghan/afghan1.jpg"]
+    assert client.get("/breed/akita/images/random?format=png").json()["message"] == "http://img/images/akita/akita2.png"
+    assert client.get("/breed/akita/images/random?min_width=5000").status_code == 404
+
+def test_filters_unavailable(assets, monkeypatch):
+    monkeypatch.setattr(image_metadata, "_indexer", None)
+    assert client.get("/breed/akita/images?min_width=10").status_code == 400
+    assert client.get("/breed/akita/images").status_code == 200
+
+    monkeypatch.setattr(config, "IMAGE_METADATA", True)
+    monkeypatch.setattr(image_metadata, "_indexer", MetadataIndexer(None, workers=1))
+    response = client.get("/breeds/image/random?min_width=10")
+    assert response.status_code == 503
+    assert response.headers["retry-after"]
+
+def test_only_primary_worker_writes_index(assets, tmp_path):
+    path = tmp_path / "metadata.idx"
+    MetadataIndexer(path, workers=1, persist=False).build(breed_service.get_catalog())
+    assert not path.exists()
+    MetadataIndexer(path, workers=1).build(breed_service.get_catalog())
+    assert path.exists()
+
+def test_rebuild_probes_changed_directories_only(indexed, assets, monkeypatch):
+    probed = []
+    original = image_metadata.probe_chunk
+    monkeypatch.setattr(image_metadata, "probe_chunk", lambda entries: probed.extend(entries) or original(entries))
+    (assets / "hound" / "afghan" / "afghan9.png").write_bytes(png(200, 100))
+    stat = os.stat(assets / "hound" / "afghan")
+    os.utime(assets / "hound" / "afghan", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    catalog = breed_service.load_catalog()
+
+    rebuilt = build_index(catalog, {}, workers=1, reuse=indexed.index)
+    assert [entry[0] for entry in probed] == [str(assets / rel) for rel in catalog.images_in("hound", "afghan")]
+    assert rebuilt.rows() == build_index(catalog, {}, workers=1).rows()
+
+def test_previous_index_serves_unchanged_breeds(indexed, assets):
+    stat = os.stat(assets / "akita")
+    os.utime(assets / "akita", ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+    breed_service.load_catalog()
+    assert client.get("/breed/akita/images?min_width=1").status_code == 503
+    response = client.get("/breed/hound/images?min_width=1000")
+    assert response.json()["message"] == ["http://img/images/hound/hound1.jpg", "http://img/images/hound/afghan/afghan1.jpg"]
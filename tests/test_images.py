@@ -0,0 +1,94 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import metrics
+from app.responses import parse_ranges
+from app.services.image_files import negative_cache
+
+client = TestClient(app)
+
+def write_image(assets, rel, size=1000):
+    data = bytes(i % 251 for i in range(size))
+    (assets / rel).write_bytes(data)
+    return data
+
+def test_serve_image(assets):
+    data = write_image(assets, "akita/akita1.jpg")
+    response = client.get("/images/akita/akita1.jpg")
+    assert response.status_code == 200
+    assert response.content == data
+    assert response.headers["content-type"] == "image/jpeg"
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["cache-control"] == "public, max-age=86400"
+    assert response.headers["vary"] == "Origin"
+    cors = client.get("/images/akita/akita1.jpg", headers={"Origin": "http://localhost:5173"})
+    assert cors.headers["vary"] == "Origin"
+
+def test_unknown_image_is_404(assets):
+    assert client.get("/images/akita/notes.txt").status_code == 404
+    assert client.get("/images/akita/missing.jpg").status_code == 404
+    assert client.get("/images/akita").status_code == 404
+
+def test_conditional_get(assets):
+    write_image(assets, "akita/akita1.jpg")
+    response = client.get("/images/akita/akita1.jpg")
+    etag = response.headers["etag"]
+    assert client.get("/images/akita/akita1.jpg", headers={"If-None-Match": etag}).status_code == 304
+    last_modified = response.headers["last-modified"]
+    assert client.get("/images/akita/akita1.jpg", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+def test_immutable_when_versioned(assets):
+    write_image(assets, "akita/akita1.jpg")
+    etag = client.get("/images/akita/akita1.jpg").headers["etag"].strip('"')
+    response = client.get(f"/images/akita/akita1.jpg?v={etag}")
+    assert "immutable" in response.headers["cache-control"]
+
+def test_single_range(assets):
+    data = write_image(assets, "akita/akita1.jpg")
+    response = client.get("/images/akita/akita1.jpg", headers={"Range": "bytes=10-19"})
+    assert response.status_code == 206
+    assert response.content == data[10:20]
+    assert response.headers["content-range"] == "bytes 10-19/1000"
+    assert client.get("/images/akita/akita1.jpg", headers={"Range": "bytes=5000-"}).status_code == 416
+
+def test_multi_range(assets):
+    data = write_image(assets, "akita/akita1.jpg")
+    response = client.get("/images/akita/akita1.jpg", headers={"Range": "bytes=0-9,-10"})
+    assert response.status_code == 206
+    assert response.headers["content-type"].startswith("multipart/byteranges")
+    assert int(response.headers["content-length"]) == len(response.content)
+    assert data[:10] in response.content and data[-10:] in response.content
+
+def test_parse_ranges():
+    assert parse_ranges("bytes=0-99", 50) == [(0, 50)]
+    assert parse_ranges("bytes=-10", 50) == [(40, 50)]
+    assert parse_ranges("bytes=0-9,5-19", 50) == [(0, 20)]
+    assert parse_ranges("bytes=60-", 50) == []
+    assert parse_ranges("bytes=9-1", 50) is None
+    assert parse_ranges("items=0-1", 50) is None
+
+def test_traversal_is_rejected_without_filesystem_calls(assets):
+    stats = metrics.fs_calls["stat"]
+    rejected = metrics.lookup_misses["rejected"]
+    for path in ["%2E%2E/secret.jpg", "akita/%2e%2e/%2e%2e/etc/passwd", "akita//akita1.jpg", "akita%5Cakita1.jpg"]:
+        assert client.get(f"/images/{path}").status_code == 400
+    assert metrics.fs_calls["stat"] == stats
+    assert metrics.lookup_misses["rejected"] == rejected + 4
+
+def test_missing_file_is_negatively_cached(assets):
+    (assets / "akita/akita1.jpg").unlink()
+    misses = metrics.lookup_misses["image"]
+    assert client.get("/images/akita/akita1.jpg").status_code == 404
+    stats = metrics.fs_calls["stat"]
+    assert client.get("/images/akita/akita1.jpg").status_code == 404
+    assert client.get("/images/unknown/dog.jpg").status_code == 404
+    assert metrics.fs_calls["stat"] == stats
+    assert metrics.lookup_misses["image"] == misses + 3
+    assert "akita/akita1.jpg" in negative_cache
+
+def test_unknown_breeds_are_counted(assets):
+    breeds, subbreeds = metrics.lookup_misses["breed"], metrics.lookup_misses["subbreed"]
+    assert client.get("/breed/wolf/images").status_code == 404
+    assert client.get("/breed/wolf/images/random").status_code == 404
+    assert client.get("/breed/hound/dingo/images/random/3").status_code == 404
+    assert metrics.lookup_misses["breed"] == breeds + 2
+    assert metrics.lookup_misses["subbreed"] == subbreeds + 1
@@ -0,0 +1,66 @@
+import io
+import json
+from benchmarks.generate_assets import JPEG_IMAGE, png_image
+from app.services.catalog import Catalog
+from app.services.ingest import (
+    HashIndex,
+    ingest,
+    inspect_file,
+    inspect_stream,
+    normalize_name,
+    updated_catalog,
+    JPEG_CODE,
+    PNG_CODE,
+)
+
+def write(path, data):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(data)
+    return str(path)
+
+def test_inspect_detects_corrupt_and_truncated_files(tmp_path):
+    assert inspect_file(write(tmp_path / "ok.jpg", JPEG_IMAGE)).error is None
+    assert inspect_file(write(tmp_path / "ok.png", png_image(3, 2))).error is None
+    assert inspect_file(write(tmp_path / "text.jpg", b"hello")).error == "not a JPEG or PNG file"
+    assert inspect_file(write(tmp_path / "short.jpg", JPEG_IMAGE[:-40])).error.startswith("truncated JPEG")
+    assert inspect_file(write(tmp_path / "short.png", png_image()[:-6])).error.startswith("truncated PNG")
+    assert inspect_file(write(tmp_path / "header.jpg", b"\xff\xd8\xff\xd9")).error == "corrupt image header"
+
+def test_normalize_name():
+    assert normalize_name("Afghan Hound (2).JPEG", JPEG_CODE) == "afghan-hound-2.jpg"
+    assert normalize_name("Ünïcode_Pup.jpg", PNG_CODE) == "unicode-pup.png"
+    assert normalize_name("!!!.png", PNG_CODE) == "image.png"
+
+def test_inspect_stream_uses_worker_processes(tmp_path):
+    paths = [write(tmp_path / f"{i}.jpg", JPEG_IMAGE + bytes([i])) for i in range(5)]
+    results = list(inspect_stream(paths, workers=2))
+    assert [result.path for result in results] == paths
+    assert len({result.digest for result in results}) == 5
+
+def test_ingest_moves_valid_unique_images(tmp_path):
+    assets, drop = tmp_path / "assets", tmp_path / "drop"
+    write(assets / "akita" / "akita1.jpg", JPEG_IMAGE)
+    write(drop / "Akita" / "Copy Of Akita.jpg", JPEG_IMAGE)
+    write(drop / "Hound" / "Afghan" / "Afghan 1.JPEG", JPEG_IMAGE + b"\n")
+    write(drop / "hound" / "afghan" / "again.jpg", JPEG_IMAGE + b"\n")
+    write(drop / "hound" / "broken.png", png_image()[:-6])
+    write(drop / "loose.png", png_image())
+    write(assets / "hound" / "afghan" / "afghan-1.jpg", png_image(2, 2))
+
+    catalog = Catalog.build(assets)
+    index = HashIndex(tmp_path / "index.sqlite")
+    log = io.StringIO()
+    report = ingest(drop, assets, index, catalog, workers=1, log=log)
+
+    assert report.counts == {"accepted": 1, "duplicate": 2, "invalid": 2, "failed": 0}
+    assert report.indexed == 2
+    outcomes = {entry["source"]: entry for entry in map(json.loads, log.getvalue().splitlines())}
+    assert outcomes[str(drop / "Akita" / "Copy Of Akita.jpg")]["detail"] == "akita/akita1.jpg"
+    assert (assets / "hound" / "afghan" / "afghan-1-2.jpg").read_bytes() == JPEG_IMAGE + b"\n"
+    assert not (drop / "Hound" / "Afghan" / "Afghan 1.JPEG").exists()
+    assert (drop / "Akita" / "Copy Of Akita.jpg").exists()
+
+    updated = updated_catalog(assets, catalog, report, [assets])
+    assert list(updated.images) == list(Catalog.build(assets).images)
+    assert "hound/afghan/afghan-1-2.jpg" in updated.images
+    index.close()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import time
+import pytest
+from app.services.io_executor import IOExecutor, IOQueueFull, IOTimeout, LoopLagMonitor
+
+def test_single_flight_collapses_identical_lookups():
+    calls = []
+
+    def listing():
+        calls.append(1)
+        time.sleep(0.05)
+        return ["akita1.jpg"]
+
+    async def main():
+        executor = IOExecutor(max_workers=4, max_queue=10, timeout=5)
+        results = await asyncio.gather(*(executor.run_once(("list", "akita"), listing) for _ in range(200)))
+        executor.shutdown()
+        return executor, results
+
+    executor, results = asyncio.run(main())
+    assert len(calls) == 1
+    assert all(result == ["akita1.jpg"] for result in results)
+    assert executor.coalesced == 199
+    assert executor.pending == 0
+
+def test_queue_depth_limit():
+    release = threading.Event()
+
+    async def main():
+        executor = IOExecutor(max_workers=1, max_queue=2, timeout=5)
+        first = executor.submit(release.wait)
+        second = executor.submit(release.wait)
+        with pytest.raises(IOQueueFull):
+            executor.submit(release.wait)
+        release.set()
+        await asyncio.gather(first, second)
+        executor.shutdown()
+        return executor
+
+    executor = asyncio.run(main())
+    assert executor.rejected == 1
+    assert executor.pending == 0
+
+def test_timeout_and_errors():
+    async def main():
+        executor = IOExecutor(max_workers=2, max_queue=10, timeout=0.05)
+        with pytest.raises(IOTimeout):
+            await executor.run(time.sleep, 0.2)
+        with pytest.raises(FileNotFoundError):
+            await executor.run(open, "/nonexistent/dog.jpg")
+        executor.shutdown()
+        return executor
+
+    assert asyncio.run(main()).timeouts == 1
+
+def test_loop_lag_monitor_sees_blocking_call():
+    async def main():
+        monitor = LoopLagMonitor(interval=0.01)
+        monitor.start()
+        await asyncio.sleep(0.02)
+        time.sleep(0.1)
+        await asyncio.sleep(0.02)
+        monitor.stop()
+        return monitor
+
+    assert asyncio.run(main()).max_lag >= 0.05
+
+def test_committed_reads_skip_queue_limit_and_timeout():
+    async def main():
+        executor = IOExecutor(max_workers=1, max_queue=0, timeout=0.01)
+        with pytest.raises(IOQueueFull):
+            executor.submit(time.sleep, 0)
+        result = await executor.run_committed(lambda: time.sleep(0.05) or "read")
+        executor.shutdown()
+        return executor, result
+
+    executor, result = asyncio.run(main())
+    assert result == "read"
+    assert executor.timeouts == 0 and executor.pending == 0
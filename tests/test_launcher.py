@@ -0,0 +1,58 @@
+import importlib.util
+import signal
+import socket
+import time
+import config
+from app import launcher
+
+def test_loop_and_parser_fallbacks(monkeypatch):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    assert launcher.select_loop("auto") == "asyncio"
+    assert launcher.select_loop("uvloop") == "asyncio"
+    assert launcher.select_http("httptools") == "h11"
+    assert launcher.select_http("h11") == "h11"
+
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: object())
+    assert launcher.select_loop("auto") == "uvloop"
+    assert launcher.select_http("auto") == "httptools"
+    assert launcher.select_loop("asyncio") == "asyncio"
+
+def test_bind_socket_is_inheritable():
+    sock = launcher.bind_socket("127.0.0.1", 0, backlog=16, reuse_port=True)
+    try:
+        assert sock.get_inheritable()
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR)
+    finally:
+        sock.close()
+
+def test_metrics_dir_prepared_for_workers(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "METRICS_DIR", "")
+    launcher.prepare_metrics_dir(1)
+    assert config.METRICS_DIR == ""
+
+    (tmp_path / "metrics-123.json").write_text("{}")
+    monkeypatch.setattr(config, "METRICS_DIR", str(tmp_path))
+    launcher.prepare_metrics_dir(4)
+    assert not list(tmp_path.glob("metrics-*.json"))
+
+def test_describe_exit():
+    assert launcher.describe_exit(0) == "status 0"
+    assert launcher.describe_exit(3 << 8) == "status 3"
+    assert launcher.describe_exit(signal.SIGKILL) == f"signal {int(signal.SIGKILL)}"
+
+def test_failing_workers_respawn_with_backoff(monkeypatch):
+    monkeypatch.setattr(config, "WORKER_STARTUP_TIMEOUT", 60.0)
+    runner = launcher.Launcher(None, 2, "127.0.0.1", 0)
+    runner.primary = 101
+    runner.started = {101: time.monotonic(), 102: time.monotonic()}
+
+    runner.schedule_respawn(101, 1 << 8)
+    first = runner.respawn_at - time.monotonic()
+    runner.schedule_respawn(102, 1 << 8)
+    assert runner.respawn_at - time.monotonic() > first > 0
+    assert runner.respawns == [True, False]
+    assert runner.primary is None
+
+    runner.started[103] = time.monotonic()
+    runner.schedule_respawn(103, 0)
+    assert runner.failures == 0
@@ -0,0 +1,81 @@
+import json
+import config
+from fastapi.testclient import TestClient
+from app.main import app
+from app.metrics import LATENCY_BUCKETS, merge_snapshots, metrics, read_snapshots, render
+
+client = TestClient(app)
+
+def sample(text: str, name: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(name + " "):
+            return float(line.rsplit(" ", 1)[1])
+    raise AssertionError(f"{name} not found")
+
+def test_route_counters_and_histogram(assets):
+    client.get("/breeds/list/all")
+    client.get("/breed/missing/list")
+    text = client.get("/metrics").text
+
+    labels = 'method="GET",route="/breeds/list/all"'
+    assert sample(text, f'dog_api_http_requests_total{{{labels},status="200"}}') >= 1
+    assert sample(text, f'dog_api_http_request_duration_seconds_bucket{{{labels},le="+Inf"}}') >= 1
+    missing = 'method="GET",route="/breed/{breed}/list",status="404"'
+    assert sample(text, f"dog_api_http_requests_total{{{missing}}}") >= 1
+    assert sample(text, "dog_api_http_requests_in_flight") == 1
+    assert sample(text, "dog_api_catalog_images") == 7
+    assert 'dog_api_cache_hit_ratio{cache="response"}' in text
+
+def test_image_bytes_and_filesystem_calls(assets):
+    served = metrics.image_bytes_served
+    stats = metrics.fs_calls["stat"]
+    assert client.get("/images/akita/akita1.jpg").status_code == 200
+    assert metrics.image_bytes_served == served + 4
+    assert metrics.fs_calls["stat"] > stats
+
+def test_multi_worker_aggregation(assets, tmp_path, monkeypatch):
+    directory = tmp_path / "metrics"
+    directory.mkdir()
+    other = metrics.snapshot()
+    other["image_bytes_served"] = 1000
+    other["routes"] = [{
+        "method": "GET", "path": "/breeds/list/all", "buckets": [1] + [0] * len(LATENCY_BUCKETS),
+        "statuses": {"200": 1}, "sum": 0.001, "count": 1,
+    }]
+    (directory / "metrics-1.json").write_text(json.dumps(other))
+    monkeypatch.setattr(config, "METRICS_DIR", str(directory))
+
+    text = client.get("/metrics").text
+    assert sample(text, "dog_api_workers") == 2
+    assert sample(text, "dog_api_image_bytes_served_total") == 1000 + metrics.image_bytes_served
+    assert len(read_snapshots(directory)) == 2
+
+def test_merge_sums_counters():
+    snapshot = {
+        "in_flight": 1, "image_bytes_served": 5, "fs_calls": {"stat": 2},
+        "routes": [{"method": "GET", "path": "/x", "buckets": [1, 0], "statuses": {"200": 1}, "sum": 0.5, "count": 1}],
+        "caches": {"response": {"hits": 3, "misses": 1}}, "gauges": {"catalog_images": 10},
+    }
+    merged = merge_snapshots([snapshot, snapshot])
+    assert merged["image_bytes_served"] == 10
+    assert merged["routes"][0]["statuses"] == {"200": 2}
+    assert merged["caches"]["response"] == {"hits": 6, "misses": 2}
+    assert merged["gauges"]["catalog_images"] == 10
+    assert 'dog_api_cache_hit_ratio{cache="response"} 0.75' in render(merged)
+
+def test_dead_workers_are_folded_into_retired_counters(assets, tmp_path, monkeypatch):
+    directory = tmp_path / "metrics"
+    directory.mkdir()
+    dead = metrics.snapshot()
+    dead.update(pid=2 ** 22 + 1, in_flight=7, image_bytes_served=1000)
+    dead["gauges"] = {"io_pending": 9, "io_submitted_total": 4}
+    (directory / f"metrics-{dead['pid']}.json").write_text(json.dumps(dead))
+    monkeypatch.setattr(config, "METRICS_DIR", str(directory))
+
+    for _ in range(2):
+        text = client.get("/metrics").text
+        assert sample(text, "dog_api_workers") == 1
+        assert sample(text, "dog_api_image_bytes_served_total") == 1000 + metrics.image_bytes_served
+        assert sample(text, "dog_api_io_pending") == metrics.snapshot()["gauges"]["io_pending"]
+    assert not (directory / f"metrics-{dead['pid']}.json").exists()
+    assert json.loads((directory / "retired.json").read_text())["gauges"] == {"io_submitted_total": 4}
@@ -0,0 +1,96 @@
+import asyncio
+import time
+from collections import Counter
+import config
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from app import profiling
+from app.middleware.profiling import ProfilingMiddleware
+
+def slow_path():
+    time.sleep(0.05)
+
+def profiled_client(tmp_path, monkeypatch, token="secret", rate=0.0):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILE_TOKEN", token)
+    monkeypatch.setattr(config, "PROFILE_SAMPLE_RATE", rate)
+    app = FastAPI()
+
+    @app.get("/slow")
+    def slow():
+        slow_path()
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware)
+    return TestClient(app)
+
+def test_token_triggers_profile(tmp_path, monkeypatch):
+    client = profiled_client(tmp_path, monkeypatch)
+    assert client.get("/slow").status_code == 200
+    assert not list(tmp_path.glob("*.folded"))
+
+    assert client.get("/slow", headers={"X-Profile-Token": "wrong"}).status_code == 200
+    assert not list(tmp_path.glob("*.folded"))
+
+    assert client.get("/slow", headers={"X-Profile-Token": "secret"}).json() == {"ok": True}
+    folded = list(tmp_path.glob("*.folded"))
+    assert len(folded) == 1
+    assert "slow_path" in folded[0].read_text()
+    summary = folded[0].with_suffix(".txt").read_text()
+    assert summary.startswith("GET /slow")
+    assert "Total time:" in summary
+
+def test_signal_arms_requests(tmp_path, monkeypatch):
+    client = profiled_client(tmp_path, monkeypatch, token="")
+    profiling.arm(2)
+    for _ in range(3):
+        client.get("/slow")
+    assert len(list(tmp_path.glob("*.folded"))) == 2
+
+def test_sample_rate(tmp_path, monkeypatch):
+    client = profiled_client(tmp_path, monkeypatch, token="", rate=1.0)
+    client.get("/slow")
+    assert len(list(tmp_path.glob("*.txt"))) == 1
+
+def test_top_frames():
+    stacks = Counter({"main;handler;read": 3, "main;handler;encode": 1})
+    own, total = profiling.top_frames(stacks)
+    assert own[0] == ("read", 3)
+    assert ("handler", 4) in total
+
+def spin(seconds):
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+def test_concurrent_requests_are_not_charged(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr(config, "PROFILE_TOKEN", "secret")
+    monkeypatch.setattr(config, "PROFILE_SAMPLE_RATE", 0.0)
+
+    async def app(scope, receive, send):
+        if scope["path"] == "/busy":
+            spin(0.1)
+        else:
+            await asyncio.sleep(0.1)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = ProfilingMiddleware(app)
+
+    async def request(path, headers):
+        async def receive():
+            return {"type": "http.request", "body": b""}
+        async def send(message):
+            pass
+        scope = {"type": "http", "method": "GET", "path": path, "headers": headers}
+        await middleware(scope, receive, send)
+
+    async def run():
+        await asyncio.gather(request("/quiet", [(b"x-profile-token", b"secret")]), request("/busy", []))
+
+    asyncio.run(run())
+    folded = list(tmp_path.glob("*.folded"))
+    assert len(folded) == 1
+    assert "spin" not in folded[0].read_text()
+    assert "other requests in" in folded[0].with_suffix(".txt").read_text()
@@ -0,0 +1,49 @@
+from fastapi.testclient import TestClient
+from app.main import app
+from app.response_cache import ResponseCache, etag_matches, response_cache
+from app.services import breed_service
+
+client = TestClient(app)
+
+def test_etag_and_not_modified(assets):
+    response = client.get("/breeds/list/all")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert response.json()["message"]["hound"] == ["afghan", "basset"]
+
+    cached = client.get("/breeds/list/all", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+    assert cached.headers["etag"] == etag
+    assert response.headers["vary"] == cached.headers["vary"] == "Origin"
+
+def test_cache_invalidated_on_catalog_change(assets):
+    etag = client.get("/breed/akita/images").headers["etag"]
+    hits = response_cache.hits
+    assert client.get("/breed/akita/images").headers["etag"] == etag
+    assert response_cache.hits == hits + 1
+
+    (assets / "akita" / "akita3.jpg").write_bytes(b"")
+    breed_service.load_catalog()
+    response = client.get("/breed/akita/images", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert len(response.json()["message"]) == 3
+
+def test_missing_breed_not_cached(assets):
+    assert client.get("/breed/missing/list").status_code == 404
+    assert client.get("/breed/missing/images").status_code == 404
+
+def test_cache_bounded_by_bytes():
+    cache = ResponseCache(max_bytes=10)
+    cache.get("a", 1)
+    cache.put("a", b"123456")
+    cache.put("b", b"123456")
+    assert cache.get("a", 1) is None
+    assert cache.get("b", 1) is not None
+    assert cache.size == 6
+
+def test_etag_matches():
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abd"', '"abc"')
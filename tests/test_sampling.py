@@ -0,0 +1,50 @@
+from collections import Counter
+import random
+from fastapi.testclient import TestClient
+from app.main import app
+from app.services import breed_service
+from app.services.sampling import AliasTable, CatalogSampler
+
+client = TestClient(app)
+
+def test_alias_table_distribution():
+    random.seed(1)
+    table = AliasTable([1, 2, 7])
+    counts = Counter(table.draw() for _ in range(20000))
+    assert abs(counts[2] / 20000 - 0.7) < 0.02
+    assert abs(counts[0] / 20000 - 0.1) < 0.02
+
+def test_alias_table_empty():
+    assert AliasTable([]).size == 0
+    assert AliasTable([0, 0]).size == 0
+
+def test_breed_mode_is_uniform_by_breed(assets):
+    random.seed(2)
+    sampler = CatalogSampler(breed_service.get_catalog(), {})
+    counts = Counter(sampler.draw("breed").split("/")[0] for _ in range(4000))
+    assert set(counts) == {"akita", "hound"}
+    assert abs(counts["akita"] / 4000 - 0.5) < 0.05
+
+def test_weights_boost_breed(assets):
+    sampler = CatalogSampler(breed_service.get_catalog(), {"akita": 0})
+    assert {sampler.draw("breed").split("/")[0] for _ in range(200)} == {"hound"}
+    assert len(sampler.sample(10, "image")) == 5
+
+def test_weighted_sample_is_without_replacement(assets):
+    random.seed(3)
+    catalog = breed_service.get_catalog()
+    sampler = CatalogSampler(catalog, {"akita": 1000})
+    for count in range(1, len(catalog) + 2):
+        images = sampler.sample(count, "breed")
+        assert len(images) == len(set(images)) == min(count, len(catalog))
+
+def test_subbreed_mode_groups(assets):
+    sampler = CatalogSampler(breed_service.get_catalog(), {})
+    drawn = {sampler.draw("subbreed") for _ in range(500)}
+    assert "hound/basset/puppies/puppy1.jpg" not in drawn
+    assert "hound/hound1.jpg" in drawn
+
+def test_random_mode_query(assets):
+    assert client.get("/breeds/image/random?mode=breed").status_code == 200
+    assert len(client.get("/breeds/image/random/3?mode=subbreed").json()["message"]) == 3
+    assert client.get("/breeds/image/random?mode=bogus").status_code == 422
@@ -0,0 +1,40 @@
+import json
+import config
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from app import serialization
+from app.main import app
+from app.models import success_response
+from app.response_cache import response_cache
+
+client = TestClient(app)
+
+def test_envelope_matches_pydantic_path(monkeypatch):
+    message = {"hound": ["afghan", "basset"], "akita": [], "café": ["ñ"]}
+    expected = JSONResponse(jsonable_encoder(success_response(message))).body
+    assert serialization.render_envelope(message) == expected
+
+    monkeypatch.setattr(serialization, "orjson", None)
+    assert serialization.render_envelope(message) == expected
+
+def test_fast_responses_are_byte_identical(assets, monkeypatch):
+    paths = ["/breeds/list/all", "/breed/hound/images", "/breed/hound/images?limit=2", "/breeds/image/random/3"]
+    slow = {path: client.get(path) for path in paths}
+    response_cache.clear()
+    monkeypatch.setattr(config, "FAST_RESPONSES", True)
+    for path in paths:
+        fast = client.get(path)
+        assert fast.status_code == 200
+        assert fast.headers["content-type"] == "application/json"
+        if "random" in path:
+            assert len(fast.json()["message"]) == 3
+        else:
+            assert fast.content == slow[path].content
+            assert fast.headers.get("etag") == slow[path].headers.get("etag")
+    assert client.get("/breed/hound/images?limit=2").headers["x-next-cursor"]
+    assert client.get("/breed/missing/images").status_code == 404
+
+def test_openapi_keeps_response_model():
+    schema = app.openapi()["paths"]["/breeds/list/all"]["get"]["responses"]["200"]
+    assert json.dumps(schema).count("APIResponse") == 1
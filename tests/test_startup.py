@@ -0,0 +1,57 @@
+import json
+from fastapi.testclient import TestClient
+import config
+from app.main import app
+from app.openapi import build_openapi, encode_openapi, load_prebuilt_openapi
+from app.startup_report import group_by_package, parse_import_times
+
+client = TestClient(app)
+
+IMPORTTIME = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _io
+import time:      2000 |       2500 |     fastapi.routing
+import time:       300 |       2800 |   fastapi
+import time:      1500 |       1500 |     app.routes.images
+import time:       400 |       4700 | app.main
+"""
+
+def reset_openapi(monkeypatch, path):
+    monkeypatch.setattr(config, "OPENAPI_PATH", str(path))
+    monkeypatch.setattr(app, "openapi_schema", None)
+    monkeypatch.setattr(app.state, "openapi_body", None, raising=False)
+
+def test_parse_import_times():
+    rows = parse_import_times(IMPORTTIME)
+    assert [row.module for row in rows] == ["_io", "fastapi.routing", "fastapi", "app.routes.images", "app.main"]
+    assert rows[1].self_us == 2000 and rows[1].cumulative_us == 2500 and rows[1].depth == 2
+    assert group_by_package(rows) == {"fastapi": 2300, "app.routes.images": 1500, "app.main": 400, "_io": 120}
+
+def test_serves_prebuilt_openapi(tmp_path, monkeypatch):
+    body = encode_openapi(build_openapi(app))
+    path = tmp_path / "openapi.json"
+    path.write_bytes(body)
+    reset_openapi(monkeypatch, path)
+
+    response = client.get("/openapi.json")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["content-type"] == "application/json"
+    assert app.openapi()["paths"] == json.loads(body)["paths"]
+
+def test_stale_prebuilt_openapi_is_ignored(tmp_path, monkeypatch):
+    schema = build_openapi(app)
+    del schema["paths"]["/breeds/list/all"]
+    path = tmp_path / "openapi.json"
+    path.write_bytes(encode_openapi(schema))
+    assert load_prebuilt_openapi(app, path) is None
+
+    reset_openapi(monkeypatch, path)
+    assert "/breeds/list/all" in client.get("/openapi.json").json()["paths"]
+
+def test_prebuilt_openapi_for_other_root_path_is_ignored(tmp_path, monkeypatch):
+    path = tmp_path / "openapi.json"
+    monkeypatch.setenv("ROOT_PATH", "/elsewhere")
+    path.write_bytes(encode_openapi(build_openapi(app)))
+    monkeypatch.setenv("ROOT_PATH", "/dog-api")
+    assert load_prebuilt_openapi(app, path) is None
+    assert load_prebuilt_openapi(app, tmp_path / "missing.json") is None
@@ -0,0 +1,160 @@
+import json
+import threading
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+import config
+from app.metrics import metrics
+from app.middleware.cors import CustomCORSMiddleware
+from app.middleware.tracing import SpanMiddleware, TracingMiddleware
+from app.routes import breeds, images
+from app.tracing import (
+    Span,
+    Trace,
+    TracedJSONResponse,
+    format_traceparent,
+    otlp_payload,
+    parse_traceparent,
+    start_tracer,
+    stop_tracer,
+    traced,
+)
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+def make_client(monkeypatch, tmp_path, sample_rate=1.0, slow_ms=0.0):
+    monkeypatch.setattr(config, "TRACE_SAMPLE_RATE", sample_rate)
+    monkeypatch.setattr(config, "TRACE_SLOW_MS", slow_ms)
+    monkeypatch.setattr(config, "TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setattr(config, "TRACE_OTLP_ENDPOINT", "")
+    app = FastAPI(default_response_class=TracedJSONResponse)
+    app.include_router(breeds.router)
+    app.include_router(images.router)
+    app.add_middleware(SpanMiddleware, name="routing")
+    app.add_middleware(CustomCORSMiddleware)
+    app.add_middleware(SpanMiddleware, name="cors")
+    app.add_middleware(TracingMiddleware)
+    return TestClient(app)
+
+def exported(tmp_path):
+    stop_tracer()
+    path = tmp_path / "traces.jsonl"
+    if not path.exists():
+        return []
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_sampled_request_records_nested_spans(assets, tmp_path, monkeypatch):
+    client = make_client(monkeypatch, tmp_path)
+    start_tracer()
+    response = client.get("/breed/hound/afghan/images/random")
+    assert response.status_code == 200
+    traceparent = parse_traceparent(response.headers["traceparent"])
+
+    [trace] = exported(tmp_path)
+    assert trace["trace_id"] == traceparent[0]
+    assert trace["name"] == "GET /breed/{breed}/{subbreed}/images/random"
+    spans = {span["name"]: span for span in trace["spans"]}
+    assert {"cors", "routing", "route", "handler", "response.validate", "json.encode", "http.send"} <= set(spans)
+    assert spans["cors"]["parent_id"] == trace["spans"][0]["span_id"]
+    assert spans["routing"]["parent_id"] == spans["cors"]["span_id"]
+    assert spans["handler"]["parent_id"] == spans["route"]["span_id"]
+    service = spans["breed_service.get_random_image_url"]
+    assert service["parent_id"] == spans["handler"]["span_id"]
+    assert service["attributes"] == {"fs.stat": 0, "fs.scandir": 0}
+    assert trace["spans"][0]["attributes"]["http.status_code"] == 200
+
+def test_traceparent_is_propagated(assets, tmp_path, monkeypatch):
+    client = make_client(monkeypatch, tmp_path, sample_rate=0.0, slow_ms=60_000)
+    start_tracer()
+    headers = {"traceparent": format_traceparent(TRACE_ID, PARENT_ID, True)}
+    response = client.get("/breeds/list/all", headers=headers)
+    trace_id, _, sampled = parse_traceparent(response.headers["traceparent"])
+    assert (trace_id, sampled) == (TRACE_ID, True)
+
+    [trace] = exported(tmp_path)
+    assert trace["trace_id"] == TRACE_ID
+    assert trace["spans"][0]["parent_id"] == PARENT_ID
+    assert "json.encode" in {span["name"] for span in trace["spans"]}
+
+def test_tail_sampling_keeps_only_slow_requests(assets, tmp_path, monkeypatch):
+    client = make_client(monkeypatch, tmp_path, sample_rate=0.0, slow_ms=60_000)
+    start_tracer()
+    response = client.get("/breeds/list/all")
+    assert parse_traceparent(response.headers["traceparent"])[2] is False
+    assert exported(tmp_path) == []
+
+    client = make_client(monkeypatch, tmp_path, sample_rate=0.0, slow_ms=0.000001)
+    start_tracer()
+    response = client.get("/breeds/list/all")
+    [trace] = exported(tmp_path)
+    root = trace["spans"][0]
+    assert trace["name"] == "GET /breeds/list/all"
+    assert root["span_id"] == parse_traceparent(response.headers["traceparent"])[1]
+    assert root["attributes"]["http.status_code"] == 200
+    assert [span["name"] for span in trace["spans"]] == ["GET /breeds/list/all", "http.send"]
+
+def test_traced_counts_only_its_own_filesystem_calls():
+    trace = Trace(TRACE_ID, True)
+
+    @traced
+    def inner():
+        metrics.count_fs("stat", 2)
+
+    @traced
+    def outer(started, release):
+        metrics.count_fs("scandir")
+        inner()
+        started.set()
+        release.wait(5)
+
+    def request(*args):
+        with Span(trace, "GET", None):
+            outer(*args)
+
+    started, release = threading.Event(), threading.Event()
+    other = threading.Thread(target=request, args=(started, release))
+    other.start()
+    started.wait(5)
+    with Span(trace, "GET", None):
+        metrics.count_fs("stat", 5)
+        inner()
+    release.set()
+    other.join()
+    counts = [(span.name, span.attributes) for span in trace.spans if span.name != "GET"]
+    assert counts.count(("test_tracing.inner", {"fs.stat": 2, "fs.scandir": 0})) == 2
+    assert ("test_tracing.outer", {"fs.stat": 2, "fs.scandir": 1}) in counts
+
+def test_untraced_requests_skip_tracing(assets, tmp_path, monkeypatch):
+    client = make_client(monkeypatch, tmp_path, sample_rate=0.0)
+    start_tracer()
+    response = client.get("/breeds/list/all")
+    assert response.status_code == 200
+    assert "traceparent" not in response.headers
+    assert exported(tmp_path) == []
+
+def test_parse_traceparent():
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-00") == (TRACE_ID, PARENT_ID, False)
+    assert parse_traceparent(f"01-{TRACE_ID}-{PARENT_ID}-01-extra") == (TRACE_ID, PARENT_ID, True)
+    assert parse_traceparent(f"00-{TRACE_ID}-{PARENT_ID}-01-extra") is None
+    assert parse_traceparent(f"ff-{TRACE_ID}-{PARENT_ID}-01") is None
+    assert parse_traceparent(f"00-{'0' * 32}-{PARENT_ID}-01") is None
+    assert parse_traceparent("garbage") is None
+
+def test_otlp_payload():
+    trace = Trace(TRACE_ID, True)
+    root = Span(trace, "GET /breeds/list/all", PARENT_ID, {"http.status_code": 200}, kind=2)
+    child = root.child("json.encode", ratio=0.5, cached=True)
+    child.finish()
+    root.finish()
+    [resource] = otlp_payload([trace], "dog-api")["resourceSpans"]
+    assert resource["resource"]["attributes"][0]["value"] == {"stringValue": "dog-api"}
+    spans = resource["scopeSpans"][0]["spans"]
+    assert [span["name"] for span in spans] == ["json.encode", "GET /breeds/list/all"]
+    assert spans[0]["parentSpanId"] == root.span_id
+    assert spans[1]["parentSpanId"] == PARENT_ID
+    assert spans[0]["attributes"] == [
+        {"key": "ratio", "value": {"doubleValue": 0.5}},
+        {"key": "cached", "value": {"boolValue": True}},
+    ]
+    assert spans[1]["attributes"] == [{"key": "http.status_code", "value": {"intValue": "200"}}]